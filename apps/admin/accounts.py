@@ -15,7 +15,7 @@ from models.payment import BankPayment, BankTransaction
 from ..common import feature_enabled
 from ..common.email import from_email
 from ..common.forms import Form
-from ..common.receipt import attach_tickets, set_tickets_emailed
+from ..common.receipt import attach_tickets, set_tickets_emailed, load_receipt_data
 
 
 @admin.route("/transactions")
@@ -147,7 +147,8 @@ def transaction_reconcile(txn_id, payment_id):
                 to=[payment.user.email],
             )
 
-            already_emailed = set_tickets_emailed(payment.user)
+            receipt = load_receipt_data([payment.user])[payment.user.id]
+            already_emailed = set_tickets_emailed(payment.user, receipt)
             msg.body = render_template(
                 "emails/payment-paid.txt",
                 user=payment.user,
@@ -156,7 +157,7 @@ def transaction_reconcile(txn_id, payment_id):
             )
 
             if feature_enabled("ISSUE_TICKETS"):
-                attach_tickets(msg, payment.user)
+                attach_tickets(msg, payment.user, receipt)
 
             msg.send()
 
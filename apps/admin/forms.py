@@ -18,7 +18,7 @@ from wtforms_sqlalchemy.fields import QuerySelectField
 
 from models.permission import Permission
 from models.product import ProductGroup, PRODUCT_GROUP_TYPES
-from models.basket import Basket
+from models.basket import Basket, preload_prices
 
 from ..common import CURRENCY_SYMBOLS
 from ..common.forms import Form
@@ -266,6 +266,7 @@ class IssueTicketsForm(Form):
 
     def create_basket(self, user):
         basket = Basket(user, self.currency.data or "GBP")
+        preload_prices(f._tier for f in self.price_tiers if f.amount.data)
         for f in self.price_tiers:
             if f.amount.data:
                 basket[f._tier] = f.amount.data
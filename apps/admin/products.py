@@ -12,6 +12,7 @@ from flask_login import current_user
 
 from sqlalchemy.sql.functions import func
 from sqlalchemy import not_
+from sqlalchemy.orm import selectinload
 
 from main import db, mail, external_url
 from models.user import User
@@ -24,6 +25,7 @@ from models.product import (
     ProductView,
     ProductViewProduct,
     random_voucher,
+    refresh_catalogue,
     Voucher,
 )
 from models.purchase import Purchase
@@ -50,6 +52,7 @@ from .forms import (
     EditVoucherForm,
     BulkVoucherEmailForm,
 )
+from .stats import get_purchase_stats
 
 
 def get_user_purchases(query):
@@ -65,9 +68,18 @@ def get_user_purchases(query):
 
 @admin.route("/products")
 def products():
-    root_groups = (
-        ProductGroup.query.filter_by(parent_id=None).order_by(ProductGroup.id).all()
+    # Load the whole product tree up front, rather than lazily per group and tier
+    groups = (
+        ProductGroup.query.options(
+            selectinload(ProductGroup.children),
+            selectinload(ProductGroup.products)
+            .selectinload(Product.price_tiers)
+            .selectinload(PriceTier.prices),
+        )
+        .order_by(ProductGroup.id)
+        .all()
     )
+    root_groups = [group for group in groups if group.parent_id is None]
     return render_template("admin/products/overview.html", root_groups=root_groups)
 
 
@@ -163,6 +175,7 @@ def new_price_tier(product_id):
         pt.active = len(product.price_tiers) == 0
         product.price_tiers.append(pt)
         db.session.commit()
+        refresh_catalogue()
         return redirect(url_for(".price_tier_details", tier_id=pt.id))
 
     return render_template(
@@ -192,6 +205,7 @@ def price_tier_modify(tier_id):
         if form.delete.data and tier.unused:
             db.session.delete(tier)
             db.session.commit()
+            refresh_catalogue()
             flash("Price tier deleted")
             return redirect(url_for(".product_details", product_id=tier.product_id))
 
@@ -201,12 +215,14 @@ def price_tier_modify(tier_id):
 
             tier.active = True
             db.session.commit()
+            refresh_catalogue()
             flash("Price tier activated")
             return redirect(url_for(".price_tier_details", tier_id=tier.id))
 
         if form.deactivate.data:
             tier.active = False
             db.session.commit()
+            refresh_catalogue()
             flash("Price tier deactivated")
             return redirect(url_for(".price_tier_details", tier_id=tier.id))
 
@@ -224,10 +240,11 @@ def price_tier_edit(tier_id):
         tier.vat_rate = form.vat_rate.data
 
         # Update prices but only if price tier has no purchases.
+        # The cached stats may be out of date, so count them afresh.
         price_gbp = tier.get_price("GBP")
         price_eur = tier.get_price("EUR")
 
-        if tier.purchase_count == 0:
+        if get_purchase_stats.uncached().count_for_tier(tier) == 0:
             if form.price_gbp.data != price_gbp.value:
                 db.session.delete(price_gbp)
                 tier.prices.append(Price("GBP", form.price_gbp.data))
@@ -237,12 +254,18 @@ def price_tier_edit(tier_id):
                 tier.prices.append(Price("EUR", form.price_eur.data))
 
         db.session.commit()
+        refresh_catalogue()
 
         return redirect(url_for(".price_tier_details", tier_id=tier.id))
 
     form.price_gbp.data = tier.get_price("GBP").value
     form.price_eur.data = tier.get_price("EUR").value
-    return render_template("admin/products/price-tier-edit.html", tier=tier, form=form)
+    return render_template(
+        "admin/products/price-tier-edit.html",
+        tier=tier,
+        form=form,
+        purchase_count=get_purchase_stats().count_for_tier(tier),
+    )
 
 
 @admin.route("/products/group/<int:group_id>")
@@ -456,6 +479,7 @@ def product_view(view_id):
                     db.session.delete(pvp)
 
         db.session.commit()
+        refresh_catalogue()
 
     active_vouchers = Voucher.query.filter_by(view=view).filter(
         not_(
@@ -507,10 +531,12 @@ def product_view_add(view_id, group_id=None, product_id=None):
             for product in group.products:
                 ProductViewProduct(view, product)
             db.session.commit()
+            refresh_catalogue()
 
         elif form.add_product.data:
             ProductViewProduct(view, product)
             db.session.commit()
+            refresh_catalogue()
 
         return redirect(url_for(".product_view", view_id=view.id))
 
@@ -1,41 +1,127 @@
-from flask import render_template
-from models.product import ProductGroup, PriceTier, Product
-from models.purchase import Purchase
+import csv
+from datetime import datetime
 from decimal import Decimal
-from collections import defaultdict
+from io import BytesIO, StringIO
+
+from flask import abort, render_template, request, send_file
+from sqlalchemy import and_, func
+
+from main import cache, db
+from models.product import ProductGroup, Product, Price
+from models.purchase import Purchase
+from models.scheduled_task import scheduled_task
 
 from . import admin
 
+# Purchase states included in the reconciliation report, and their column names
+RECONCILE_STATES = {"paid": "paid", "payment-pending": "pending"}
+RECONCILE_CURRENCIES = ("GBP", "EUR")
+RECONCILE_SNAPSHOT_KEY = "report_reconcile_snapshot"
 
-@admin.route("/reports/reconcile")
-def report_reconcile():
-    data = {}
-    for pg in ProductGroup.query.all():
-        if not pg.products:
-            continue
-        paid = defaultdict(Decimal)
-        pending = defaultdict(Decimal)
-        q = (
-            Purchase.query.join(PriceTier, Product, ProductGroup)
-            .filter(ProductGroup.id == Product.group_id)
-            .filter(ProductGroup.id == pg.id)
+
+def reconcile_totals() -> dict[str, dict[str, dict[str, Decimal]]]:
+    """Paid and pending totals for each product group, summed in the database."""
+    rows = (
+        db.session.query(
+            ProductGroup.name,
+            Purchase.state,
+            Price.currency,
+            func.sum(Price.price_int),
+        )
+        .select_from(ProductGroup)
+        .join(Product, Product.group_id == ProductGroup.id)
+        .outerjoin(
+            Purchase,
+            and_(
+                Purchase.product_id == Product.id,
+                Purchase.state.in_(RECONCILE_STATES),
+            ),
         )
+        .outerjoin(Price, Price.id == Purchase.price_id)
+        .group_by(ProductGroup.id, ProductGroup.name, Purchase.state, Price.currency)
+        .order_by(ProductGroup.id)
+    )
 
-        for purchase in q.filter(Purchase.state == "paid"):
-            paid[purchase.price.currency] += purchase.price.value
+    data: dict[str, dict[str, dict[str, Decimal]]] = {}
+    for group_name, state, currency, total in rows:
+        # Groups without any matching purchases are still listed, with zero totals
+        totals = data.setdefault(
+            group_name,
+            {
+                typ: {c: Decimal() for c in RECONCILE_CURRENCIES}
+                for typ in RECONCILE_STATES.values()
+            },
+        )
+        if state is not None:
+            totals[RECONCILE_STATES[state]][currency] = Decimal(total) / 100
 
-        for purchase in q.filter(Purchase.state == "payment-pending"):
-            pending[purchase.price.currency] += purchase.price.value
+    return data
 
-        data[pg.name] = {"paid": paid, "pending": pending}
 
+def reconcile_grand_totals(data) -> dict[str, dict[str, Decimal]]:
     gt = {
-        "paid": {"GBP": Decimal(), "EUR": Decimal()},
-        "pending": {"GBP": Decimal(), "EUR": Decimal()},
+        typ: {currency: Decimal() for currency in RECONCILE_CURRENCIES}
+        for typ in RECONCILE_STATES.values()
     }
-    for pg, totals in data.items():
-        for typ in ("paid", "pending"):
-            gt[typ]["GBP"] += totals[typ]["GBP"]
-            gt[typ]["EUR"] += totals[typ]["EUR"]
+    for totals in data.values():
+        for typ, by_currency in totals.items():
+            for currency, total in by_currency.items():
+                gt[typ][currency] = gt[typ].get(currency, Decimal()) + total
+    return gt
+
+
+def refresh_reconcile_snapshot():
+    snapshot = {"generated": datetime.utcnow(), "data": reconcile_totals()}
+    cache.set(RECONCILE_SNAPSHOT_KEY, snapshot, timeout=0)
+    return snapshot
+
+
+@scheduled_task(minutes=10)
+def snapshot_reconcile_report():
+    refresh_reconcile_snapshot()
+
+
+@admin.route("/reports/reconcile")
+@admin.route("/reports/reconcile.<format>")
+def report_reconcile(format=None):
+    snapshot = None
+    if not request.args.get("live"):
+        snapshot = cache.get(RECONCILE_SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = refresh_reconcile_snapshot()
+
+    data = snapshot["data"]
+    gt = reconcile_grand_totals(data)
+
+    if format is None:
+        return render_template(
+            "admin/reports/reconcile.html",
+            data=data,
+            gt=gt,
+            generated=snapshot["generated"],
+        )
+
+    if format != "csv":
+        abort(404)
+
+    columns = [
+        (typ, currency)
+        for currency in RECONCILE_CURRENCIES
+        for typ in RECONCILE_STATES.values()
+    ]
+    buf = StringIO()
+    w = csv.writer(buf)
+    w.writerow(
+        ["Product Group"]
+        + [f"{typ.capitalize()} ({currency})" for typ, currency in columns]
+    )
+    for group_name, totals in data.items():
+        w.writerow([group_name] + [totals[typ][c] for typ, c in columns])
+    w.writerow(["Total"] + [gt[typ][currency] for typ, currency in columns])
 
-    return render_template("admin/reports/reconcile.html", data=data, gt=gt)
+    return send_file(
+        BytesIO(buf.getvalue().encode()),
+        "text/csv",
+        as_attachment=True,
+        download_name="reconcile.csv",
+    )
@@ -1,46 +1,176 @@
 from flask import request, redirect, url_for, render_template
+from sqlalchemy import case, func, literal, or_, select, union_all
+
+from main import db
+from models.cfp import Proposal
+from models.payment import Payment
+from models.product import Product
+from models.purchase import Purchase
 from models.user import User
-from models.payment import StripePayment, BankPayment
-from sqlalchemy import func
+
+from ..common import escape, json_response
+from ..metrics import admin_search_duration
 from . import admin
 
+SEARCH_PAGE_SIZE = 25
+
+# Ranks, best first. Exact matches on an ID, email or payment reference
+# are taken straight to the result from the search page.
+RANK_EXACT = 0
+RANK_FULL = 1
+RANK_PREFIX = 2
+RANK_CONTAINS = 3
+
+
+def search_admin(q, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Search users, payments, purchases and proposals with one ranked query.
+
+    Returns a page of results as (type, id, title, subtitle, rank) rows, best
+    matches first, and whether there's another page. Text matching uses the
+    trigram indexes on lower(name), lower(email) and lower(title); payment
+    references and IDs are matched exactly.
+    """
+    q = q.strip()
+    words = [escape(word) for word in q.lower().split(" ") if word]
+    if not words:
+        return [], False
+
+    def text_rank(*columns):
+        def match(pattern):
+            return or_(*[column.like(pattern, escape="^") for column in columns])
+
+        prefix = or_(*[match("{0}%".format(word)) for word in words])
+        contains = or_(*[match("%{0}%".format(word)) for word in words])
+
+        whens = [(prefix, RANK_PREFIX)]
+        if len(words) > 1:
+            # For a single word this would be the same as contains
+            whens.insert(0, (match("%{0}%".format("%".join(words))), RANK_FULL))
+        rank = case(*whens, else_=RANK_CONTAINS)
+        return rank, contains
+
+    id_match = int(q) if q.isdigit() else None
+
+    name = func.lower(User.name)
+    email = func.lower(User.email)
+    rank, contains = text_rank(name, email)
+    users = select(
+        literal("user").label("type"),
+        User.id,
+        User.name.label("title"),
+        User.email.label("subtitle"),
+        case((email == q.lower(), RANK_EXACT), else_=rank).label("rank"),
+    ).where(contains)
+
+    payment = Payment.__table__
+    payment_matches = [
+        payment.c.bankref == q.upper(),
+        payment.c.charge_id == q,
+        payment.c.intent_id == q,
+    ]
+    if id_match is not None:
+        payment_matches.append(payment.c.id == id_match)
+
+    payments = select(
+        literal("payment").label("type"),
+        payment.c.id,
+        func.coalesce(payment.c.bankref, payment.c.intent_id).label("title"),
+        payment.c.state.label("subtitle"),
+        literal(RANK_EXACT).label("rank"),
+    ).where(or_(*payment_matches))
+
+    rank, contains = text_rank(func.lower(Proposal.title))
+    proposal_matches = [contains]
+    if id_match is not None:
+        rank = case((Proposal.id == id_match, RANK_EXACT), else_=rank)
+        proposal_matches.append(Proposal.id == id_match)
+
+    proposals = select(
+        literal("proposal").label("type"),
+        Proposal.id,
+        Proposal.title,
+        Proposal.state.label("subtitle"),
+        rank.label("rank"),
+    ).where(or_(*proposal_matches))
 
-def to_query(q):
-    return " & ".join(q.split(" "))
+    branches = [users, payments, proposals]
+    if id_match is not None:
+        branches.append(
+            select(
+                literal("purchase").label("type"),
+                Purchase.id,
+                Product.display_name.label("title"),
+                Purchase.state.label("subtitle"),
+                literal(RANK_EXACT).label("rank"),
+            )
+            .join(Product, Purchase.product_id == Product.id)
+            .where(Purchase.id == id_match)
+        )
+
+    results = union_all(*branches).subquery()
+    query = (
+        select(results)
+        .order_by(results.c.rank, results.c.type, results.c.title, results.c.id)
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
+    )
+
+    with admin_search_duration.time():
+        rows = db.session.execute(query).all()
+
+    return rows[:per_page], len(rows) > per_page
+
+
+def result_url(row):
+    if row.type == "user":
+        return url_for(".user", user_id=row.id)
+    if row.type == "payment":
+        return url_for(".payment", payment_id=row.id)
+    if row.type == "purchase":
+        return url_for(".view_ticket", ticket_id=row.id)
+    if row.type == "proposal":
+        return url_for("cfp_review.update_proposal", proposal_id=row.id)
+    raise ValueError(f"Unknown search result type {row.type}")
 
 
 @admin.route("/search")
 def search():
     q = request.args["q"]
+    page = request.args.get("page", 1, type=int)
+    results, has_next = search_admin(q, page)
 
-    email_exact = User.query.filter(User.email == q).one_or_none()
-    if email_exact:
-        return redirect(url_for(".user", user_id=email_exact.id))
-
-    stripe_exact = StripePayment.query.filter(
-        (StripePayment.charge_id == q) | (StripePayment.intent_id == q)
-    ).one_or_none()
-    if stripe_exact:
-        return redirect(url_for(".payment", payment_id=stripe_exact.id))
-
-    bank_exact = BankPayment.query.filter(BankPayment.bankref == q).one_or_none()
-    if bank_exact:
-        return redirect(url_for(".payment", payment_id=bank_exact.id))
-
-    email_query = to_query(q.replace("@", " "))
-
-    # Careful with the following query. It'll stop using the indexes if you change the
-    # functions applied to the indexed columns. Which isn't really the end of the world given
-    # how small our dataset is, but I spent ages trying to work out how to get Alembic to add
-    # those indexes. So humour me.
-    results = User.query.filter(
-        func.to_tsvector("simple", User.name).match(
-            to_query(q), postgresql_regconfig="simple"
-        )
-        | (
-            func.to_tsvector("simple", func.replace(User.email, "@", " ")).match(
-                email_query, postgresql_regconfig="simple"
-            )
-        )
+    exact = [row for row in results if row.rank == RANK_EXACT]
+    if page == 1 and len(exact) == 1:
+        return redirect(result_url(exact[0]))
+
+    return render_template(
+        "admin/search-results.html",
+        q=q,
+        page=page,
+        results=[(row, result_url(row)) for row in results],
+        has_next=has_next,
     )
-    return render_template("admin/search-results.html", q=q, results=results)
+
+
+@admin.route("/search.json")
+@json_response
+def search_json():
+    q = request.args.get("q", "")
+    page = request.args.get("page", 1, type=int)
+    results, has_next = search_admin(q, page)
+
+    return {
+        "q": q,
+        "page": page,
+        "has_next": has_next,
+        "results": [
+            {
+                "type": row.type,
+                "id": row.id,
+                "title": row.title,
+                "subtitle": row.subtitle,
+                "url": result_url(row),
+            }
+            for row in results
+        ],
+    }
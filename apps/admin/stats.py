@@ -0,0 +1,71 @@
+"""
+    Purchase counts for the admin product pages.
+
+    Every group, product and tier's counts by purchase state come from a
+    single grouped query, which is cached briefly so that busy admin pages
+    don't each recount every purchase.
+"""
+from collections import Counter, defaultdict
+
+from sqlalchemy import func
+
+from main import cache, db
+from models.product import ProductGroup, Product, PriceTier
+from models.purchase import Purchase
+
+ADMIN_STATS_TIMEOUT = 10
+
+
+class PurchaseStats:
+    def __init__(self, rows, group_parents):
+        self.groups: dict[int, Counter] = defaultdict(Counter)
+        self.products: dict[int, Counter] = defaultdict(Counter)
+        self.tiers: dict[int, Counter] = defaultdict(Counter)
+
+        for group_id, product_id, tier_id, state, count in rows:
+            self.tiers[tier_id][state] += count
+            self.products[product_id][state] += count
+
+            # Group counts include everything in their child groups
+            while group_id is not None:
+                self.groups[group_id][state] += count
+                group_id = group_parents.get(group_id)
+
+    def for_group(self, group: ProductGroup) -> dict[str, int]:
+        return dict(self.groups.get(group.id, {}))
+
+    def for_product(self, product: Product) -> dict[str, int]:
+        return dict(self.products.get(product.id, {}))
+
+    def for_tier(self, tier: PriceTier) -> dict[str, int]:
+        return dict(self.tiers.get(tier.id, {}))
+
+    def count_for_tier(self, tier: PriceTier) -> int:
+        return sum(self.tiers.get(tier.id, {}).values())
+
+
+@cache.cached(timeout=ADMIN_STATS_TIMEOUT, key_prefix="admin_purchase_stats")
+def get_purchase_stats() -> PurchaseStats:
+    rows = (
+        Purchase.query.join(Product, Purchase.product_id == Product.id)
+        .with_entities(
+            Product.group_id,
+            Purchase.product_id,
+            Purchase.price_tier_id,
+            Purchase.state,
+            func.count(Purchase.id),
+        )
+        .group_by(
+            Product.group_id,
+            Purchase.product_id,
+            Purchase.price_tier_id,
+            Purchase.state,
+        )
+    ).all()
+
+    group_parents = dict(
+        db.session.query(ProductGroup.id, ProductGroup.parent_id).filter(
+            ProductGroup.parent_id.isnot(None)
+        )
+    )
+    return PurchaseStats(rows, group_parents)
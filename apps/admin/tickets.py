@@ -31,7 +31,7 @@ from .forms import (
 
 from ..common import feature_enabled
 from ..common.email import from_email
-from ..common.receipt import attach_tickets, set_tickets_emailed
+from ..common.receipt import attach_tickets, set_tickets_emailed, load_receipt_data
 from ..common.receipt import render_receipt, render_pdf
 
 
@@ -122,7 +122,8 @@ def tickets_issue_free(email):
             to=[user.email],
         )
 
-        already_emailed = set_tickets_emailed(user)
+        receipt = load_receipt_data([user])[user.id]
+        already_emailed = set_tickets_emailed(user, receipt)
         msg.body = render_template(
             "emails/tickets-free.txt",
             user=user,
@@ -133,7 +134,7 @@ def tickets_issue_free(email):
         )
 
         if feature_enabled("ISSUE_TICKETS"):
-            attach_tickets(msg, user)
+            attach_tickets(msg, user, receipt)
 
         msg.send()
         db.session.commit()
@@ -13,6 +13,7 @@ from sqlalchemy_continuum.utils import version_class
 
 from models.user import User, generate_signup_code
 from models.permission import Permission
+from ..common import escape
 from ..common.email import from_email
 from ..common.forms import Form
 from ..common.fields import EmailField
@@ -67,8 +68,13 @@ def users():
 
     user_query = request.args.get("search", "")
     if user_query:
+        # lower(...) LIKE can use the trigram indexes, ILIKE can't
+        pattern = "%{0}%".format(escape(user_query.lower()))
         select = db.select(User).where(
-            or_(User.name.ilike(f"%{user_query}%"), User.email.ilike(f"%{user_query}%"))
+            or_(
+                func.lower(User.name).like(pattern, escape="^"),
+                func.lower(User.email).like(pattern, escape="^"),
+            )
         )
     else:
         select = db.select(User)
@@ -1,8 +1,8 @@
 from flask import url_for
 from flask_restful import Resource
+from sqlalchemy.orm import joinedload
 from models import event_year
 from models.cfp import InstallationProposal
-from geoalchemy2.shape import to_shape
 
 from . import api
 
@@ -18,8 +18,8 @@ def render_installation(installation: InstallationProposal):
             _external=True,
         ),
         "description": installation.published_description,
-        "location": to_shape(installation.scheduled_venue.location).__geo_interface__
-        if installation.scheduled_venue and installation.scheduled_venue.location
+        "location": installation.scheduled_venue.__geo_interface__["geometry"]
+        if installation.scheduled_venue and installation.scheduled_venue.latlon
         else None,
     }
 
@@ -27,9 +27,11 @@ def render_installation(installation: InstallationProposal):
 class Installations(Resource):
     def get(self):
         result = []
-        proposals = InstallationProposal.query.filter(
-            InstallationProposal.is_accepted
-        ).all()
+        proposals = (
+            InstallationProposal.query.filter(InstallationProposal.is_accepted)
+            .options(joinedload(InstallationProposal.scheduled_venue))
+            .all()
+        )
         for proposal in proposals:
             result.append(render_installation(proposal))
         return result
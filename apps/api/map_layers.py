@@ -0,0 +1,210 @@
+"""
+    GeoJSON layers for the map.
+
+    Each layer is built with one query, with PostGIS encoding the geometry,
+    and the whole FeatureCollection is cached until a village, venue or
+    scheduled proposal changes. Requests with ?bbox=min_lon,min_lat,max_lon,max_lat
+    are filtered in the database using the GiST index on location. Responses
+    carry an ETag, a hash of the response body, so polling clients get a 304
+    until the layer's content changes.
+"""
+from datetime import timedelta
+from hashlib import sha1
+from itertools import chain
+import json
+from typing import Callable, Optional
+
+from flask import Response, abort, request
+from sqlalchemy import func, inspect
+
+from main import cache, db
+from models.cfp import Proposal, Venue
+from models.village import Village
+
+from ..common.generation import bump_generation, get_generation, track_changes
+
+MAP_LAYERS_GENERATION_KEY = "map_layers_generation"
+MAP_LAYER_TIMEOUT = 60 * 60
+
+# Changes to these attributes invalidate the map layers
+MAP_ATTRIBUTES = {
+    Village: ["name", "description", "url", "location"],
+    Venue: ["name", "default_for_types", "location"],
+    Proposal: [
+        "state",
+        "type",
+        "title",
+        "published_title",
+        "scheduled_time",
+        "scheduled_duration",
+        "scheduled_venue_id",
+        "hide_from_schedule",
+    ],
+}
+
+BBox = tuple[float, float, float, float]
+
+
+def parse_bbox(value: Optional[str]) -> Optional[BBox]:
+    if not value:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(","))
+    except ValueError:
+        abort(400, "bbox should be min_lon,min_lat,max_lon,max_lat")
+    return (min_lon, min_lat, max_lon, max_lat)
+
+
+def in_bbox(column, bbox: BBox):
+    # && uses the GiST index on the column
+    return column.intersects(func.ST_MakeEnvelope(*bbox, 4326))
+
+
+def village_features(bbox: Optional[BBox] = None) -> list[dict]:
+    query = db.session.query(
+        Village.id,
+        Village.name,
+        Village.description,
+        Village.url,
+        func.ST_AsGeoJSON(Village.location),
+    ).filter(Village.location.isnot(None))
+    if bbox:
+        query = query.filter(in_bbox(Village.location, bbox))
+
+    features = []
+    for id, name, description, url, geometry in query.order_by(Village.id):
+        if description is not None and len(description) > 230:
+            description = description[:230] + "..."
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {
+                    "id": id,
+                    "name": name,
+                    "description": description,
+                    "url": url,
+                },
+                "geometry": json.loads(geometry),
+            }
+        )
+    return features
+
+
+def venue_features(bbox: Optional[BBox] = None) -> list[dict]:
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.default_for_types,
+        func.ST_AsGeoJSON(Venue.location),
+    ).filter(Venue.location.isnot(None))
+    if bbox:
+        query = query.filter(in_bbox(Venue.location, bbox))
+
+    return [
+        {
+            "type": "Feature",
+            "properties": {
+                "id": id,
+                "name": name,
+                "default_for_types": default_for_types,
+            },
+            "geometry": json.loads(geometry),
+        }
+        for id, name, default_for_types, geometry in query.order_by(Venue.id)
+    ]
+
+
+def schedule_features(bbox: Optional[BBox] = None) -> list[dict]:
+    """Scheduled content, placed at its venue."""
+    query = (
+        db.session.query(
+            Proposal.id,
+            Proposal.type,
+            func.coalesce(Proposal.published_title, Proposal.title),
+            Proposal.scheduled_time,
+            Proposal.scheduled_duration,
+            Venue.name,
+            func.ST_AsGeoJSON(Venue.location),
+        )
+        .join(Venue, Venue.id == Proposal.scheduled_venue_id)
+        .filter(
+            Proposal.is_accepted,
+            Proposal.scheduled_time.isnot(None),
+            Proposal.scheduled_duration.isnot(None),
+            Proposal.hide_from_schedule.isnot(True),
+            Venue.location.isnot(None),
+        )
+    )
+    if bbox:
+        query = query.filter(in_bbox(Venue.location, bbox))
+
+    return [
+        {
+            "type": "Feature",
+            "properties": {
+                "id": id,
+                "type": type,
+                "title": title,
+                "venue": venue,
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(minutes=int(duration))).isoformat(),
+            },
+            "geometry": json.loads(geometry),
+        }
+        for id, type, title, start, duration, venue, geometry in query.order_by(
+            Proposal.scheduled_time, Proposal.id
+        )
+    ]
+
+
+def render_layer(features: list[dict]) -> tuple[str, str]:
+    """The response body for a layer, and its ETag."""
+    body = json.dumps({"type": "FeatureCollection", "features": features})
+    return body, sha1(body.encode("utf-8")).hexdigest()
+
+
+def layer_response(name: str, build_features: Callable[..., list[dict]]) -> Response:
+    bbox = parse_bbox(request.args.get("bbox"))
+
+    if bbox is None:
+        key = f"map_layers/{get_generation(MAP_LAYERS_GENERATION_KEY)}/{name}"
+        layer = cache.get(key)
+        if layer is None:
+            layer = render_layer(build_features())
+            cache.set(key, layer, timeout=MAP_LAYER_TIMEOUT)
+    else:
+        layer = render_layer(build_features(bbox))
+
+    body, etag = layer
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+def refresh_map_layers():
+    bump_generation(MAP_LAYERS_GENERATION_KEY)
+
+
+def _map_changed(session) -> bool:
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, tuple(MAP_ATTRIBUTES)):
+            return True
+
+    for obj in session.dirty:
+        # Proposals are subclassed by type, so check with isinstance
+        attributes = next(
+            (a for cls, a in MAP_ATTRIBUTES.items() if isinstance(obj, cls)), None
+        )
+        if attributes is None:
+            continue
+
+        state = inspect(obj)
+        if any(state.attrs[a].history.has_changes() for a in attributes):
+            return True
+    return False
+
+
+track_changes(_map_changed, refresh_map_layers)
@@ -6,6 +6,7 @@ from flask_login import current_user
 from flask_restful import Resource, abort
 
 from . import api
+from .map_layers import layer_response, schedule_features
 from main import db
 from models.cfp import Proposal
 from models.ical import CalendarEvent
@@ -181,8 +182,14 @@ class ScheduleMessage(Resource):
         return messages
 
 
+class ScheduleMap(Resource):
+    def get(self):
+        return layer_response("schedule", schedule_features)
+
+
 api.add_resource(ProposalResource, "/proposal/<int:proposal_id>")
 api.add_resource(FavouriteProposal, "/proposal/<int:proposal_id>/favourite")
 api.add_resource(FavouriteExternal, "/external/<int:event_id>/favourite")
 api.add_resource(ScheduleMessage, "/schedule_messages")
 api.add_resource(UpdateLotteryPreferences, "/schedule/tickets/<proposal_type>/preferences")
+api.add_resource(ScheduleMap, "/schedule.geojson")
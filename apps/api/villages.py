@@ -3,12 +3,12 @@ from flask_login import current_user
 from flask_restful import Resource
 from models.user import User
 from models.village import Village, VillageMember
-from models.cfp import Venue
 from shapely.geometry import Point
-from geoalchemy2.shape import to_shape, from_shape
+from geoalchemy2.shape import from_shape
 
 from main import db
 from . import api
+from .map_layers import layer_response, village_features, venue_features
 
 
 def render_village(village: Village):
@@ -18,23 +18,16 @@ def render_village(village: Village):
         "url": village.url,
         "description": village.description,
         "location": (
-            to_shape(village.location).__geo_interface__ if village.location else None
+            {"type": "Point", "coordinates": (village.longitude, village.latitude)}
+            if village.latlon
+            else None
         ),
     }
 
 
 class VillagesMap(Resource):
     def get(self):
-        features = []
-        for obj in Village.query.filter(Village.location.isnot(None)):
-            data = obj.__geo_interface__
-            if data["properties"].get("description") is not None:
-                desc = data["properties"]["description"]
-                data["properties"]["description"] = (
-                    (desc[:230] + "...") if len(desc) > 230 else desc
-                )
-            features.append(data)
-        return {"type": "FeatureCollection", "features": features}
+        return layer_response("villages", village_features)
 
 
 class Villages(Resource):
@@ -103,10 +96,7 @@ class VillageResource(Resource):
 
 class VenuesMap(Resource):
     def get(self):
-        features = []
-        for obj in Venue.query.filter(Venue.location.isnot(None)):
-            features.append(obj.__geo_interface__)
-        return {"type": "FeatureCollection", "features": features}
+        return layer_response("venues", venue_features)
 
 
 api.add_resource(VillagesMap, "/villages.geojson")
@@ -1,5 +1,9 @@
 from decorator import decorator
 from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import hmac
+import json
 import re
 
 from flask import (
@@ -17,14 +21,15 @@ from flask import (
 )
 from markupsafe import Markup
 from flask_login import current_user
-from sqlalchemy import func
+from sqlalchemy import case, func, or_, select
 
 from main import db
 from models.arrivals import ArrivalsView
 from models.permission import Permission
 from models.purchase import Purchase, CheckinStateException
-from models.user import User, checkin_code_re
-from .common import json_response
+from models.user import User, checkin_code_re, generate_checkin_code
+from .common import escape, json_response
+from .metrics import arrivals_search_duration
 
 arrivals = Blueprint("arrivals", __name__)
 
@@ -103,48 +108,65 @@ def user_from_code(query):
     return user
 
 
-def users_from_query(query):
-    names = User.query.order_by(User.name)
-    emails = User.query.order_by(User.email)
+def search_users(query, product_ids, limit=10):
+    """Find users matching a typed query, ranked and with their purchase counts.
 
-    def escape(like):
-        return like.replace("^", "^^").replace("%", "^%")
-
-    def name_match(pattern, query):
-        return (
-            names.filter(User.name.ilike(pattern.format(query), escape="^"))
-            .limit(10)
-            .all()
-        )
-
-    def email_match(pattern, query):
-        return (
-            emails.filter(User.email.ilike(pattern.format(query), escape="^"))
-            .limit(10)
-            .all()
-        )
-
-    fulls = []
-    starts = []
-    contains = []
+    For several words, users whose name or email contains them all in order
+    rank first. Then come those where a word is a prefix of their name or
+    email, then any substring match. Matching uses the trigram indexes on lower(name) and
+    lower(email), and paid/redeemed purchase counts for the given products
+    are fetched in the same query.
+    """
     query = query.lower()
     words = list(map(escape, filter(None, query.split(" "))))
+    if not words:
+        return []
+
+    name = func.lower(User.name)
+    email = func.lower(User.email)
+
+    def match(pattern):
+        return or_(name.like(pattern, escape="^"), email.like(pattern, escape="^"))
+
+    starts = or_(*[match("{0}%".format(word)) for word in words])
+    contains = or_(*[match("%{0}%".format(word)) for word in words])
+
+    whens = [(starts, 1)]
+    if len(words) > 1:
+        # For a single word this would be the same as contains
+        whens.insert(0, (match("%{0}%".format("%".join(words))), 0))
+    rank = case(*whens, else_=2).label("rank")
+    matches = (
+        select(User.id, User.name, User.email, rank)
+        .where(contains)
+        .order_by(rank, User.name, User.email)
+        .limit(limit)
+        .subquery()
+    )
 
-    if " " in query:
-        fulls += name_match("%{0}%", "%".join(words))
-        fulls += email_match("%{0}%", "%".join(words))
-
-    for word in words:
-        starts += name_match("{0}%", word)
-        contains += name_match("%{0}%", word)
-
-    for word in words:
-        starts += email_match("{0}%", word)
-        contains += email_match("%{0}%", word)
+    def purchase_count(*criteria):
+        return (
+            select(func.count(Purchase.id))
+            .where(
+                Purchase.owner_id == matches.c.id,
+                Purchase.is_paid_for,
+                Purchase.product_id.in_(product_ids),
+                *criteria,
+            )
+            .scalar_subquery()
+        )
 
-    # make unique, but keep in order
-    users = list(OrderedDict.fromkeys(fulls + starts + contains))[:10]
-    return users
+    # Counts are computed in the outer query so they're only evaluated for the matched rows
+    results = db.session.execute(
+        select(
+            matches.c.id,
+            matches.c.name,
+            matches.c.email,
+            purchase_count().label("purchases"),
+            purchase_count(Purchase.redeemed == True).label("completes"),  # noqa: E712
+        ).order_by(matches.c.rank, matches.c.name, matches.c.email)
+    )
+    return results.all()
 
 
 @arrivals.route("/search", methods=["GET", "POST"])
@@ -172,37 +194,18 @@ def search(query=None):
     if user:
         return {"location": url_for(".checkin", user_id=user.id, source="code")}
 
-    users_ordered = users_from_query(query)
-    users = User.query.filter(User.id.in_([u.id for u in users_ordered]))
-
     product_ids = [p.id for p in g.arrivals_view.products]
-    purchases = (
-        users.join(User.owned_purchases)
-        .filter_by(is_paid_for=True)
-        .filter(Purchase.product_id.in_(product_ids))
-        .group_by(User.id)
-        .with_entities(User.id, func.count(User.id))
-    )
-    purchases = dict(purchases)
-
-    completes = (
-        users.join(User.owned_purchases)
-        .filter_by(is_paid_for=True)
-        .filter_by(redeemed=True)
-        .filter(Purchase.product_id.in_(product_ids))
-    )
-
-    completes = completes.group_by(User).with_entities(User.id, func.count(User.id))
-    completes = dict(completes)
+    with arrivals_search_duration.time():
+        results = search_users(query, product_ids)
 
     user_data = []
-    for u in users:
+    for u in results:
         user = {
             "id": u.id,
             "name": u.name,
             "email": u.email,
-            "purchases": purchases.get(u.id, 0),
-            "completes": completes.get(u.id, 0),
+            "purchases": u.purchases,
+            "completes": u.completes,
             "url": url_for(".checkin", user_id=u.id, source="typed"),
         }
         user_data.append(user)
@@ -212,6 +215,137 @@ def search(query=None):
     return data
 
 
+def checkin_code_hash(code):
+    """Hash of a check-in code, so offline stations can match scans without holding the codes."""
+    return hashlib.sha256(code.encode("ascii")).hexdigest()
+
+
+def sign_snapshot(body):
+    """Sign a snapshot with its own key, so offline stations which verify
+    snapshots never hold a key that can sign sessions or check-in codes."""
+    return hmac.new(
+        app.config["ARRIVALS_SNAPSHOT_KEY"].encode("utf-8"),
+        b"arrivals-snapshot-" + body,
+        digestmod=hashlib.sha256,
+    ).hexdigest()
+
+
+@arrivals.route("/snapshot")
+@arrivals_required
+def snapshot():
+    """Export the paid purchases for the current view, for scanning while offline.
+
+    The response body is signed with an HMAC in the X-Snapshot-Signature header,
+    using ARRIVALS_SNAPSHOT_KEY. Snapshots aren't available if that isn't set.
+    """
+    if not app.config.get("ARRIVALS_SNAPSHOT_KEY"):
+        app.logger.warning("ARRIVALS_SNAPSHOT_KEY is not set, not exporting a snapshot")
+        abort(404)
+
+    product_ids = [p.id for p in g.arrivals_view.products]
+    rows = (
+        Purchase.query.join(Purchase.owner)
+        .filter(Purchase.product_id.in_(product_ids), Purchase.is_paid_for)
+        .order_by(User.id, Purchase.id)
+        .with_entities(
+            User.id, User.name, Purchase.id, Purchase.product_id, Purchase.redeemed
+        )
+    )
+
+    users = []
+    for user_id, name, purchase_id, product_id, redeemed in rows:
+        if not users or users[-1]["id"] != user_id:
+            code = generate_checkin_code(app.config["SECRET_KEY"], user_id)
+            users.append(
+                {
+                    "id": user_id,
+                    "name": name,
+                    "code_hash": checkin_code_hash(code),
+                    "purchases": [],
+                }
+            )
+        users[-1]["purchases"].append(
+            {"id": purchase_id, "product_id": product_id, "redeemed": redeemed}
+        )
+
+    data = {
+        "view": g.arrivals_view.name,
+        "generated": datetime.utcnow().isoformat(),
+        "users": users,
+    }
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    response = app.response_class(body, mimetype="application/json")
+    response.headers["X-Snapshot-Signature"] = sign_snapshot(body)
+    return response
+
+
+def apply_redemptions(purchase_ids, product_ids):
+    """Redeem a batch of purchases scanned offline.
+
+    This is idempotent: purchases which are already redeemed are reported
+    separately rather than as failures, so a station can safely resend a batch.
+    """
+    purchases = (
+        Purchase.query.filter(Purchase.id.in_(purchase_ids))
+        .order_by(Purchase.id)
+        .with_for_update()
+        .all()
+    )
+    purchases_by_id = {p.id: p for p in purchases}
+
+    result = {"redeemed": [], "already_redeemed": [], "conflicts": []}
+    for purchase_id in purchase_ids:
+        purchase = purchases_by_id.get(purchase_id)
+        if purchase is None:
+            result["conflicts"].append({"id": purchase_id, "reason": "not_found"})
+        elif purchase.product_id not in product_ids:
+            result["conflicts"].append({"id": purchase_id, "reason": "wrong_view"})
+        elif not purchase.is_paid_for:
+            result["conflicts"].append({"id": purchase_id, "reason": "not_paid"})
+        elif purchase.redeemed:
+            result["already_redeemed"].append(purchase_id)
+        else:
+            try:
+                purchase.redeem()
+            except CheckinStateException as e:
+                result["conflicts"].append({"id": purchase_id, "reason": str(e)})
+            else:
+                result["redeemed"].append(purchase_id)
+
+    return result
+
+
+@arrivals.route("/sync", methods=["POST"])
+@json_response
+@arrivals_required
+def sync():
+    """Apply redemptions made offline against a snapshot.
+
+    Expects a JSON body of the form {"redemptions": [purchase_id, ...]}.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("redemptions"), list):
+        abort(400)
+
+    try:
+        purchase_ids = list(OrderedDict.fromkeys(int(i) for i in data["redemptions"]))
+    except (TypeError, ValueError):
+        abort(400)
+
+    product_ids = {p.id for p in g.arrivals_view.products}
+    result = apply_redemptions(purchase_ids, product_ids)
+    db.session.commit()
+
+    if result["conflicts"]:
+        app.logger.warning(
+            "Offline sync for %s had %s conflicts",
+            g.arrivals_view.name,
+            len(result["conflicts"]),
+        )
+    return result
+
+
 @arrivals.route("/arrivals/<int:user_id>", methods=["GET", "POST"])
 @arrivals.route("/arrivals/<int:user_id>/<source>", methods=["GET", "POST"])
 @arrivals_required
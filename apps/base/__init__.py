@@ -1,3 +1,4 @@
+from decimal import Decimal
 import os
 from typing import Optional
 
@@ -15,29 +16,23 @@ from flask import (
 from flask_login import current_user
 import requests
 
-from main import cache
-from models.product import Price, Product, ProductView, ProductViewProduct, PriceTier
+from models.product import get_view_catalogue
 from models.site_state import get_site_state
 
 
 base = Blueprint("base", __name__, cli_group=None)
 
 
-@cache.cached(timeout=60, key_prefix="get_full_price")
-def get_full_price() -> Optional[Price]:
-    full = (
-        ProductView.query.filter_by(name="main")
-        .join(ProductViewProduct, Product, PriceTier)
-        .filter_by(active=True)
-        .order_by(ProductViewProduct.order)
-        .with_entities(PriceTier)
-        .first()
-    )
-
-    if full is not None:
-        return full.get_price("GBP")
+def get_full_price() -> Optional[Decimal]:
+    """The GBP price of the first ticket on sale in the main view."""
+    catalogue = get_view_catalogue("main")
+    if catalogue is None or not catalogue["tiers"]:
+        return None
 
-    return None
+    price_int = catalogue["tiers"][0]["prices"].get("GBP")
+    if price_int is None:
+        return None
+    return Decimal(price_int) / 100
 
 
 @base.route("/")
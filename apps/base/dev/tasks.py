@@ -7,10 +7,10 @@ from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from main import db
 
 from models.volunteer.venue import VolunteerVenue
-from models.volunteer.shift import Shift
 from models.volunteer.role import Role
 
 from apps.cfp.tasks import create_tags
+from apps.volunteer.rota_generator import apply_rota_diff, diff_rota
 from models.payment import BankAccount
 from models.site_state import SiteState, refresh_states
 from models.feature_flag import FeatureFlag, refresh_flags
@@ -208,8 +208,9 @@ def volunteer_data():
 
 
 @dev_cli.command("volunteer_shifts")
-def volunteer_shifts():
-    """Make fake volunteer shifts"""
+@click.option("--dry-run", is_flag=True, help="Show the changes without making them")
+def volunteer_shifts(dry_run):
+    """Make fake volunteer shifts, or bring existing ones into line"""
     # First = first start time. Final = end of last shift
     start_date = parse(app.config["EVENT_START"]).set(
         hour=0,
@@ -560,29 +561,25 @@ def volunteer_shifts():
         },
     }
 
-    for shift_role in shift_list:
-        role = Role.get_by_name(shift_role)
+    for templates in shift_list.values():
+        for ranges in templates.values():
+            for shift_range in ranges:
+                shift_range["first"] = start_date + shift_range["first"]
+                shift_range["final"] = start_date + shift_range["final"]
+                shift_range["changeover"] = 0
 
-        if role.shifts:
-            app.logger.info("Skipping making shifts for role: %s" % role.name)
-            continue
-
-        for shift_venue in shift_list[shift_role]:
-            venue = VolunteerVenue.get_by_name(shift_venue)
-
-            for shift_ranges in shift_list[shift_role][shift_venue]:
-                shifts = Shift.generate_for(
-                    role=role,
-                    venue=venue,
-                    first=start_date + shift_ranges["first"],
-                    final=start_date + shift_ranges["final"],
-                    min=shift_ranges["min"],
-                    max=shift_ranges["max"],
-                    changeover=0,
-                )
-                for s in shifts:
-                    db.session.add(s)
+    diff = diff_rota(shift_list)
+    click.echo(f"Volunteer shifts: {diff.summary()}")
+    if dry_run:
+        for shift in diff.inserts:
+            click.echo(f"Add: {shift}")
+        for shift in diff.updates:
+            click.echo(f"Update: {shift}")
+        for shift_id in diff.deletes:
+            click.echo(f"Delete: shift {shift_id}")
+        return
 
+    apply_rota_diff(diff)
     db.session.commit()
 
 
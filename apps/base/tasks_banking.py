@@ -111,7 +111,12 @@ def load_ofx(ofx_file):
 
 @base.cli.command("sync_wisetransfer")
 @click.argument("profile_id", type=click.INT, required=False)
-def sync_wisetransfer(profile_id):
+@click.option(
+    "--full/--incremental",
+    default=True,
+    help="Fetch the last 7 days (the default), or only since the last sync",
+)
+def sync_wisetransfer(profile_id, full):
     """Sync transactions from all accounts associated with a Wise profile"""
     if profile_id is None:
         profile_id = wise_business_profile()
@@ -120,7 +125,7 @@ def sync_wisetransfer(profile_id):
     for tw_account in tw_accounts:
         # Each sync is performed in a separate transaction
         sync_wise_statement(
-            profile_id, tw_account.borderless_account_id, tw_account.currency
+            profile_id, tw_account.borderless_account_id, tw_account.currency, full=full
         )
 
 
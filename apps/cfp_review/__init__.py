@@ -1,6 +1,6 @@
 from flask import Blueprint, request, session, redirect, url_for, abort
 from flask_login import current_user
-from sqlalchemy import func, or_
+from sqlalchemy import case, func, or_, select
 
 from models.cfp import (
     Proposal,
@@ -11,6 +11,8 @@ from models.cfp import (
     ORDERED_STATES,
     HUMAN_CFP_TYPES,
 )
+from models.purchase import Ticket
+from models.user import User
 from ..common import require_permission
 
 cfp_review = Blueprint("cfp_review", __name__)
@@ -37,7 +39,7 @@ def before_request():
         return redirect(url_for("users.login", next=request.path))
 
     # Check if the user has any CFP permissions
-    if len(set(p.name for p in current_user.permissions) & CFP_PERMISSIONS) == 0:
+    if not current_user.permission_names & CFP_PERMISSIONS:
         abort(404)
 
     if (
@@ -73,6 +75,41 @@ def get_proposal_sort_dict(parameters):
     }
 
 
+def get_proposal_sort_columns(parameters):
+    """SQL equivalent of get_proposal_sort_dict for sorting in the database.
+
+    Returns the sort columns, ending with Proposal.id so every row has a
+    distinct key, and whether they're reversed. Queries using the "user"
+    sort must join Proposal.user.
+    """
+    title = func.lower(Proposal.title)
+    sort_keys = {
+        "state": [Proposal.state, Proposal.modified, title],
+        "date": [Proposal.modified, title],
+        "type": [Proposal.type, title],
+        "user": [func.lower(User.name), title],
+        "title": [title],
+        "ticket": [
+            select(Ticket.id).where(Ticket.owner_id == Proposal.user_id).exists(),
+            title,
+        ],
+        "notice": [
+            case(
+                {"1 week": 0, "1 month": 1, "> 1 month": 2},
+                value=Proposal.notice_required,
+                else_=-1,
+            ),
+            title,
+        ],
+        "duration": [func.coalesce(Proposal.scheduled_duration, 0)],
+        "favourites": [Proposal.favourite_count],
+    }
+
+    sort_by_key = parameters.get("sort_by")
+    columns = sort_keys.get(sort_by_key, sort_keys["state"]) + [Proposal.id]
+    return columns, bool(parameters.get("reverse"))
+
+
 def get_next_proposal_to(prop, state):
     return (
         Proposal.query.filter(
@@ -2,14 +2,13 @@ from collections import defaultdict, Counter
 import csv
 from datetime import timedelta
 from http import HTTPStatus
-from io import BytesIO, StringIO
+from io import StringIO
 from itertools import combinations
 import json
 
 import dateutil
 from flask import (
     redirect,
-    send_file,
     url_for,
     request,
     abort,
@@ -17,17 +16,20 @@ from flask import (
     flash,
     session,
     jsonify,
+    Response,
+    stream_with_context,
     current_app as app,
 )
 from flask_login import current_user
 from flask_mailman import EmailMessage
 from models.permission import Permission
-from sqlalchemy import func, exists, select
-from sqlalchemy.orm import joinedload, undefer
+from sqlalchemy import func, exists, select, tuple_
+from sqlalchemy.orm import contains_eager, selectinload, undefer
 
 from main import db, external_url
-from .estimation import get_cfp_estimate
+from .estimation import get_cfp_estimates
 from .majority_judgement import calculate_max_normalised_score
+from .vote_stats import get_vote_summary
 from models.cfp import (
     CFPMessage,
     CFPVote,
@@ -64,7 +66,7 @@ from . import (
     cfp_review,
     admin_required,
     schedule_required,
-    get_proposal_sort_dict,
+    get_proposal_sort_columns,
     get_next_proposal_to,
     copy_request_args,
 )
@@ -105,12 +107,21 @@ def bool_qs(val):
     raise ValueError("Invalid querystring boolean")
 
 
-def filter_proposal_request() -> tuple[list[Proposal], bool]:
+PROPOSALS_PAGE_SIZE = 100
+
+
+def get_proposal_filter_query():
+    """Returns (query, filtered) for the proposal filters in the request args.
+
+    The query is joined to the proposal's user, but isn't sorted.
+    """
     bool_names = ["one_day", "needs_help", "needs_money"]
     bool_vals = [request.args.get(n, type=bool_qs) for n in bool_names]
     bool_dict = {n: v for n, v in zip(bool_names, bool_vals) if v is not None}
 
-    proposal_query = Proposal.query.filter_by(**bool_dict)
+    proposal_query = Proposal.query.join(Proposal.user).filter(
+        *[getattr(Proposal, n) == v for n, v in bool_dict.items()]
+    )
 
     filtered = False
 
@@ -127,25 +138,21 @@ def filter_proposal_request() -> tuple[list[Proposal], bool]:
     show_user_scheduled = request.args.get("show_user_scheduled", type=bool_qs)
     if show_user_scheduled is None or show_user_scheduled is False:
         filtered = False
-        proposal_query = proposal_query.filter_by(user_scheduled=False)
+        proposal_query = proposal_query.filter(Proposal.user_scheduled.is_(False))
     else:
         filtered = True
-        proposal_query = proposal_query.filter_by(user_scheduled=True)
+        proposal_query = proposal_query.filter(Proposal.user_scheduled.is_(True))
 
-    # This block has to be last because it will join to the user table
     needs_ticket = request.args.get("needs_ticket", type=bool_qs)
     if needs_ticket is True:
         filtered = True
-        proposal_query = (
-            proposal_query.join(Proposal.user)
-            .filter_by(will_have_ticket=False)
-            .filter(
-                ~exists().where(
-                    Ticket.state.in_(("paid", "payment-pending"))
-                    & (Ticket.type == "admission_ticket")
-                    & (Ticket.owner_id == User.id)
-                )
-            )
+        proposal_query = proposal_query.filter(
+            User.will_have_ticket.is_(False),
+            ~exists().where(
+                Ticket.state.in_(("paid", "payment-pending"))
+                & (Ticket.type == "admission_ticket")
+                & (Ticket.owner_id == User.id)
+            ),
         )
 
     tags = request.args.getlist("tags")
@@ -153,58 +160,115 @@ def filter_proposal_request() -> tuple[list[Proposal], bool]:
         if len(tags) > 1:
             flash("'untagged' in 'tags' arg, other tags ignored")
         filtered = True
-        # join(..outer=True) == left outer join
-        proposal_query = proposal_query.join(Proposal.tags, isouter=True).filter(
-            Tag.id.is_(None)
-        )
+        proposal_query = proposal_query.filter(~Proposal.tags.any())
 
     elif tags:
         filtered = True
-        proposal_query = proposal_query.join(Proposal.tags).filter(
-            Proposal.tags.any(Tag.tag.in_(tags))
+        proposal_query = proposal_query.filter(Proposal.tags.any(Tag.tag.in_(tags)))
+
+    return proposal_query, filtered
+
+
+def filter_proposal_request() -> tuple[list[Proposal], bool]:
+    proposal_query, filtered = get_proposal_filter_query()
+    sort_columns, reverse = get_proposal_sort_columns(request.args)
+    if reverse:
+        sort_columns = [c.desc() for c in sort_columns]
+
+    proposals = (
+        proposal_query.options(contains_eager(Proposal.user))
+        .order_by(*sort_columns)
+        .all()
+    )
+    return proposals, filtered
+
+
+def get_proposal_page(proposal_query, after=None, per_page=PROPOSALS_PAGE_SIZE):
+    """Keyset-paginate a filtered proposal query, sorted as the request args ask.
+
+    Returns the page of proposals after the proposal with ID `after`, and a
+    count of how many proposals there are from the start of the page onwards.
+    """
+    sort_columns, reverse = get_proposal_sort_columns(request.args)
+
+    if after is not None:
+        last = (
+            db.session.query(*sort_columns)
+            .select_from(Proposal)
+            .join(Proposal.user)
+            .filter(Proposal.id == after)
+            .one_or_none()
         )
+        if last is not None:
+            key = tuple_(*sort_columns)
+            proposal_query = proposal_query.filter(
+                key < tuple_(*last) if reverse else key > tuple_(*last)
+            )
 
-    sort_dict = get_proposal_sort_dict(request.args)
-    proposal_query = (
-        proposal_query.options(joinedload(Proposal.user))
-        .options(joinedload("user.owned_tickets"))
-        .options(joinedload(Proposal.tags))
+    if reverse:
+        sort_columns = [c.desc() for c in sort_columns]
+
+    rows = (
+        proposal_query.add_columns(func.count().over().label("remaining"))
+        .options(contains_eager(Proposal.user))
+        .options(selectinload("user.owned_tickets"))
         .options(undefer(Proposal.favourite_count))
+        .order_by(*sort_columns)
+        .limit(per_page)
+        .all()
     )
-    proposals = proposal_query.all()
-    proposals.sort(**sort_dict)
-    return proposals, filtered
+    remaining = rows[0].remaining if rows else 0
+    return [row[0] for row in rows], remaining
 
 
 @cfp_review.route("/proposals")
 @admin_required
 def proposals():
-    proposals, filtered = filter_proposal_request()
-    non_sort_query_string = copy_request_args(request.args)
-
-    if "sort_by" in non_sort_query_string:
-        del non_sort_query_string["sort_by"]
-
-    if "reverse" in non_sort_query_string:
-        del non_sort_query_string["reverse"]
-
-    tag_counts = dict(
-        db.session
-        .query(Tag.tag, db.func.count(ProposalTag.c.proposal_id))
+    proposal_query, filtered = get_proposal_filter_query()
+    after = request.args.get("after", type=int)
+    start = request.args.get("start", 0, type=int)
+    proposals, remaining = get_proposal_page(proposal_query, after)
+
+    page_query_string = copy_request_args(request.args)
+    for arg in ["after", "start"]:
+        page_query_string.pop(arg, None)
+
+    non_sort_query_string = dict(page_query_string)
+    for arg in ["sort_by", "reverse"]:
+        non_sort_query_string.pop(arg, None)
+
+    # Every tag's count among the filtered proposals and in total
+    filtered_ids = proposal_query.with_entities(Proposal.id).subquery()
+    tag_counts = {
+        tag: [filtered_count, total_count]
+        for tag, filtered_count, total_count in db.session.query(
+            Tag.tag,
+            func.count(filtered_ids.c.id),
+            func.count(ProposalTag.c.proposal_id),
+        )
         .select_from(Tag)
         .outerjoin(ProposalTag)
+        .outerjoin(filtered_ids, filtered_ids.c.id == ProposalTag.c.proposal_id)
         .group_by(Tag.tag)
         .order_by(Tag.tag)
-        .all()
-    )
-    tag_counts = {tag: [0, prop_count] for tag, prop_count in tag_counts.items()}
-    for prop in proposals:
-        for t in prop.tags:
-            tag_counts[t.tag][0] = tag_counts[t.tag][0] + 1
+    }
+
+    next_page = None
+    if len(proposals) < remaining:
+        next_page = url_for(
+            ".proposals",
+            after=proposals[-1].id,
+            start=start + len(proposals),
+            **page_query_string,
+        )
 
     return render_template(
         "cfp_review/proposals.html",
         proposals=proposals,
+        start=start,
+        matching_proposals=start + remaining,
+        next_page=next_page,
+        page_qs=page_query_string,
         new_qs=non_sort_query_string,
         filtered=filtered,
         total_proposals=Proposal.query.count(),
@@ -249,9 +313,24 @@ def export(format: str):
             val = getattr(val, field)
         return val
 
-    proposals, _ = filter_proposal_request()
-    if format == "csv":
-        mime = "text/csv"
+    if format not in ("csv", "json"):
+        abort(HTTPStatus.BAD_REQUEST, "Unsupported export format")
+
+    proposal_query, _ = get_proposal_filter_query()
+    sort_columns, reverse = get_proposal_sort_columns(request.args)
+    if reverse:
+        sort_columns = [c.desc() for c in sort_columns]
+
+    # Stream the export rather than building it all in memory
+    proposals = (
+        proposal_query.options(contains_eager(Proposal.user))
+        .options(selectinload(Proposal.tags))
+        .options(undefer(Proposal.favourite_count))
+        .order_by(*sort_columns)
+        .yield_per(PROPOSALS_PAGE_SIZE)
+    )
+
+    def generate_csv():
         buf = StringIO()
         w = csv.writer(buf)
         # Header row
@@ -264,20 +343,29 @@ def export(format: str):
                     cell = ",".join(t.tag for t in cell)
                 cells.append(cell)
             w.writerow(cells)
-        out = buf.getvalue()
-    elif format == "json":
-        mime = "application/json"
-        out = json.dumps(
-            [{a: get_field(p, a) for a in fields} for p in proposals],
-            default=str,
-        )
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    def generate_json():
+        yield "["
+        for i, p in enumerate(proposals):
+            if i > 0:
+                yield ","
+            yield json.dumps({a: get_field(p, a) for a in fields}, default=str)
+        yield "]"
+
+    if format == "csv":
+        mime = "text/csv"
+        generator = generate_csv()
     else:
-        abort(HTTPStatus.BAD_REQUEST, "Unsupported export format")
-    return send_file(
-        BytesIO(out.encode()),
-        mime,
-        as_attachment=True,
-        download_name=f"proposals.{format}",
+        mime = "application/json"
+        generator = generate_json()
+
+    return Response(
+        stream_with_context(generator),
+        mimetype=mime,
+        headers={"Content-Disposition": f"attachment; filename=proposals.{format}"},
     )
 
 
@@ -390,13 +478,9 @@ def find_next_proposal_id(prop):
         res = get_next_proposal_to(prop, prop.state)
         return res.id if res else None
 
-    proposals, _ = filter_proposal_request()
-
-    # FIXME: index might fail
-    idx = proposals.index(prop) + 1
-    if len(proposals) <= idx:
-        return None
-    return proposals[idx].id
+    proposal_query, _ = get_proposal_filter_query()
+    proposals, _ = get_proposal_page(proposal_query, after=prop.id, per_page=1)
+    return proposals[0].id if proposals else None
 
 
 @cfp_review.route("/proposals/<int:proposal_id>", methods=["GET", "POST"])
@@ -756,85 +840,23 @@ def message_batch():
     )
 
 
-def get_vote_summary_sort_args(parameters):
-    sort_keys = {
-        # Notes == unread first then by date
-        "notes": lambda p: (
-            p[0].get_unread_vote_note_count() > 0,
-            p[0].get_total_note_count(),
-        ),
-        "date": lambda p: p[0].created,
-        "title": lambda p: p[0].title.lower(),
-        "votes": lambda p: p[1].get("voted", 0),
-        "blocked": lambda p: p[1].get("blocked", 0),
-        "recused": lambda p: p[1].get("recused", 0),
-    }
-
-    sort_by_key = parameters.get("sort_by")
-    return {
-        "key": sort_keys.get(sort_by_key, sort_keys["notes"]),
-        "reverse": bool(parameters.get("reverse")),
-    }
-
-
 @cfp_review.route("/votes")
 @admin_required
 def vote_summary():
-    proposal_query = (
-        Proposal.query
-        if request.args.get("all", None)
-        else Proposal.query.filter_by(state="anonymised")
+    page = max(request.args.get("page", 1, type=int), 1)
+    summary, proposals_with_counts, has_next = get_vote_summary(
+        all_proposals=bool(request.args.get("all", None)),
+        sort_by=request.args.get("sort_by"),
+        reverse=bool(request.args.get("reverse")),
+        page=page,
     )
 
-    proposals = proposal_query.order_by("modified").all()
-
-    proposals_with_counts = []
-    summary = {
-        "notes_total": 0,
-        "notes_unread": 0,
-        "blocked_total": 0,
-        "recused_total": 0,
-        "voted_total": 0,
-        "min_votes": None,
-        "max_votes": 0,
-    }
-
-    for prop in proposals:
-        state_counts = {}
-        vote_count = len([v for v in prop.votes if v.state == "voted"])
-
-        if summary["min_votes"] is None or summary["min_votes"] > vote_count:
-            summary["min_votes"] = vote_count
-
-        if summary["max_votes"] < vote_count:
-            summary["max_votes"] = vote_count
-
-        for v in prop.votes:
-            # Update proposal values
-            state_counts.setdefault(v.state, 0)
-            state_counts[v.state] += 1
-
-            # Update note stats
-            if v.note is not None:
-                summary["notes_total"] += 1
-
-            if v.note is not None and not v.has_been_read:
-                summary["notes_unread"] += 1
-
-            # State stats
-            if v.state in ("voted", "blocked", "recused"):
-                summary[v.state + "_total"] += 1
-
-        proposals_with_counts.append((prop, state_counts))
-
-    # sort_key = lambda p: (p[0].get_unread_vote_note_count() > 0, p[0].created)
-    sort_args = get_vote_summary_sort_args(request.args)
-    proposals_with_counts.sort(**sort_args)
-
     return render_template(
         "cfp_review/vote_summary.html",
         summary=summary,
         proposals_with_counts=proposals_with_counts,
+        page=page,
+        has_next=has_next,
     )
 
 
@@ -1099,10 +1121,7 @@ def rank():
             del session["min_score"]
 
     proposal_types = ["talk", "workshop", "performance", "youthworkshop"]
-    estimates = {
-        proposal_type: get_cfp_estimate(proposal_type)
-        for proposal_type in proposal_types
-    }
+    estimates = get_cfp_estimates()
 
     return render_template(
         "cfp_review/rank.html",
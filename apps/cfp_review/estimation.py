@@ -1,9 +1,10 @@
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import timedelta
+
+from main import cache
 from models.cfp import (
     PROPOSAL_TIMESLOTS,
-    Proposal,
     Venue,
     get_days_map,
     ROUGH_LENGTHS,
@@ -12,6 +13,12 @@ from models.cfp import (
     make_periods_contiguous,
     timeslot_to_period,
 )
+from .schedule_model import (
+    SCHEDULE_MODEL_TIMEOUT,
+    SCHEDULED_TYPES,
+    ScheduleModel,
+    get_schedule_model_cache_key,
+)
 
 
 @dataclass
@@ -23,12 +30,14 @@ class CFPEstimate:
     allocated_time: timedelta
     remaining_time: timedelta
     unknown_lengths: int
-    venues: list[Venue]
+    # Names of the official venues for this type
+    venues: list[str]
 
 
-def get_available_proposal_minutes():
+def get_available_proposal_minutes(venue_names_by_type=None):
     minutes = defaultdict(int)
-    venue_names_by_type = Venue.emf_venue_names_by_type()
+    if venue_names_by_type is None:
+        venue_names_by_type = Venue.emf_venue_names_by_type()
     for type, slots in PROPOSAL_TIMESLOTS.items():
         periods = make_periods_contiguous(
             [timeslot_to_period(ts, type=type) for ts in slots]
@@ -36,20 +45,16 @@ def get_available_proposal_minutes():
         for period in periods:
             minutes[type] += int(
                 (period.end - period.start).total_seconds() / 60
-            ) * len(venue_names_by_type[type])
+            ) * len(venue_names_by_type.get(type, []))
     return minutes
 
 
-def get_cfp_estimate(proposal_type: str) -> CFPEstimate:
-    """Calculate estimated scheduling capacity statistics for a given proposal type."""
-    if proposal_type not in ["talk", "workshop", "performance", "youthworkshop"]:
-        raise ValueError(f"Invalid proposal type: {proposal_type}")
-
+def estimate_for_type(
+    model: ScheduleModel, proposal_type: str, available_minutes: dict[str, int]
+) -> CFPEstimate:
     changeover_time = SLOT_LENGTH * EVENT_SPACING[proposal_type]
 
-    accepted_proposals = (
-        Proposal.query_accepted().filter(Proposal.type == proposal_type).all()
-    )
+    accepted_proposals = model.proposals_by_type[proposal_type]
 
     allocated_time = timedelta()
     unknown_lengths: int = 0
@@ -69,16 +74,13 @@ def get_cfp_estimate(proposal_type: str) -> CFPEstimate:
 
     num_days = len(get_days_map().items())
 
-    available_venues = Venue.query.filter(
-        Venue.default_for_types.any(proposal_type)
-    ).all()
+    available_venues = [v.name for v in model.venues_for_type(proposal_type)]
 
     # Correct for changeover period not being needed at the end of the day
     # This can go negative if there aren't many proposals accepted yet, so clamp to 0
     changeover_correction = changeover_time * num_days * len(available_venues)
     allocated_time = max(allocated_time - changeover_correction, timedelta(0))
 
-    available_minutes = get_available_proposal_minutes()
     available_time = timedelta(minutes=available_minutes[proposal_type])
 
     return CFPEstimate(
@@ -90,3 +92,22 @@ def get_cfp_estimate(proposal_type: str) -> CFPEstimate:
         unknown_lengths=unknown_lengths,
         venues=available_venues,
     )
+
+
+def get_cfp_estimates() -> dict[str, CFPEstimate]:
+    """Calculate estimated scheduling capacity statistics for every scheduled proposal type."""
+    key = get_schedule_model_cache_key("estimates")
+    estimates = cache.get(key)
+    if estimates is None:
+        model = ScheduleModel()
+        venue_names_by_type = {
+            type: [v.name for v in model.venues_for_type(type)]
+            for type in PROPOSAL_TIMESLOTS
+        }
+        available_minutes = get_available_proposal_minutes(venue_names_by_type)
+        estimates = {
+            proposal_type: estimate_for_type(model, proposal_type, available_minutes)
+            for proposal_type in SCHEDULED_TYPES
+        }
+        cache.set(key, estimates, timeout=SCHEDULE_MODEL_TIMEOUT)
+    return estimates
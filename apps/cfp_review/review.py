@@ -1,130 +1,122 @@
-import random
-from datetime import datetime, timedelta
 from flask import session, current_app as app, redirect, url_for, render_template, flash
 from flask_login import current_user
 
-from sqlalchemy.orm import aliased
+from sqlalchemy import exists, func, select
 
-from main import db
+from main import cache, db
 from models.cfp import CFPVote, Proposal, CfpStateException
 
 from . import cfp_review, review_required
 from .forms import ReviewListForm, VoteForm
 
+REVIEW_QUEUE_LENGTH = 30
+REVIEW_QUEUE_TIMEOUT = 60 * 60
 
-@cfp_review.route("/review", methods=["GET", "POST"])
-@review_required
-def review_list():
-    form = ReviewListForm()
+# Votes in these states need the reviewer to look at the proposal again
+REVIEW_AGAIN_STATES = ["new", "resolved", "stale"]
 
-    if form.validate_on_submit():
-        app.logger.info("Clearing review order")
-        session["review_order"] = None
-        session["review_order_dt"] = datetime.utcnow()
-        return redirect(url_for(".review_list"))
 
-    review_order_dt = session.get("review_order_dt")
-    if review_order_dt:
-        review_order_dt = review_order_dt.replace(tzinfo=None)
+def review_queue_key(user):
+    return f"review_queue/{user.id}"
 
-    last_visit = session.get("review_visit_dt")
-    if not last_visit:
-        last_vote_cast = (
-            CFPVote.query.filter_by(user_id=current_user.id)
-            .order_by(CFPVote.modified.desc())
-            .first()
-        )
 
-        if last_vote_cast:
-            last_visit = last_vote_cast.modified
-            review_order_dt = last_vote_cast.modified
-    else:
-        last_visit = last_visit.replace(tzinfo=None)
+def build_review_queue(user):
+    """Pick the next proposals for a reviewer, fewest votes first.
+
+    Proposals the reviewer has already responded to (including declaring a
+    conflict of interest) are left out, and ties are broken randomly so
+    reviewers working at the same time spread across different proposals.
+    """
+    vote_counts = (
+        select(CFPVote.proposal_id, func.count(CFPVote.id).label("votes"))
+        .where(CFPVote.state == "voted")
+        .group_by(CFPVote.proposal_id)
+        .subquery()
+    )
 
-    proposal_query = Proposal.query.filter(Proposal.state == "anonymised")
+    query = (
+        db.session.query(Proposal.id)
+        .outerjoin(vote_counts, vote_counts.c.proposal_id == Proposal.id)
+        .filter(
+            Proposal.state == "anonymised",
+            ~exists().where(
+                (CFPVote.proposal_id == Proposal.id) & (CFPVote.user_id == user.id)
+            ),
+        )
+    )
 
-    if not current_user.has_permission("cfp_admin"):
+    if not user.has_permission("cfp_admin"):
         # reviewers shouldn't see their own proposals, and don't review installations
         # youth workshops are reviewed separately
-        proposal_query = proposal_query.filter(
-            Proposal.user_id != current_user.id, Proposal.type.in_(["talk", "workshop"])
+        query = query.filter(
+            Proposal.user_id != user.id, Proposal.type.in_(["talk", "workshop"])
         )
 
+    queue = [
+        proposal_id
+        for proposal_id, in query.order_by(
+            func.coalesce(vote_counts.c.votes, 0), func.random()
+        ).limit(REVIEW_QUEUE_LENGTH)
+    ]
+    cache.set(review_queue_key(user), queue, timeout=REVIEW_QUEUE_TIMEOUT)
+    return queue
+
+
+def get_review_queue(user):
+    # An empty queue is cached too, so we don't rebuild it on every request
+    queue = cache.get(review_queue_key(user))
+    if queue is None:
+        queue = build_review_queue(user)
+    return queue
+
+
+def remove_from_review_queue(user, proposal_id):
+    queue = cache.get(review_queue_key(user))
+    if queue and proposal_id in queue:
+        queue.remove(proposal_id)
+        if queue:
+            cache.set(review_queue_key(user), queue, timeout=REVIEW_QUEUE_TIMEOUT)
+        else:
+            # Used up, so pick the next proposals on the next request
+            cache.delete(review_queue_key(user))
+
+
+@cfp_review.route("/review", methods=["GET", "POST"])
+@review_required
+def review_list():
+    form = ReviewListForm()
+
+    if form.validate_on_submit():
+        app.logger.info("Clearing review order")
+        build_review_queue(current_user)
+        return redirect(url_for(".review_list"))
+
     to_review_again = []
-    to_review_new = []
-    to_review_old = []
     reviewed = []
 
-    user_votes = aliased(
-        CFPVote, CFPVote.query.filter_by(user_id=current_user.id).subquery()
+    user_votes = (
+        db.session.query(Proposal, CFPVote)
+        .join(CFPVote, CFPVote.proposal_id == Proposal.id)
+        .filter(CFPVote.user_id == current_user.id, Proposal.state == "anonymised")
     )
-
-    for proposal, vote in (
-        proposal_query.outerjoin(user_votes).with_entities(Proposal, user_votes).all()
-    ):
+    for proposal, vote in user_votes:
         proposal.user_vote = vote
-        if vote:
-            if vote.state in ["new", "resolved", "stale"]:
-                proposal.is_new = True
-                to_review_again.append(proposal)
-            else:
-                reviewed.append(((vote.state, vote.vote or 0, vote.modified), proposal))
+        if vote.state in REVIEW_AGAIN_STATES:
+            proposal.is_new = True
+            to_review_again.append(proposal)
         else:
-            # modified doesn't really describe when proposals are "new", but it's near enough
-            if (
-                last_visit is None
-                or review_order_dt is None
-                or proposal.modified < review_order_dt
-            ):
-                to_review_old.append(proposal)
-            else:
-                proposal.is_new = True
-                to_review_new.append(proposal)
+            reviewed.append(((vote.state, vote.vote or 0, vote.modified), proposal))
 
     reviewed = [p for o, p in sorted(reviewed, reverse=True)]
 
-    review_order = session.get("review_order")
-    if (
-        review_order is None
-        or not set([p.id for p in to_review_again]).issubset(review_order)
-        or (
-            to_review_new
-            and (
-                last_visit is None
-                or datetime.utcnow() - last_visit > timedelta(hours=1)
-            )
-        )
-    ):
-        random.shuffle(to_review_again)
-        random.shuffle(to_review_new)
-        random.shuffle(to_review_old)
-
-        to_review_max = 30
-
-        # prioritise showing proposals that have been voted on before
-        # after that, split new and old proportionally for fairness
-        to_review = to_review_again[:]
-        other_max = max(0, to_review_max - len(to_review))
-        other_count = len(to_review_old) + len(to_review_new)
-        if other_count:
-            old_max = int(float(len(to_review_old)) / other_count * other_max)
-            new_max = other_max - old_max
-            to_review += to_review_new[:new_max] + to_review_old[:old_max]
-
-        session["review_order"] = [p.id for p in to_review]
-        session["review_order_dt"] = last_visit
-        session["review_visit_dt"] = datetime.utcnow()
-
-    else:
-        # Sort proposals based on the previous review order
-        to_review_dict = dict(
-            (p.id, p) for p in to_review_again + to_review_new + to_review_old
-        )
-        to_review = [
-            to_review_dict[i] for i in session["review_order"] if i in to_review_dict
-        ]
+    # prioritise showing proposals that have been voted on before
+    queue = get_review_queue(current_user)
+    queued = {p.id: p for p in Proposal.query.filter(Proposal.id.in_(queue))}
+    to_review = sorted(to_review_again, key=lambda p: p.modified) + [
+        queued[i] for i in queue if i in queued and queued[i].state == "anonymised"
+    ]
 
-        session["review_visit_dt"] = datetime.utcnow()
+    session["review_order"] = [p.id for p in to_review]
 
     return render_template(
         "cfp_review/review_list.html", to_review=to_review, reviewed=reviewed, form=form
@@ -181,8 +173,6 @@ def review_proposal(proposal_id):
         flash("Cannot review proposal %s, continuing to next proposal" % proposal_id)
         return redirect(url_for(".review_proposal_next", proposal_id=proposal_id))
 
-    session["review_visit_dt"] = datetime.utcnow()
-
     next_proposal_id = get_next_review_proposal(proposal_id)
     if next_proposal_id is not None:
         review_order = session.get("review_order")
@@ -241,6 +231,7 @@ def review_proposal(proposal_id):
 
             flash(message, "info")
             db.session.commit()
+            remove_from_review_queue(current_user, prop.id)
             if next_proposal_id is None:
                 return redirect(url_for(".review_list"))
             return redirect(url_for(".review_proposal", proposal_id=next_proposal_id))
@@ -0,0 +1,71 @@
+"""
+    Schedule model for the CfP sense check and capacity estimates.
+
+    Loads every accepted proposal, every venue and each proposal's allowed
+    time periods up front, in a fixed number of queries, so the reports don't
+    lazily load venues or re-parse time periods for each proposal. Report
+    results are cached until a proposal or venue changes.
+"""
+from collections import defaultdict
+from itertools import chain
+
+from sqlalchemy.orm import joinedload
+
+from models.cfp import Proposal, Venue
+
+from ..common.generation import bump_generation, get_generation, track_changes
+
+SCHEDULE_MODEL_GENERATION_KEY = "cfp_schedule_model_generation"
+SCHEDULE_MODEL_TIMEOUT = 60 * 60
+
+SCHEDULED_TYPES = ["talk", "workshop", "youthworkshop", "performance"]
+
+
+class ScheduleModel:
+    def __init__(self):
+        self.venues: list[Venue] = Venue.query.order_by(Venue.id).all()
+
+        self.proposals: list[Proposal] = (
+            Proposal.query_accepted(include_user_scheduled=False)
+            .filter(Proposal.type.in_(SCHEDULED_TYPES))
+            .options(
+                joinedload(Proposal.potential_venue),
+                joinedload(Proposal.scheduled_venue),
+            )
+            .order_by(Proposal.type, Proposal.id)
+            .all()
+        )
+
+        self.allowed_time_periods = {
+            p.id: p.get_allowed_time_periods() for p in self.proposals
+        }
+
+        self.proposals_by_type: dict[str, list[Proposal]] = defaultdict(list)
+        self.proposals_by_speaker: dict[int, set[Proposal]] = defaultdict(set)
+        for proposal in self.proposals:
+            self.proposals_by_type[proposal.type].append(proposal)
+            self.proposals_by_speaker[proposal.user_id].add(proposal)
+
+    def venues_for_type(self, proposal_type: str) -> list[Venue]:
+        """The official venues proposals of this type are scheduled into by default."""
+        return [v for v in self.venues if proposal_type in v.default_for_types]
+
+
+def get_schedule_model_cache_key(name: str) -> str:
+    return f"cfp_schedule_model/{get_generation(SCHEDULE_MODEL_GENERATION_KEY)}/{name}"
+
+
+def refresh_schedule_model():
+    """Invalidate the cached reports. Called automatically when proposals
+    or venues are committed."""
+    bump_generation(SCHEDULE_MODEL_GENERATION_KEY)
+
+
+def _schedule_changed(session) -> bool:
+    return any(
+        isinstance(obj, (Proposal, Venue))
+        for obj in chain(session.new, session.dirty, session.deleted)
+    )
+
+
+track_changes(_schedule_changed, refresh_schedule_model)
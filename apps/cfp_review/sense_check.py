@@ -1,16 +1,30 @@
-from collections import defaultdict
 from datetime import datetime, timedelta
+from typing import Optional
 
 from flask import render_template, request
+from sqlalchemy.orm import joinedload
 
+from main import cache
 from models import event_start, event_end
 from models.cfp import Proposal
 
 from . import cfp_review, review_required
-
-
-def not_sensible_reasons(proposal: Proposal, proposals_by_speaker: dict[int, set[Proposal]]) -> dict[str, str]:
+from .schedule_model import (
+    SCHEDULE_MODEL_TIMEOUT,
+    SCHEDULED_TYPES,
+    ScheduleModel,
+    get_schedule_model_cache_key,
+)
+
+
+def not_sensible_reasons(
+    proposal: Proposal,
+    proposals_by_speaker: dict[int, set[Proposal]],
+    allowed_time_periods: Optional[list] = None,
+) -> dict[str, str]:
     reasons = {}
+    if allowed_time_periods is None:
+        allowed_time_periods = proposal.get_allowed_time_periods()
 
     # -- Proposal (is accepted/finalised and) does not have a proposed or scheduled time.
     if proposal.potential_time is None and proposal.scheduled_time is None:
@@ -35,7 +49,7 @@ def not_sensible_reasons(proposal: Proposal, proposals_by_speaker: dict[int, set
             reasons['scheduled_venue_illegal'] = f'{proposal.type} scheduled to be in "{proposal.scheduled_venue.name}", which admits content of types: {proposal.scheduled_venue.allowed_types}'
 
     # -- Proposal has allowed time periods that are after 2am or before 9am.
-    for n, period in enumerate(proposal.get_allowed_time_periods()):
+    for n, period in enumerate(allowed_time_periods):
         def reason_key(reason):
             return f'period_{n}_{reason}'
 
@@ -81,7 +95,7 @@ def not_sensible_reasons(proposal: Proposal, proposals_by_speaker: dict[int, set
 
         # -- Proposal lies outside the allowed time periods.
         permitted_time = False
-        for n, period in enumerate(proposal.get_allowed_time_periods()):
+        for period in allowed_time_periods:
             if t >= period.start and t <= period.end:
                 permitted_time = True
 
@@ -115,36 +129,63 @@ def not_sensible_reasons(proposal: Proposal, proposals_by_speaker: dict[int, set
     return reasons
 
 
+def get_sense_check_results() -> dict[str, list[tuple[int, dict[str, str]]]]:
+    """Reasons each accepted proposal looks wrong, by proposal type.
+
+    Every proposal type is listed, including those with no problems, so
+    the number of proposals checked can be counted too.
+    """
+    key = get_schedule_model_cache_key("sense_check")
+    results = cache.get(key)
+    if results is None:
+        model = ScheduleModel()
+        results = {}
+        for proposal_type, proposals in model.proposals_by_type.items():
+            results[proposal_type] = [
+                (
+                    proposal.id,
+                    not_sensible_reasons(
+                        proposal,
+                        model.proposals_by_speaker,
+                        model.allowed_time_periods[proposal.id],
+                    ),
+                )
+                for proposal in proposals
+            ]
+        cache.set(key, results, timeout=SCHEDULE_MODEL_TIMEOUT)
+    return results
+
+
 @cfp_review.route("/sense_check")
 @review_required
 def sense_check():
     types_to_show = request.args.getlist("type")
     if not types_to_show:
-        types_to_show = ["talk", "workshop", "youthworkshop", "performance"]
-
-    accepted_proposals = (
-        Proposal.query_accepted(include_user_scheduled=False)
-        .filter(Proposal.type.in_(types_to_show))
-        .order_by(Proposal.type)
-        .all()
-    )
-
-    proposals_for_overlap = (
-        Proposal.query_accepted(include_user_scheduled=False)
-        .filter(Proposal.type.in_(["talk", "workshop", "youthworkshop", "performance"]))
+        types_to_show = SCHEDULED_TYPES
+
+    results = get_sense_check_results()
+    checked = [
+        (proposal_id, reasons)
+        for proposal_type in sorted(types_to_show)
+        for proposal_id, reasons in results.get(proposal_type, [])
+    ]
+
+    flagged = {proposal_id: reasons for proposal_id, reasons in checked if reasons}
+    proposals = (
+        Proposal.query.filter(Proposal.id.in_(flagged))
+        .options(joinedload(Proposal.user))
         .all()
     )
-    proposals_by_speaker = defaultdict(set)
-    for proposal in proposals_for_overlap:
-        proposals_by_speaker[proposal.user_id].add(proposal)
+    proposals = {p.id: p for p in proposals}
 
-    not_sensible_proposals = []
-    for accepted_proposal in accepted_proposals:
-        if reasons := not_sensible_reasons(accepted_proposal, proposals_by_speaker):
-            not_sensible_proposals.append((accepted_proposal, reasons))
+    not_sensible_proposals = [
+        (proposals[proposal_id], reasons)
+        for proposal_id, reasons in flagged.items()
+        if proposal_id in proposals
+    ]
 
     return render_template(
         "cfp_review/sense_check.html",
         not_sensible_proposals=not_sensible_proposals,
-        proposals_count=len(accepted_proposals),
+        proposals_count=len(checked),
     )
@@ -0,0 +1,106 @@
+"""
+    Vote statistics for the review coordinators' vote summary.
+
+    Per-proposal vote state counts, note totals and unread counts come from
+    a single grouped query over cfp_vote, so sorting and paging happen in the
+    database rather than by walking every proposal's votes in Python.
+"""
+from sqlalchemy import func, select
+
+from main import db
+from models.cfp import CFPVote, Proposal
+
+VOTE_SUMMARY_PAGE_SIZE = 100
+
+COUNTED_STATES = ["voted", "blocked", "recused"]
+
+
+def vote_counts(all_proposals=False):
+    """Subquery of (proposal_id, voted, blocked, recused, notes, unread, unread_notes).
+
+    Proposals without any votes are included with zero counts.
+    """
+    def count_where(*criteria):
+        return func.count(CFPVote.id).filter(*criteria)
+
+    has_note = func.coalesce(CFPVote.note, "") != ""
+
+    query = (
+        select(
+            Proposal.id.label("proposal_id"),
+            *[count_where(CFPVote.state == state).label(state) for state in COUNTED_STATES],
+            count_where(has_note).label("notes"),
+            count_where(CFPVote.has_been_read.isnot(True)).label("unread"),
+            count_where(has_note, CFPVote.has_been_read.isnot(True)).label("unread_notes"),
+        )
+        .outerjoin(CFPVote, CFPVote.proposal_id == Proposal.id)
+        .group_by(Proposal.id)
+    )
+    if not all_proposals:
+        query = query.where(Proposal.state == "anonymised")
+
+    return query.subquery()
+
+
+def get_vote_summary_order(counts, sort_by, reverse=False):
+    sort_keys = {
+        # Notes == unread first then by number of notes
+        "notes": [counts.c.unread > 0, counts.c.notes],
+        "date": [Proposal.created],
+        "title": [func.lower(Proposal.title)],
+        "votes": [counts.c.voted],
+        "blocked": [counts.c.blocked],
+        "recused": [counts.c.recused],
+    }
+    columns = sort_keys.get(sort_by, sort_keys["notes"]) + [Proposal.modified, Proposal.id]
+    if reverse:
+        return [column.desc() for column in columns]
+    return columns
+
+
+def get_vote_summary(
+    all_proposals=False, sort_by=None, reverse=False, page=1, per_page=VOTE_SUMMARY_PAGE_SIZE
+):
+    """Returns (summary, [(proposal, counts)], has_next) for one page.
+
+    The summary covers every matching proposal, not just the current page.
+    """
+    counts = vote_counts(all_proposals)
+
+    totals = db.session.execute(
+        select(
+            func.count(counts.c.proposal_id).label("proposals"),
+            func.min(counts.c.voted).label("min_votes"),
+            func.max(counts.c.voted).label("max_votes"),
+            func.sum(counts.c.voted).label("votes_total"),
+            func.sum(counts.c.blocked).label("block_total"),
+            func.sum(counts.c.recused).label("recused_total"),
+            func.sum(counts.c.notes).label("notes_total"),
+            func.sum(counts.c.unread_notes).label("notes_unread"),
+        )
+    ).one()
+    summary = {key: value or 0 for key, value in totals._mapping.items()}
+
+    rows = (
+        db.session.query(Proposal, counts)
+        .join(counts, counts.c.proposal_id == Proposal.id)
+        .order_by(*get_vote_summary_order(counts, sort_by, reverse))
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
+        .all()
+    )
+
+    proposals_with_counts = [
+        (
+            row[0],
+            {
+                "voted": row.voted,
+                "blocked": row.blocked,
+                "recused": row.recused,
+                "notes": row.notes,
+                "unread": row.unread,
+            },
+        )
+        for row in rows[:per_page]
+    ]
+    return summary, proposals_with_counts, len(rows) > per_page
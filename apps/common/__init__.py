@@ -289,6 +289,11 @@ def json_response(f, *args, **kwargs):
         return jsonify(response), 200
 
 
+def escape(like):
+    """Escape a string for use in a LIKE pattern with escape="^"."""
+    return like.replace("^", "^^").replace("%", "^%").replace("_", "^_")
+
+
 def feature_enabled(feature) -> bool:
     """
     If a feature flag is defined in the database return that,
@@ -0,0 +1,72 @@
+"""
+    Generation counters for invalidating groups of cached values.
+
+    Cached values are stored under keys which include a generation number
+    (see get_generation), so bumping the generation invalidates all of them
+    at once. A counter which has been evicted starts again from the current
+    time rather than from zero, so values cached before it was lost aren't
+    served again.
+
+    track_changes bumps a generation when a session commits changes which
+    affect it. Like everything else in the cache, this only reaches other
+    processes with a shared cache backend.
+"""
+import time
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from main import cache
+
+# Refresh functions to call when the session commits
+PENDING_REFRESHES_KEY = "pending_generation_refreshes"
+
+
+def _initial_generation() -> int:
+    return int(time.time() * 1000)
+
+
+def get_generation(key: str) -> int:
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=0)
+        generation = cache.get(key)
+    return generation or 0
+
+
+def bump_generation(key: str):
+    # inc would restart a missing counter from 1
+    cache.add(key, _initial_generation(), timeout=0)
+    cache.inc(key)
+
+
+def mark_changed(session: Session, refresh: Callable[[], None]):
+    """Call `refresh` once `session` commits."""
+    session.info.setdefault(PENDING_REFRESHES_KEY, set()).add(refresh)
+
+
+def has_pending_changes(session: Session, refresh: Callable[[], None]) -> bool:
+    """Whether `session` has flushed changes which will call `refresh` on commit."""
+    return refresh in session.info.get(PENDING_REFRESHES_KEY, ())
+
+
+def track_changes(changed: Callable[[Session], bool], refresh: Callable[[], None]):
+    """Call `refresh` when a session commits, if `changed(session)` was true
+    after any of its flushes."""
+
+    @event.listens_for(Session, "after_flush")
+    def _track_changes(session, flush_context):
+        if changed(session):
+            mark_changed(session, refresh)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_changed(session):
+    for refresh in session.info.pop(PENDING_REFRESHES_KEY, ()):
+        refresh()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(PENDING_REFRESHES_KEY, None)
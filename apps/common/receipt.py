@@ -1,54 +1,97 @@
 import io
 import asyncio
+from collections import defaultdict
 
 from flask import render_template
 from markupsafe import Markup
 from playwright.async_api import async_playwright
 import segno
+from sqlalchemy.orm import contains_eager, joinedload
 
 from main import external_url
 from models import event_year
-from models.product import Product, ProductGroup, PriceTier
+from models.product import Product, ProductGroup
 from models.purchase import Purchase, PurchaseTransfer
 
 
 RECEIPT_TYPES = ["admissions", "parking", "campervan", "merchandise", "hire"]
 
 
-def render_receipt(user, png=False, pdf=False):
+class ReceiptData:
+    """The purchases shown on a user's receipt, grouped by product group type."""
+
+    def __init__(self, user):
+        self.user = user
+        self.purchases_by_type: dict[str, list[Purchase]] = defaultdict(list)
+        self.transferred_tickets: list[PurchaseTransfer] = []
+
+    def purchases(self, type):
+        return self.purchases_by_type.get(type, [])
+
+    @property
+    def issuable_purchases(self):
+        """Purchases which get marked as issued when the receipt is emailed."""
+        return sorted(
+            (
+                p
+                for type in RECEIPT_TYPES
+                for p in self.purchases(type)
+                if p.state == "paid"
+            ),
+            key=lambda p: p.id,
+        )
+
+
+def load_receipt_data(users) -> dict[int, ReceiptData]:
+    """Load receipt data for several users in two queries, keyed by user ID."""
+    receipts = {user.id: ReceiptData(user) for user in users}
+    if not receipts:
+        return receipts
+
     purchases = (
-        user.owned_purchases.filter_by(is_paid_for=True)
-        .join(PriceTier, Product, ProductGroup)
-        .with_entities(Purchase)
+        Purchase.query.filter(Purchase.owner_id.in_(receipts.keys()))
+        .filter_by(is_paid_for=True)
+        .join(Purchase.product)
+        .join(Product.parent)
+        .options(contains_eager(Purchase.product).contains_eager(Product.parent))
+        .add_columns(ProductGroup.type)
         .order_by(Purchase.id)
     )
+    for purchase, type in purchases:
+        receipts[purchase.owner_id].purchases_by_type[type].append(purchase)
+
+    transfers = (
+        PurchaseTransfer.query.filter(
+            PurchaseTransfer.from_user_id.in_(receipts.keys())
+        )
+        .join(PurchaseTransfer.purchase)
+        .filter(Purchase.state == "paid")
+        .options(
+            contains_eager(PurchaseTransfer.purchase),
+            joinedload(PurchaseTransfer.to_user),
+        )
+        .order_by(PurchaseTransfer.timestamp)
+    )
+    for transfer in transfers:
+        receipts[transfer.from_user_id].transferred_tickets.append(transfer)
 
-    admissions = purchases.filter(ProductGroup.type == "admissions").all()
-
-    parking_tickets = purchases.filter(ProductGroup.type == "parking").all()
-    campervan_tickets = purchases.filter(ProductGroup.type == "campervan").all()
+    return receipts
 
-    merch = purchases.filter(ProductGroup.type == "merchandise").all()
-    hires = purchases.filter(ProductGroup.type == "hire").all()
 
-    transferred_tickets = (
-        user.transfers_from.join(Purchase)
-        .filter_by(state="paid")
-        .with_entities(PurchaseTransfer)
-        .order_by("timestamp")
-        .all()
-    )
+def render_receipt(user, png=False, pdf=False, receipt=None):
+    if receipt is None:
+        receipt = load_receipt_data([user])[user.id]
 
     return render_template(
         "receipt.html",
         user=user,
         format_inline_qr=format_inline_qr,
-        admissions=admissions,
-        parking_tickets=parking_tickets,
-        campervan_tickets=campervan_tickets,
-        transferred_tickets=transferred_tickets,
-        merch=merch,
-        hires=hires,
+        admissions=receipt.purchases("admissions"),
+        parking_tickets=receipt.purchases("parking"),
+        campervan_tickets=receipt.purchases("campervan"),
+        transferred_tickets=receipt.transferred_tickets,
+        merch=receipt.purchases("merchandise"),
+        hires=receipt.purchases("hire"),
         pdf=pdf,
         png=png,
     )
@@ -114,29 +157,21 @@ def make_qr_png(url):
     return make_qrfile(url, kind="png", scale=3)
 
 
-
-def attach_tickets(msg, user):
+def attach_tickets(msg, user, receipt=None):
     # Attach tickets to a mail Message
-    page = render_receipt(user, pdf=True)
+    page = render_receipt(user, pdf=True, receipt=receipt)
     url = external_url("tickets.receipt", user_id=user.id)
     pdf = render_pdf(url, page)
 
     msg.attach("EMF{}.pdf".format(event_year()), pdf.read(), "application/pdf")
 
 
-def set_tickets_emailed(user):
-    purchases = (
-        user.owned_purchases.filter_by(is_paid_for=True)
-        .filter(Purchase.state.in_(["paid"]))
-        .join(PriceTier, Product, ProductGroup)
-        .filter(ProductGroup.type.in_(RECEIPT_TYPES))
-        .with_entities(Purchase)
-        .group_by(Purchase)
-        .order_by(Purchase.id)
-    )
+def set_tickets_emailed(user, receipt=None):
+    if receipt is None:
+        receipt = load_receipt_data([user])[user.id]
 
     already_emailed = False
-    for p in purchases:
+    for p in receipt.issuable_purchases:
         if p.ticket_issued:
             already_emailed = True
 
@@ -0,0 +1,96 @@
+"""
+    Server-side sessions
+
+    By default Flask keeps the whole session in a signed cookie, which is
+    re-sent and re-verified on every request. With SERVER_SIDE_SESSIONS set,
+    the cookie only carries a signed session ID and the data lives in the
+    Flask-Caching store, so this needs a shared cache backend.
+"""
+import secrets
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from itsdangerous import BadSignature
+
+from main import cache
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid or secrets.token_urlsafe(32)
+        # Used to issue a new session ID when someone logs in or out
+        self.loaded_user_id = self.get("_user_id")
+
+
+class CacheSessionInterface(SecureCookieSessionInterface):
+    salt = "server-session"
+    session_class = ServerSession
+    key_prefix = "session/"
+
+    def _lifetime(self, app) -> int:
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        serializer = self.get_signing_serializer(app)
+        if serializer is None:
+            return None
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self.session_class()
+
+        try:
+            sid = serializer.loads(cookie, max_age=self._lifetime(app))
+        except BadSignature:
+            return self.session_class()
+
+        data = cache.get(self.key_prefix + sid)
+        if data is None:
+            return self.session_class()
+        return self.session_class(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified:
+                cache.delete(self.key_prefix + session.sid)
+                response.delete_cookie(
+                    name,
+                    domain=domain,
+                    path=path,
+                    secure=secure,
+                    samesite=samesite,
+                    httponly=httponly,
+                )
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        if session.get("_user_id") != session.loaded_user_id:
+            # Don't let a session ID chosen before login carry over
+            cache.delete(self.key_prefix + session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        cache.set(self.key_prefix + session.sid, dict(session), self._lifetime(app))
+
+        cookie = self.get_signing_serializer(app).dumps(session.sid)
+        response.set_cookie(
+            name,
+            cookie,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
@@ -17,13 +17,23 @@ from models.product import Product, ProductView, Voucher, VOUCHER_GRACE_PERIOD
 from models.purchase import Purchase, AdmissionTicket
 from models.cfp import Proposal
 from models.volunteer.role import Role
-from models.volunteer.shift import Shift, ShiftEntry
 from models.volunteer.volunteer import Volunteer
+from models.webhook import WebhookEvent
 
 metrics = Blueprint("metric", __name__)
 
 request_duration = Histogram("emf_request_duration_seconds", "Request duration", ["endpoint", "method"])
 request_total = Counter("emf_request_total", "Total request count", ["endpoint", "method", "http_status"])
+arrivals_search_duration = Histogram(
+    "emf_arrivals_search_seconds",
+    "Arrivals search query duration",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+admin_search_duration = Histogram(
+    "emf_admin_search_seconds",
+    "Admin search query duration",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
 
 
 def gauge_groups(gauge, query, *entities):
@@ -52,6 +62,14 @@ class ExternalMetrics:
         emf_shift_seconds = GaugeMetricFamily(
             "emf_shift_seconds", "Volunteer shift seconds", labels=["role", "state"]
         )
+        emf_webhook_events = GaugeMetricFamily(
+            "emf_webhook_events", "Payment webhook events", labels=["provider", "state"]
+        )
+        emf_webhook_lag = GaugeMetricFamily(
+            "emf_webhook_lag_seconds",
+            "Age of the oldest unprocessed payment webhook event",
+            labels=["provider"],
+        )
 
         gauge_groups(
             emf_purchases,
@@ -94,42 +112,33 @@ class ExternalMetrics:
             Role.name,
         )
 
-        gauge_groups(
-            emf_shifts, ShiftEntry.query.join(ShiftEntry.shift).join(Shift.role), Role.name, ShiftEntry.state
-        )
+        # Imported here as metrics is loaded before the blueprints
+        from .volunteer.stats import get_role_totals
+
+        for role, totals in get_role_totals().items():
+            for state, count in totals["shifts"].items():
+                emf_shifts.add_metric([role, state], count)
+            for state, seconds in totals["seconds"].items():
+                emf_shift_seconds.add_metric([role, state], seconds)
 
-        shift_seconds = (
-            ShiftEntry.query.join(ShiftEntry.shift)
-            .join(Shift.role)
-            .with_entities(
-                func.sum(Shift.duration).label("minimum"),
-                Role.name,
-                ShiftEntry.state,
-            )
-            .group_by(Role.name, ShiftEntry.state)
-            .order_by(Role.name)
+        gauge_groups(
+            emf_webhook_events,
+            WebhookEvent.query,
+            WebhookEvent.provider,
+            case(
+                (WebhookEvent.processed != None, "processed"),  # noqa: E711
+                (WebhookEvent.pending(), "pending"),
+                else_="failed",
+            ),
         )
 
-        for duration, *key in shift_seconds:
-            emf_shift_seconds.add_metric(key, duration.total_seconds())
-
-        required_shift_seconds = (
-            Shift.query.join(Shift.role)
-            .with_entities(
-                func.sum(Shift.duration * Shift.min_needed).label("minimum_secs"),
-                func.sum(Shift.duration * Shift.max_needed).label("maximum_secs"),
-                func.sum(Shift.min_needed).label("minimum"),
-                func.sum(Shift.max_needed).label("maximum"),
-                Role.name,
-            )
-            .group_by(Role.name)
-            .order_by(Role.name)
+        webhook_oldest = (
+            WebhookEvent.query.filter(WebhookEvent.pending())
+            .with_entities(WebhookEvent.provider, func.min(WebhookEvent.received))
+            .group_by(WebhookEvent.provider)
         )
-        for min_sec, max_sec, min, max, role in required_shift_seconds:
-            emf_shift_seconds.add_metric([role, "min_required"], min_sec.total_seconds())
-            emf_shift_seconds.add_metric([role, "max_required"], max_sec.total_seconds())
-            emf_shifts.add_metric([role, "min_required"], min)
-            emf_shifts.add_metric([role, "max_required"], max)
+        for provider, oldest in webhook_oldest:
+            emf_webhook_lag.add_metric([provider], (datetime.utcnow() - oldest).total_seconds())
 
         return [
             emf_purchases,
@@ -141,6 +150,8 @@ class ExternalMetrics:
             emf_roles,
             emf_shifts,
             emf_shift_seconds,
+            emf_webhook_events,
+            emf_webhook_lag,
         ]
 
 
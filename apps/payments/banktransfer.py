@@ -12,7 +12,7 @@ from models.payment import BankPayment, BankTransaction
 from ..common import get_user_currency, feature_enabled
 from ..common.email import from_email
 from ..common.forms import Form
-from ..common.receipt import attach_tickets, set_tickets_emailed
+from ..common.receipt import attach_tickets, set_tickets_emailed, load_receipt_data
 from . import get_user_payment_or_abort, lock_user_payment_or_abort
 from . import payments
 
@@ -234,7 +234,8 @@ def send_confirmation(payment: BankPayment):
         to=[payment.user.email],
     )
 
-    already_emailed = set_tickets_emailed(payment.user)
+    receipt = load_receipt_data([payment.user])[payment.user.id]
+    already_emailed = set_tickets_emailed(payment.user, receipt)
     msg.body = render_template(
         "emails/payment-paid.txt",
         user=payment.user,
@@ -243,7 +244,7 @@ def send_confirmation(payment: BankPayment):
     )
 
     if feature_enabled("ISSUE_TICKETS"):
-        attach_tickets(msg, payment.user)
+        attach_tickets(msg, payment.user, receipt)
 
     msg.send()
     db.session.commit()
@@ -8,6 +8,7 @@
     (as of Nov 2019), so it would involve using a different flow which would
     complicate this code.
 """
+import json
 import logging
 
 from flask import (
@@ -30,9 +31,10 @@ from models.payment import StripePayment
 from ..common import feature_enabled
 from ..common.email import from_email
 from ..common.forms import Form
-from ..common.receipt import attach_tickets, set_tickets_emailed
+from ..common.receipt import attach_tickets, set_tickets_emailed, load_receipt_data
 from . import get_user_payment_or_abort, lock_user_payment_or_abort
 from . import payments, ticket_admin_email
+from .webhook_inbox import store_webhook_event, webhook_processor
 
 logger = logging.getLogger(__name__)
 
@@ -170,6 +172,7 @@ def stripe_waiting(payment_id):
 
 @payments.route("/stripe-webhook", methods=["POST"])
 def stripe_webhook():
+    """Verify a Stripe webhook and store it in the inbox for processing."""
     try:
         event = stripe.Webhook.construct_event(
             request.data,
@@ -183,22 +186,32 @@ def stripe_webhook():
         logger.exception("Error verifying Stripe webhook signature")
         abort(400)
 
-    try:
-        livemode = app.config.get("STRIPE_LIVEMODE", not app.config["DEBUG"])
-        if event.livemode != livemode:
-            logger.error("Unexpected livemode status %s, failing", event.livemode)
-            abort(409)
+    livemode = app.config.get("STRIPE_LIVEMODE", not app.config["DEBUG"])
+    if event.livemode != livemode:
+        logger.error("Unexpected livemode status %s, failing", event.livemode)
+        abort(409)
+
+    # Order events by payment intent, as charge events are for the same payment
+    obj = event.data.object
+    ordering_key = obj.get("payment_intent") or obj.get("id") or event.id
 
-        try:
-            handler = webhook_handlers[event.type]
-        except KeyError as e:
-            handler = webhook_handlers[None]
+    store_webhook_event(
+        "stripe", event.id, event.type, ordering_key, json.loads(request.data)
+    )
+    return ("", 200)
+
+
+@webhook_processor("stripe")
+def stripe_process_event(payload):
+    """Process a stored Stripe event. Called by the webhook inbox worker."""
+    event = stripe.Event.construct_from(payload, stripe.api_key)
+
+    try:
+        handler = webhook_handlers[event.type]
+    except KeyError:
+        handler = webhook_handlers[None]
 
-        return handler(event.type, event.data.object)
-    except Exception as e:
-        logger.exception("Unhandled exception during Stripe webhook")
-        logger.info("Webhook data: %s", request.data)
-        abort(500)
+    return handler(event.type, event.data.object)
 
 
 @webhook()
@@ -265,7 +278,8 @@ def stripe_payment_paid(payment: StripePayment):
         to=[payment.user.email],
     )
 
-    already_emailed = set_tickets_emailed(payment.user)
+    receipt = load_receipt_data([payment.user])[payment.user.id]
+    already_emailed = set_tickets_emailed(payment.user, receipt)
     msg.body = render_template(
         "emails/payment-paid.txt",
         user=payment.user,
@@ -274,7 +288,7 @@ def stripe_payment_paid(payment: StripePayment):
     )
 
     if feature_enabled("ISSUE_TICKETS"):
-        attach_tickets(msg, payment.user)
+        attach_tickets(msg, payment.user, receipt)
 
     msg.send()
     db.session.commit()
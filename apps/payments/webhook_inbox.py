@@ -0,0 +1,136 @@
+""" Asynchronous processing of payment provider webhooks.
+
+    The webhook endpoints only verify and store events (see models.webhook),
+    so they can return quickly without waiting on the provider's API or holding
+    payment locks. Stored events are processed here, either by the
+    `process_webhooks` scheduled task or by one or more long-running
+    `flask payments webhook_worker` processes.
+
+    Set WEBHOOK_PROCESS_INLINE to process events during the webhook request,
+    which is useful in development where no worker is running.
+"""
+import time
+from datetime import timedelta
+
+import click
+from flask import current_app as app, has_request_context
+from werkzeug.exceptions import HTTPException
+
+from main import db
+from models.scheduled_task import scheduled_task
+from models.webhook import WebhookEvent
+from . import payments
+
+# How long a worker has to process an event before it's retried by someone else
+WEBHOOK_LEASE = timedelta(minutes=5)
+
+webhook_processors = {}
+
+
+class WebhookProcessingError(Exception):
+    pass
+
+
+def webhook_processor(provider):
+    def inner(f):
+        webhook_processors[provider] = f
+        return f
+
+    return inner
+
+
+def store_webhook_event(provider, event_id, event_type, ordering_key, payload):
+    if WebhookEvent.store(provider, event_id, event_type, ordering_key, payload):
+        app.logger.info("Stored %s webhook %s (%s)", provider, event_id, event_type)
+    else:
+        app.logger.info("Ignoring duplicate %s webhook %s", provider, event_id)
+    db.session.commit()
+
+    if app.config.get("WEBHOOK_PROCESS_INLINE"):
+        process_pending_webhooks()
+
+
+def process_webhook_event(event: WebhookEvent):
+    """Run the provider's handler for an event, raising if it didn't succeed."""
+    try:
+        response = webhook_processors[event.provider](event.payload)
+    except HTTPException as e:
+        raise WebhookProcessingError(f"Handler aborted with {e.code}") from e
+
+    # Handlers return a Flask-style (body, status) tuple
+    if isinstance(response, tuple) and len(response) > 1 and response[1] >= 400:
+        raise WebhookProcessingError(f"Handler returned {response[1]}")
+
+
+def process_next_webhook() -> bool:
+    """Claim and process a single event. Returns False if there was nothing to do."""
+    event = WebhookEvent.claim_next(WEBHOOK_LEASE)
+    if event is None:
+        db.session.commit()
+        return False
+    # Release the row lock; the lease stops anyone else picking it up
+    db.session.commit()
+
+    event_id = event.id
+    app.logger.info("Processing %r (attempt %s)", event, event.attempts)
+    try:
+        if has_request_context():
+            process_webhook_event(event)
+        else:
+            # Handlers send emails which need to build URLs
+            with app.test_request_context():
+                process_webhook_event(event)
+    except Exception as e:
+        app.logger.exception("Error processing webhook event %s", event_id)
+        db.session.rollback()
+        event = WebhookEvent.query.get(event_id)
+        event.mark_failed(repr(e))
+    else:
+        event = WebhookEvent.query.get(event_id)
+        event.mark_processed()
+
+    db.session.commit()
+    return True
+
+
+def process_pending_webhooks(limit=None) -> int:
+    count = 0
+    while limit is None or count < limit:
+        if not process_next_webhook():
+            break
+        count += 1
+    return count
+
+
+@scheduled_task(minutes=1)
+def process_webhooks():
+    """Process any webhook events not picked up by a worker"""
+    return process_pending_webhooks(limit=500)
+
+
+@payments.cli.command("webhook_worker")
+@click.option("--interval", type=float, default=1.0, help="Seconds to wait when idle")
+def webhook_worker(interval):
+    """Process webhook events as they arrive. Several workers can run at once."""
+    app.logger.info("Webhook worker started")
+    while True:
+        if not process_next_webhook():
+            time.sleep(interval)
+
+
+@payments.cli.command("webhook_replay")
+@click.argument("event_ids", type=int, nargs=-1)
+@click.option("--failed", is_flag=True, help="Replay all events which gave up")
+def webhook_replay(event_ids, failed):
+    """Mark stored webhook events to be processed again"""
+    events = list(WebhookEvent.query.filter(WebhookEvent.id.in_(event_ids)))
+    if failed:
+        events += WebhookEvent.query.filter(
+            WebhookEvent.processed == None,  # noqa: E711
+            ~WebhookEvent.pending(),
+        ).all()
+
+    for event in events:
+        app.logger.info("Replaying %r", event)
+        event.replay()
+    db.session.commit()
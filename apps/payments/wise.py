@@ -1,17 +1,28 @@
+import hashlib
 import logging
 
 from datetime import datetime, timedelta
+from dateutil.parser import parse as parse_date
 from flask import abort, current_app as app, request
+from sqlalchemy import tuple_
 from pywisetransfer.exceptions import InvalidWebhookSignature
 from pywisetransfer.webhooks import validate_request
 
 from models.payment import BankAccount, BankTransaction
 from . import payments
 from .banktransfer import reconcile_txns
-from main import db, wise
+from .webhook_inbox import store_webhook_event, webhook_processor
+from main import cache, db, wise
 
 logger = logging.getLogger(__name__)
 
+# How far back to fetch on an account's first sync, or a full sync
+WISE_SYNC_INITIAL_WINDOW = timedelta(days=7)
+# How far before the last sync to fetch from, to catch transactions posted late
+WISE_SYNC_OVERLAP = timedelta(hours=1)
+# How long a webhook-triggered sync may hold off others for the same account
+WISE_SYNC_RUNNING_TIMEOUT = 5 * 60
+
 
 webhook_handlers = {}
 
@@ -48,19 +59,28 @@ def wise_webhook():
         abort(500)
 
     event_type = request.json.get("event_type")
-    try:
-        handler = webhook_handlers[event_type]
-    except KeyError:
+    if event_type not in webhook_handlers:
         logger.warning("Unhandled Wise webhook event type %s", event_type)
         # logger.info("Webhook data: %s", request.data)
         abort(500)
 
-    try:
-        return handler(event_type, request.json)
-    except Exception:
-        logger.exception("Unhandled exception during Wise webhook")
-        # logger.info("Webhook data: %s", request.data)
-        abort(500)
+    # Wise doesn't include an event ID in the payload, so fall back to a hash
+    # of the body to make redelivery idempotent.
+    event_id = request.headers.get("X-Delivery-Id") or hashlib.sha256(request.data).hexdigest()
+    resource = request.json.get("data", {}).get("resource", {})
+    ordering_key = "{}:{}".format(
+        resource.get("id"), request.json.get("data", {}).get("currency")
+    )
+
+    store_webhook_event("wise", event_id, event_type, ordering_key, request.json)
+    return ("", 204)
+
+
+@webhook_processor("wise")
+def wise_process_event(payload):
+    """Process a stored Wise event. Called by the webhook inbox worker."""
+    event_type = payload.get("event_type")
+    return webhook_handlers[event_type](event_type, payload)
 
 
 @webhook("balances#credit")
@@ -103,7 +123,7 @@ def wise_balance_credit(event_type, event):
         return ("", 204)
 
     try:
-        sync_wise_statement(profile_id, borderless_account_id, currency)
+        request_wise_sync(profile_id, borderless_account_id, currency)
     except Exception:
         logger.exception("Error fetching statement")
         return ("", 500)
@@ -111,10 +131,71 @@ def wise_balance_credit(event_type, event):
     return ("", 204)
 
 
-def sync_wise_statement(profile_id, borderless_account_id, currency):
-    # Retrieve an account transaction statement for the past week
+def _statement_txn_key(transaction):
+    """The fields we use to identify a statement transaction, as they're stored."""
+    posted = transaction.date
+    if isinstance(posted, str):
+        # Stored as a naive UTC timestamp
+        posted = parse_date(posted).replace(tzinfo=None)
+    return (
+        posted,
+        transaction.details.type.lower(),
+        transaction.details.paymentReference,
+    )
+
+
+def request_wise_sync(profile_id, borderless_account_id, currency):
+    """Sync an account's statement, coalescing syncs requested while one is running.
+
+    A burst of webhooks for one account results in one sync, plus one more if
+    any arrived while it was running, so credits posted during a sync aren't
+    missed until the next webhook.
+    """
+    running_key = f"wise_sync_running/{borderless_account_id}/{currency}"
+    pending_key = f"wise_sync_pending/{borderless_account_id}/{currency}"
+
+    # Flag the request before checking for a running sync, so that a sync
+    # which is just finishing always sees it
+    cache.set(pending_key, True, timeout=WISE_SYNC_RUNNING_TIMEOUT)
+    while True:
+        if not cache.add(running_key, True, timeout=WISE_SYNC_RUNNING_TIMEOUT):
+            logger.info(
+                "Statement sync for %s %s already running, it will sync again when done",
+                borderless_account_id,
+                currency,
+            )
+            return
+
+        try:
+            cache.delete(pending_key)
+            sync_wise_statement(profile_id, borderless_account_id, currency)
+        finally:
+            cache.delete(running_key)
+
+        if not cache.get(pending_key):
+            return
+
+
+def sync_wise_statement(profile_id, borderless_account_id, currency, full=False):
+    """Import new credits from a Wise account statement and reconcile them.
+
+    Only the window since the account's high-water mark (less an overlap, in case
+    transactions are posted late) is fetched, unless `full` is set, in which case
+    the last WISE_SYNC_INITIAL_WINDOW is fetched to catch anything missed.
+    """
+    bank_account = BankAccount.query.filter_by(
+        borderless_account_id=borderless_account_id,
+        currency=currency,
+    ).one()
+    synced_until = bank_account.wise_synced_until
+    db.session.commit()
+
     interval_end = datetime.utcnow()
-    interval_start = interval_end - timedelta(days=7)
+    if synced_until is None or full:
+        interval_start = interval_end - WISE_SYNC_INITIAL_WINDOW
+    else:
+        interval_start = synced_until - WISE_SYNC_OVERLAP
+
     statement = wise.borderless_accounts.statement(
         profile_id,
         borderless_account_id,
@@ -140,44 +221,59 @@ def sync_wise_statement(profile_id, borderless_account_id, currency):
         db.session.commit()
         return
 
-    # Retrieve or construct transactions for each credit in the statement
-    txns = []
-    for transaction in statement.transactions:
-        if transaction.type != "CREDIT":
-            continue
-
-        if transaction.details.type != "DEPOSIT":
-            continue
-
-        # Attempt to find transaction in the application database
-        # TODO: we should probably check the amount_int, too
-        txn = BankTransaction.query.filter_by(
-            account_id=bank_account.id,
-            posted=transaction.date,
-            type=transaction.details.type.lower(),
-            payee=transaction.details.paymentReference,
-        ).first()
+    credits = [
+        transaction
+        for transaction in statement.transactions
+        if transaction.type == "CREDIT" and transaction.details.type == "DEPOSIT"
+    ]
+
+    # Find which of these we've already imported in one query
+    # TODO: we should probably check the amount_int, too
+    keys = {_statement_txn_key(transaction) for transaction in credits}
+    existing = set()
+    if keys:
+        existing = set(
+            BankTransaction.query.filter(
+                BankTransaction.account_id == bank_account.id,
+                tuple_(
+                    BankTransaction.posted,
+                    BankTransaction.type,
+                    BankTransaction.payee,
+                ).in_(keys),
+            ).with_entities(
+                BankTransaction.posted, BankTransaction.type, BankTransaction.payee
+            )
+        )
 
-        # Construct a transaction record if not found
-        if txn:
+    # Construct transaction records for any we haven't seen
+    txns = []
+    for transaction in credits:
+        key = _statement_txn_key(transaction)
+        if key in existing:
             continue
+        existing.add(key)
 
+        posted, type, payee = key
         txn = BankTransaction(
             account_id=bank_account.id,
-            posted=transaction.date,
-            type=transaction.details.type.lower(),
+            posted=posted,
+            type=type,
             amount=transaction.amount.value,
-            payee=transaction.details.paymentReference,
+            payee=payee,
             wise_id=transaction.referenceNumber,
         )
         db.session.add(txn)
         txns.append(txn)
 
+    if bank_account.wise_synced_until is None or bank_account.wise_synced_until < interval_end:
+        bank_account.wise_synced_until = interval_end
+
     logger.info("Imported %s transactions", len(txns))
     db.session.commit()
 
-    logger.info("Reconciling...")
-    reconcile_txns(txns, doit=True)
+    if txns:
+        logger.info("Reconciling...")
+        reconcile_txns(txns, doit=True)
 
 
 def wise_business_profile():
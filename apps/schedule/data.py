@@ -3,6 +3,7 @@ from collections import defaultdict
 from werkzeug.datastructures import MultiDict
 from flask_login import current_user
 from slugify import slugify_unicode as slugify
+from sqlalchemy.orm import joinedload
 
 from models import event_year
 from models.cfp import Proposal, Venue
@@ -108,13 +109,17 @@ def _get_scheduled_proposals(filter_obj={}, override_user=None):
         proposal_favourites = [f.id for f in user.favourites]
         external_favourites = [f.id for f in user.calendar_favourites]
 
-    schedule = Proposal.query.filter(
-        Proposal.is_accepted,
-        Proposal.scheduled_time.isnot(None),
-        Proposal.scheduled_venue_id.isnot(None),
-        Proposal.scheduled_duration.isnot(None),
-        Proposal.hide_from_schedule.isnot(True),
-    ).all()
+    schedule = (
+        Proposal.query.filter(
+            Proposal.is_accepted,
+            Proposal.scheduled_time.isnot(None),
+            Proposal.scheduled_venue_id.isnot(None),
+            Proposal.scheduled_duration.isnot(None),
+            Proposal.hide_from_schedule.isnot(True),
+        )
+        .options(joinedload(Proposal.scheduled_venue), joinedload(Proposal.user))
+        .all()
+    )
 
     schedule = [_get_proposal_dict(p, proposal_favourites) for p in schedule]
 
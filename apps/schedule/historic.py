@@ -2,6 +2,9 @@
 
     These are served from static files in this repository as the database is wiped every year.
 """
+import os
+from collections import defaultdict
+
 from flask import render_template, abort, redirect, url_for, send_file
 from dateutil.parser import parse as date_parse
 
@@ -9,9 +12,11 @@ from models import event_year
 from models.cfp import proposal_slug
 from ..common import load_archive_file, archive_file
 
+HISTORIC_YEARS_START = 2012
+
 
 def abort_if_invalid_year(year):
-    if not 2012 <= year < event_year():
+    if not HISTORIC_YEARS_START <= year < event_year():
         abort(404)
 
 
@@ -25,16 +30,149 @@ def parse_event(event):
     return event
 
 
+# Parsed archive data, keyed by year. Each entry also records the mtimes of the
+# files it was built from so a redeploy with new archive data is picked up.
+_archive_index = {}
+
+
+class HistoricArchive:
+    """An index over a single year's archived schedule, built once per process.
+
+    Callers must treat the returned events as read-only, as they're shared
+    between requests.
+    """
+
+    def __init__(self, year, schedule, event_data):
+        self.year = year
+        self.event = event_data
+        self.by_id = {}
+        for event in schedule:
+            self.by_id[event["id"]] = parse_event(dict(event))
+        self.venues = self._bucket_venues()
+
+    def _bucket_venues(self):
+        stage_events = []
+        workshop_events = []
+        youth_events = []
+        film_events = []
+        music_events = []
+        performance_events = []
+        attendee_events = []
+
+        seen_titles = defaultdict(set)
+
+        for parsed in self.by_id.values():
+            if parsed["source"] == "external":
+                continue
+
+            # Listings tweak titles and speakers, so don't modify the item page's copy
+            event = dict(parsed)
+
+            # Hack to remove Stitch's "hilarious" failed <script>
+            if "<script>" in event.get("speaker", ""):
+                event["speaker"] = event["speaker"][
+                    0 : event["speaker"].find("<script>")
+                ]  # "Some idiot"
+
+            # All official (non-external) content is on a stage or workshop, so we don't care about anything that isn't
+            # Pre-2022 we didn't have is_from_cfp.
+            if not event.get("is_from_cfp", True):
+                events_list = attendee_events
+            elif event["type"] == "talk":
+                events_list = stage_events
+            elif event["type"] == "performance":
+                if "[Film]" in event.get("title"):
+                    event["title"] = event["title"].replace("[Film] ", "")
+                    events_list = film_events
+                elif "[Music]" in event.get("title") or event.get("venue") == "Null Sector":
+                    event["title"] = event["title"].replace("[Music] ", "")
+                    events_list = music_events
+                else:
+                    events_list = performance_events
+            elif event["type"] == "workshop":
+                events_list = workshop_events
+            elif event["type"] == "youthworkshop":
+                events_list = youth_events
+            else:
+                continue
+
+            # Make sure it's not already in the list (basically repeated workshops)
+            if event["title"] in seen_titles[id(events_list)]:
+                continue
+            seen_titles[id(events_list)].add(event["title"])
+            events_list.append(event)
+
+        def sort_key(event):
+            # Sort should avoid leading punctuation and whitespace and be case-insensitive
+            return event["title"].strip().strip("'").upper()
+
+        stage_events.sort(key=sort_key)
+        workshop_events.sort(key=sort_key)
+        youth_events.sort(key=sort_key)
+        film_events.sort(key=sort_key)
+        music_events.sort(key=sort_key)
+        performance_events.sort(key=sort_key)
+        attendee_events.sort(key=sort_key)
+
+        venues = [
+            {"name": "Main Stages", "events": stage_events},
+            {"name": "Workshops", "events": workshop_events},
+        ]
+
+        if len(youth_events) > 0:
+            venues.append({"name": "Youth Workshops", "events": youth_events})
+
+        if len(music_events) > 0:
+            venues.append({"name": "Music", "events": music_events})
+
+        if len(film_events) > 0:
+            venues.append({"name": "Films", "events": film_events})
+
+        if len(performance_events) > 0:
+            venues.append({"name": "Performances", "events": performance_events})
+
+        if len(attendee_events) > 0:
+            venues.append(
+                {
+                    "name": "Attendee Events",
+                    "description": "We encourage people to run their own talks, performances, workshops, and community meetups during the event. These are the ones that people added to the schedule.",
+                    "events": attendee_events,
+                }
+            )
+
+        return venues
+
+
+def historic_archive(year) -> HistoricArchive:
+    """Return the index for a year's archive, (re)building it if the
+    archived schedule or event data has changed on disk since it was last loaded.
+
+    Aborts with a 404 if there's no archived schedule for that year.
+    """
+    schedule_path = archive_file(year, "public", "schedule.json")
+    event_path = archive_file(year, "event.json", raise_404=False)
+    mtimes = (
+        os.path.getmtime(schedule_path),
+        os.path.getmtime(event_path) if event_path is not None else None,
+    )
+
+    cached = _archive_index.get(year)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    schedule = load_archive_file(year, "public", "schedule.json")
+    event_data = load_archive_file(year, "event.json", raise_404=False)
+    archive = HistoricArchive(year, schedule, event_data)
+    _archive_index[year] = (mtimes, archive)
+    return archive
+
+
 def item_historic(year, proposal_id, slug):
     """Handler to display a detail page for a schedule item."""
     abort_if_invalid_year(year)
 
-    #  We might want to look at performance here but I'm not sure it's a huge issue at the moment
-    data = load_archive_file(year, "public", "schedule.json")
-    for item in data:
-        if item["id"] == proposal_id:
-            break
-    else:
+    item = historic_archive(year).by_id.get(proposal_id)
+    if item is None:
         abort(404)
 
     correct_slug = proposal_slug(item["title"])
@@ -43,98 +181,12 @@ def item_historic(year, proposal_id, slug):
             url_for(".item", year=year, proposal_id=proposal_id, slug=correct_slug)
         )
 
-    return render_template(
-        "schedule/historic/item.html", event=parse_event(item), year=year
-    )
+    return render_template("schedule/historic/item.html", event=item, year=year)
 
 
 def historic_talk_data(year):
-    schedule = load_archive_file(year, "public", "schedule.json")
-    event_data = load_archive_file(year, "event.json", raise_404=False)
-
-    stage_events = []
-    workshop_events = []
-    youth_events = []
-    film_events = []
-    music_events = []
-    performance_events = []
-    attendee_events = []
-
-    for event in [parse_event(event) for event in schedule]:
-        if event["source"] == "external":
-            continue
-
-        # Hack to remove Stitch's "hilarious" failed <script>
-        if "<script>" in event.get("speaker", ""):
-            event["speaker"] = event["speaker"][
-                0 : event["speaker"].find("<script>")
-            ]  # "Some idiot"
-
-        # All official (non-external) content is on a stage or workshop, so we don't care about anything that isn't
-        # Pre-2022 we didn't have is_from_cfp.
-        if not event.get("is_from_cfp", True):
-            events_list = attendee_events
-        elif event["type"] == "talk":
-            events_list = stage_events
-        elif event["type"] == "performance":
-            if "[Film]" in event.get("title"):
-                event["title"] = event["title"].replace("[Film] ", "")
-                events_list = film_events
-            elif "[Music]" in event.get("title") or event.get("venue") == "Null Sector":
-                event["title"] = event["title"].replace("[Music] ", "")
-                events_list = music_events
-            else:
-                events_list = performance_events
-        elif event["type"] == "workshop":
-            events_list = workshop_events
-        elif event["type"] == "youthworkshop":
-            events_list = youth_events
-        else:
-            continue
-
-        # Make sure it's not already in the list (basically repeated workshops)
-        if not any(e["title"] == event["title"] for e in events_list):
-            events_list.append(event)
-
-    def sort_key(event):
-        # Sort should avoid leading punctuation and whitespace and be case-insensitive
-        return event["title"].strip().strip("'").upper()
-
-    stage_events.sort(key=sort_key)
-    workshop_events.sort(key=sort_key)
-    youth_events.sort(key=sort_key)
-    film_events.sort(key=sort_key)
-    music_events.sort(key=sort_key)
-    performance_events.sort(key=sort_key)
-    attendee_events.sort(key=sort_key)
-
-    venues = [
-        {"name": "Main Stages", "events": stage_events},
-        {"name": "Workshops", "events": workshop_events},
-    ]
-
-    if len(youth_events) > 0:
-        venues.append({"name": "Youth Workshops", "events": youth_events})
-
-    if len(music_events) > 0:
-        venues.append({"name": "Music", "events": music_events})
-
-    if len(film_events) > 0:
-        venues.append({"name": "Films", "events": film_events})
-
-    if len(performance_events) > 0:
-        venues.append({"name": "Performances", "events": performance_events})
-
-    if len(attendee_events) > 0:
-        venues.append(
-            {
-                "name": "Attendee Events",
-                "description": "We encourage people to run their own talks, performances, workshops, and community meetups during the event. These are the ones that people added to the schedule.",
-                "events": attendee_events,
-            }
-        )
-
-    return {"year": year, "venues": venues, "event": event_data}
+    archive = historic_archive(year)
+    return {"year": year, "venues": archive.venues, "event": archive.event}
 
 
 def talks_historic(year):
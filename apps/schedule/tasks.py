@@ -1,13 +1,20 @@
 """ Schedule CLI tasks """
 import json
 from collections import OrderedDict
+import time
 
+import click
 from flask import current_app as app
+from flask_login import AnonymousUserMixin
 
 from main import db
+from models import event_year
 from models.ical import CalendarSource
 
 from . import schedule
+from ..common import archive_file
+from .historic import HISTORIC_YEARS_START, historic_archive
+from .data import _get_scheduled_proposals
 
 
 @schedule.cli.command("create_calendars")
@@ -70,3 +77,37 @@ def export_calendars(self):
         data.append(source_data)
 
     json.dump(data, open("calendars.json", "w"), indent=4, separators=(",", ": "))
+
+
+@schedule.cli.command("load_historic")
+def load_historic():
+    """Parse and index every archived schedule, to catch broken archives at deploy time"""
+    for year in range(HISTORIC_YEARS_START, event_year()):
+        if archive_file(year, "public", "schedule.json", raise_404=False) is None:
+            continue
+        archive = historic_archive(year)
+        app.logger.info("Loaded %s: %s items in %s venues", year, len(archive.by_id), len(archive.venues))
+
+
+@schedule.cli.command("benchmark")
+@click.option("-n", "--runs", type=int, default=20, help="Number of runs")
+def benchmark(runs):
+    """Time building the full schedule, as used by the schedule feeds"""
+    timings = []
+    with app.test_request_context():
+        for _ in range(runs):
+            # Start each run with an empty identity map, like a new request
+            db.session.remove()
+            start = time.perf_counter()
+            schedule = _get_scheduled_proposals(override_user=AnonymousUserMixin())
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    app.logger.info(
+        "%s entries, %s runs: min %.1fms, median %.1fms, max %.1fms",
+        len(schedule),
+        runs,
+        timings[0] * 1000,
+        timings[len(timings) // 2] * 1000,
+        timings[-1] * 1000,
+    )
@@ -43,6 +43,7 @@ from ..common.receipt import (
     render_receipt,
     attach_tickets,
     set_tickets_emailed,
+    load_receipt_data,
 )
 
 from .forms import TicketTransferForm
@@ -143,7 +144,8 @@ def transfer(ticket_id):
             to=[to_user.email],
         )
 
-        already_emailed = set_tickets_emailed(to_user)
+        receipt = load_receipt_data([to_user])[to_user.id]
+        already_emailed = set_tickets_emailed(to_user, receipt)
         msg.body = render_template(
             "emails/purchase-transfer-new-owner.txt",
             to_user=to_user,
@@ -155,7 +157,7 @@ def transfer(ticket_id):
         )
 
         if feature_enabled("ISSUE_TICKETS"):
-            attach_tickets(msg, to_user)
+            attach_tickets(msg, to_user, receipt)
 
         msg.send()
         db.session.commit()
@@ -231,3 +233,4 @@ def get_product_view(flow):
 from . import tasks  # noqa
 from . import choose  # noqa
 from . import pay  # noqa
+from . import admission_queue  # noqa
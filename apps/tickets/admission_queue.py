@@ -0,0 +1,147 @@
+""" Admission queue for ticket sales.
+
+    When a ticket round opens, everyone arrives at the tickets page at once, and
+    the capacity checks in the basket serialise on row locks. If TICKET_QUEUE_RATE
+    is set, visitors to the ticket flow are instead given a numbered place in a
+    queue held in the shared cache, and admitted at that many per second.
+
+    Once admitted, a visitor gets a signed token in their session which lets them
+    through until it expires (TICKET_QUEUE_TOKEN_HOURS, default 1). Queued visitors
+    see a page which polls `tickets.queue_status`.
+
+    Queue numbers come from a database sequence, so they're unique across
+    workers even when lots of people join at once. Joining takes one query for
+    the next number; polling only reads the cache, unless the cache has lost
+    the last number issued. The queue start time and the last number issued
+    should be in a cache shared between workers in production.
+"""
+import math
+import time
+from typing import Optional
+
+from flask import (
+    render_template,
+    redirect,
+    url_for,
+    session,
+    current_app as app,
+)
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from main import cache, db
+from models import BaseModel
+from models.user import generate_timed_hmac, verify_timed_hmac
+from ..common import json_response
+
+from . import tickets
+
+ticket_queue_number = db.Sequence("ticket_queue_number", metadata=BaseModel.metadata)
+
+QUEUE_START_KEY = "ticket_queue_start"
+QUEUE_JOINED_KEY = "ticket_queue_joined"
+
+
+def queue_enabled() -> bool:
+    return bool(app.config.get("TICKET_QUEUE_RATE"))
+
+
+def admitted_count() -> int:
+    """How many queue numbers have been admitted so far.
+
+    This advances at TICKET_QUEUE_RATE per second from the queue start time.
+    If nobody's waiting, the start time is moved forward so that unused
+    admissions aren't banked and released all at once when a rush arrives.
+    """
+    rate = float(app.config["TICKET_QUEUE_RATE"])
+    now = time.time()
+    joined = cache.get(QUEUE_JOINED_KEY)
+    if joined is None:
+        joined = db.session.execute(text("SELECT last_value FROM ticket_queue_number")).scalar()
+        cache.set(QUEUE_JOINED_KEY, joined, timeout=0)
+    start = cache.get(QUEUE_START_KEY)
+
+    if start is None or (now - start) * rate > joined:
+        start = now - joined / rate
+        cache.set(QUEUE_START_KEY, start, timeout=0)
+
+    # Allow for float error, so a visitor isn't held for a whole tick
+    return math.floor((now - start) * rate + 1e-6)
+
+
+def has_queue_token() -> bool:
+    token = session.get("ticket_queue_token")
+    if not token:
+        return False
+
+    valid_hours = app.config.get("TICKET_QUEUE_TOKEN_HOURS", 1)
+    number = verify_timed_hmac(
+        "ticket-queue-", app.config["SECRET_KEY"], time.time(), token, valid_hours
+    )
+    return number is not None
+
+
+def queue_position() -> Optional[int]:
+    """The number of people ahead of the current visitor, joining the queue if
+    they haven't already. Visitors who reach the front are issued a token.
+
+    Returns None if a queue number can't be allocated, in which case the
+    visitor stays in the queue and tries again on their next poll.
+    """
+    number = session.get("ticket_queue_number")
+    if number is None:
+        try:
+            number = db.session.execute(select(ticket_queue_number.next_value())).scalar()
+        except SQLAlchemyError:
+            app.logger.exception("Unable to allocate ticket queue number")
+            db.session.rollback()
+            return None
+        session["ticket_queue_number"] = number
+        # Only used to stop unused admissions being banked, so a racing
+        # worker briefly setting a slightly lower number doesn't matter
+        cache.set(QUEUE_JOINED_KEY, number, timeout=0)
+
+    position = number - admitted_count()
+    if position <= 0:
+        session["ticket_queue_token"] = generate_timed_hmac(
+            "ticket-queue-", app.config["SECRET_KEY"], time.time(), number
+        )
+        del session["ticket_queue_number"]
+        return 0
+
+    return position
+
+
+def check_queue(flow):
+    """Returns a redirect to the queue page if the visitor hasn't been admitted."""
+    if not queue_enabled() or has_queue_token():
+        return None
+
+    if queue_position() != 0:
+        session["ticket_queue_flow"] = flow
+        return redirect(url_for("tickets.queue"))
+
+    return None
+
+
+@tickets.route("/tickets/queue")
+def queue():
+    if not queue_enabled() or has_queue_token():
+        return redirect(url_for("tickets.main", flow=session.get("ticket_queue_flow")))
+
+    position = queue_position()
+    if position == 0:
+        return redirect(url_for("tickets.main", flow=session.get("ticket_queue_flow")))
+
+    return render_template("tickets/queue.html", position=position)
+
+
+@tickets.route("/tickets/queue/status")
+@json_response
+def queue_status():
+    if not queue_enabled() or has_queue_token():
+        return {"admitted": True, "position": 0}
+
+    position = queue_position()
+    return {"admitted": position == 0, "position": position}
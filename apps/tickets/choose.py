@@ -14,15 +14,23 @@ from sqlalchemy.orm import joinedload
 
 from main import db
 from models.exc import CapacityException
-from models.product import PriceTier, ProductView, ProductViewProduct, Product, Voucher
+from models.product import (
+    PriceTier,
+    ProductGroup,
+    ProductView,
+    Product,
+    Voucher,
+    get_view_catalogue,
+)
 from models.basket import Basket
 from models.site_state import get_sales_state
 from typing import Optional
 
 from ..common import get_user_currency, set_user_currency, feature_enabled
 from ..common.email import from_email
-from ..common.receipt import attach_tickets, set_tickets_emailed
+from ..common.receipt import attach_tickets, set_tickets_emailed, load_receipt_data
 
+from .admission_queue import check_queue
 from .forms import TicketAmountsForm
 from . import tickets, empty_baskets, no_capacity, invalid_vouchers, get_product_view
 
@@ -40,6 +48,10 @@ def main(flow="main"):
     allowing us to have different categories of items on sale, for example tickets
     on one page, and t-shirts on a separate page.
     """
+    # If there's a rush on, make the user wait their turn before we do any work.
+    if response := check_queue(flow):
+        return response
+
     # Fetch the ProductView and determine if this user is allowed to view it.
     view = get_product_view(flow)
 
@@ -69,8 +81,8 @@ def main(flow="main"):
         return render_template("tickets/cutoff.html")
 
     # OK, looks like we can try and sell the user some stuff.
-    products = products_for_view(view)
-    form = TicketAmountsForm(products)
+    tiers = tiers_for_view(view)
+    form = TicketAmountsForm(tiers)
     basket = Basket.from_session(current_user, get_user_currency())
 
     if request.method != "POST":
@@ -97,7 +109,8 @@ def main(flow="main"):
         # If the user has any reservations, they bypass the unavailable state.
         # This means someone can use another view to get access to this one
         # again. I'm not sure what to do about this. It usually won't matter.
-        available = any(p.product in products for p in basket.purchases)
+        product_ids = {tier.product_id for tier in tiers}
+        available = any(p.product_id in product_ids for p in basket.purchases)
 
     if form.validate_on_submit() and (
         form.buy_tickets.data or form.buy_hire.data or form.buy_other.data
@@ -130,20 +143,29 @@ def main(flow="main"):
     )
 
 
-def products_for_view(product_view) -> list[ProductViewProduct]:
-    # Note that this function is performance-critical. It should load all the product data
-    # necessary for the high-traffic tickets page to render in a single query. If you change
-    # this, make sure that you monitor the number of queries emitted by the tickets page.
-    return (
-        ProductViewProduct.query.filter_by(view_id=product_view.id)
-        .join(ProductViewProduct.product)
-        .with_entities(Product)
-        .order_by(ProductViewProduct.order)
-        .options(joinedload(Product.price_tiers).joinedload(PriceTier.prices))
-        .options(joinedload(Product.parent))
-        .options(joinedload("parent.parent"))
+def tiers_for_view(product_view) -> list[PriceTier]:
+    # Note that this function is performance-critical. The cached catalogue decides
+    # which tiers are on sale, so this only fetches those tiers (with their prices and
+    # the parents needed for capacity checks) in a single query. If you change this,
+    # make sure that you monitor the number of queries emitted by the tickets page.
+    catalogue = get_view_catalogue(product_view.name)
+    if catalogue is None:
+        return []
+
+    tier_ids = [tier["id"] for tier in catalogue["tiers"]]
+    tiers = (
+        PriceTier.query.filter(PriceTier.id.in_(tier_ids), PriceTier.active)
+        .options(joinedload(PriceTier.prices))
+        .options(
+            joinedload(PriceTier.parent)
+            .joinedload(Product.parent)
+            .joinedload(ProductGroup.parent)
+        )
     ).all()
 
+    tiers_by_id = {tier.id: tier for tier in tiers}
+    return [tiers_by_id[id] for id in tier_ids if id in tiers_by_id]
+
 
 def handle_ticket_selection(form, view: ProductView, flow: str, basket: Basket):
     """
@@ -257,7 +279,8 @@ def handle_free_tickets(flow: str, view: ProductView, basket: Basket):
         to=[current_user.email],
     )
 
-    already_emailed = set_tickets_emailed(current_user)
+    receipt = load_receipt_data([current_user])[current_user.id]
+    already_emailed = set_tickets_emailed(current_user, receipt)
     msg.body = render_template(
         "emails/tickets-ordered-email-free.txt",
         user=current_user,
@@ -265,7 +288,7 @@ def handle_free_tickets(flow: str, view: ProductView, basket: Basket):
         already_emailed=already_emailed,
     )
     if feature_enabled("ISSUE_TICKETS"):
-        attach_tickets(msg, current_user)
+        attach_tickets(msg, current_user, receipt)
 
     msg.send()
 
@@ -13,7 +13,7 @@ from wtforms import (
     BooleanField,
 )
 from models.basket import Basket
-from models.product import PriceTier, ProductViewProduct, Voucher
+from models.product import PriceTier, Voucher
 
 from models.user import User
 from models.payment import BankPayment, StripePayment
@@ -38,28 +38,10 @@ class TicketAmountsForm(Form):
     currency_code = HiddenField("Currency")
     set_currency = StringField("Set Currency", [Optional()])
 
-    def __init__(self, products: list[ProductViewProduct]):
-        self._tiers = self._get_price_tiers(products)
-        super().__init__()
-
-    def _get_price_tiers(
-        _self, products: list[ProductViewProduct]
-    ) -> dict[int, PriceTier]:
-        """Get the price tiers we want to show in this form"""
+    def __init__(self, tiers: list[PriceTier]):
         # Order of tiers is important, but dict is ordered these days
-        tiers = {}
-        for product in products:
-            pts = [tier for tier in product.price_tiers if tier.active]
-            if len(pts) > 1:
-                app.logger.error(
-                    "Multiple active PriceTiers found for %s. Excluding product.",
-                    product,
-                )
-                continue
-
-            pt = pts[0]
-            tiers[pt.id] = pt
-        return tiers
+        self._tiers = {tier.id: tier for tier in tiers}
+        super().__init__()
 
     def populate(form, basket):
         """Populate the form with price tiers, with the amount pre-filled from
@@ -107,6 +89,8 @@ class TicketAmountsForm(Form):
 
     def add_to_basket(form, basket):
         """Add selected tickets to the provided basket."""
+        # Compare against what's really reserved, not the session's summary
+        basket.ensure_loaded()
         for f in form.tiers:
             pt = f._tier
             if f.amount.data != basket.get(pt, 0):
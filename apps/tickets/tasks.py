@@ -7,7 +7,12 @@ from sqlalchemy import func
 from main import db
 from apps.common import feature_enabled
 from ..common.email import from_email
-from apps.common.receipt import attach_tickets, set_tickets_emailed, RECEIPT_TYPES
+from apps.common.receipt import (
+    attach_tickets,
+    set_tickets_emailed,
+    load_receipt_data,
+    RECEIPT_TYPES,
+)
 from models.payment import Payment
 from models.product import (
     ProductGroup,
@@ -16,6 +21,7 @@ from models.product import (
     Price,
     ProductView,
     ProductViewProduct,
+    refresh_catalogue,
 )
 from models.scheduled_task import scheduled_task
 from models.purchase import Purchase
@@ -208,6 +214,7 @@ def create_product_groups():
         order += 1
 
     db.session.commit()
+    refresh_catalogue()
 
     # ('t-shirt', 'T-Shirt', 200, 10, 10, 12, "Pre-order the official Electromagnetic Field t-shirt. T-shirts will be available to collect during the event."),
 
@@ -306,6 +313,7 @@ def create_merch():
         order += 1
 
     db.session.commit()
+    refresh_catalogue()
 
 
 @scheduled_task(minutes=30)
@@ -429,12 +437,13 @@ def email_tickets():
             to=[user.email],
         )
 
-        already_emailed = set_tickets_emailed(user)
+        receipt = load_receipt_data([user])[user.id]
+        already_emailed = set_tickets_emailed(user, receipt)
         msg.body = render_template(
             "emails/receipt.txt", user=user, already_emailed=already_emailed
         )
 
-        attach_tickets(msg, user)
+        attach_tickets(msg, user, receipt)
 
         app.logger.info(
             "Emailing %s receipt for %s tickets", user.email, purchase_count
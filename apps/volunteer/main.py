@@ -1,7 +1,6 @@
 # encoding=utf-8
 from flask import redirect, url_for, current_app as app, abort
 from flask_login import current_user
-from pendulum import parse
 
 from . import volunteer, v_admin_required
 from ..common import feature_enabled, feature_flag
@@ -18,6 +17,7 @@ from models.volunteer import (
 )
 from .init_data import load_initial_venues, load_initial_roles
 from .shift_list import shift_list
+from .rota_generator import RotaDiff, apply_rota_diff, diff_rota
 
 @volunteer.route("/")
 def main():
@@ -67,35 +67,18 @@ def init_shifts():
             role.over_18_only = r.get("over_18_only", False)
             role.requires_training = r.get("requires_training", False)
 
-    for shift_role in shift_list:
-        role = Role.get_by_name(shift_role)
-        if role is None:
-            app.logger.error(f"Unknown role: {shift_role}")
-            continue
-
-        if role.shifts:
-            app.logger.info("Skipping making shifts for role: %s" % role.name)
-            continue
-
-        for shift_venue in shift_list[shift_role]:
-            venue = VolunteerVenue.get_by_name(shift_venue)
-            if venue is None:
-                app.logger.error(f"Unknown venue: {shift_venue}")
-                continue
-
-            for shift_range in shift_list[shift_role][shift_venue]:
-                shifts = Shift.generate_for(
-                    role=role,
-                    venue=venue,
-                    first=parse(shift_range["first"]),
-                    final=parse(shift_range["final"]),
-                    min=shift_range["min"],
-                    max=shift_range["max"],
-                    base_duration=shift_range.get("base_duration", 120),
-                    changeover=shift_range.get("changeover", 15),
-                )
-                for s in shifts:
-                    db.session.add(s)
+    # Only add shifts for roles which don't have any yet, so this never removes
+    # or changes shifts set up by admins. `flask dev volunteer_shifts --dry-run`
+    # does a full update.
+    roles_with_shifts = {name for name, in db.session.query(Role.name).join(Role.shifts).distinct()}
+    new_roles = {}
+    for role_name, venue_templates in shift_list.items():
+        if role_name in roles_with_shifts:
+            app.logger.info("Skipping making shifts for role: %s" % role_name)
+        else:
+            new_roles[role_name] = venue_templates
+
+    apply_rota_diff(RotaDiff(inserts=diff_rota(new_roles).inserts))
 
     db.session.commit()
     return redirect(url_for(".main"))
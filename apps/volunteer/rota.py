@@ -0,0 +1,182 @@
+"""
+    Volunteer rota read model.
+
+    Loads a day's shifts with their roles and venues, the number signed up
+    to each in one grouped query, and a volunteer's own shifts once, so the
+    schedule page makes the same number of queries however many shifts
+    there are.
+
+    Signing up locks the shifts' rows and counts their entries under that
+    lock, so concurrent sign-ups can't take a shift past max_needed.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import defer, joinedload
+
+from main import db
+from models.user import User
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, ShiftEntry
+
+
+def get_shift_counts(shift_ids: Iterable[int]) -> dict[int, int]:
+    """Number of volunteers signed up to each shift."""
+    shift_ids = list(shift_ids)
+    if not shift_ids:
+        return {}
+
+    return dict(
+        db.session.query(ShiftEntry.shift_id, func.count(ShiftEntry.user_id))
+        .filter(ShiftEntry.shift_id.in_(shift_ids))
+        .group_by(ShiftEntry.shift_id)
+    )
+
+
+class ShiftIntervals:
+    """A volunteer's shifts ordered by start time, for clash checks.
+
+    Finding the shifts which start before another ends is a binary search.
+    Shifts for the same role at the same venue may overlap, so a running
+    maximum of end times tells us when there's nothing earlier left to check.
+    """
+
+    def __init__(self, shifts: Iterable[Shift]):
+        self._build(list(shifts))
+
+    def _build(self, shifts: list[Shift]):
+        self.shifts = sorted(shifts, key=lambda s: (s.start, s.end))
+        self.starts = [s.start for s in self.shifts]
+        self.shift_ids = {s.id for s in self.shifts}
+
+        self.max_ends = []
+        max_end = None
+        for s in self.shifts:
+            max_end = s.end if max_end is None else max(max_end, s.end)
+            self.max_ends.append(max_end)
+
+    @classmethod
+    def for_user(cls, user: User) -> "ShiftIntervals":
+        shifts = (
+            Shift.query.join(ShiftEntry, ShiftEntry.shift_id == Shift.id)
+            .filter(ShiftEntry.user_id == user.id)
+            .options(
+                defer(Shift.current_count),
+                joinedload(Shift.role),
+                joinedload(Shift.venue),
+            )
+            .all()
+        )
+        return cls(shifts)
+
+    def __contains__(self, shift: Shift) -> bool:
+        return shift.id in self.shift_ids
+
+    def add(self, shift: Shift):
+        self._build(self.shifts + [shift])
+
+    def find_clash(self, shift: Shift) -> Optional[Shift]:
+        """Return one of these shifts which clashes with `shift`, as Shift.is_clash decides."""
+        i = bisect_right(self.starts, shift.end) - 1
+        while i >= 0 and self.max_ends[i] >= shift.start:
+            other = self.shifts[i]
+            if other.id != shift.id and shift.is_clash(other):
+                return other
+            i -= 1
+        return None
+
+
+def get_rota_for_day(day: str, user: User) -> dict[str, list[dict]]:
+    """A day's shifts as dicts, grouped by start time, marked with whether
+    `user` is signed up to them."""
+    shifts = (
+        Shift.query_for_day(day)
+        .options(
+            defer(Shift.current_count),
+            joinedload(Shift.role),
+            joinedload(Shift.venue),
+        )
+        .all()
+    )
+    counts = get_shift_counts(s.id for s in shifts)
+    user_shift_ids = {
+        shift_id
+        for shift_id, in db.session.query(ShiftEntry.shift_id).filter(
+            ShiftEntry.user_id == user.id
+        )
+    }
+
+    by_time = defaultdict(list)
+    for s in shifts:
+        to_add = s.to_localtime_dict(current_count=counts.get(s.id, 0))
+        to_add["is_user_shift"] = s.id in user_shift_ids
+        by_time[s.start.strftime("%H:%M")].append(to_add)
+    return by_time
+
+
+class ShiftSignupException(Exception):
+    """Raised when a volunteer can't be signed up to a shift. The message is shown to them."""
+
+
+def describe_shift(shift: Shift) -> str:
+    return f"{shift.role.name} shift at {shift.start.strftime('%a %H:%M')}"
+
+
+def lock_shifts(shift_ids: Iterable[int]) -> list[Shift]:
+    """Load shifts, holding a row lock on each until the transaction ends."""
+    # Always lock in id order, so concurrent sign-ups for overlapping sets can't deadlock
+    return (
+        Shift.query.filter(Shift.id.in_(set(shift_ids)))
+        .options(defer(Shift.current_count), joinedload(Shift.role, innerjoin=True))
+        .order_by(Shift.id)
+        .with_for_update(of=Shift)
+        .all()
+    )
+
+
+def sign_up(user: User, shift_ids: Iterable[int], trained_roles: Iterable[Role]) -> list[Shift]:
+    """Sign `user` up to all of the given shifts, or none of them.
+
+    Shifts they're already signed up to are skipped. Returns the shifts
+    they've been newly added to; the caller should commit straight away to
+    release the locks. Raises ShiftSignupException if any shift is full,
+    needs training they haven't done, or clashes with one of their shifts
+    (including the others being signed up to).
+    """
+    shift_ids = set(shift_ids)
+    shifts = lock_shifts(shift_ids)
+    if len(shifts) != len(shift_ids):
+        raise ShiftSignupException("Shift not found.")
+
+    # Counted after taking the locks, so this sees any sign-up which held them before us
+    counts = get_shift_counts(shift_ids)
+    intervals = ShiftIntervals.for_user(user)
+    trained_roles = set(trained_roles)
+
+    new_shifts = []
+    for shift in sorted(shifts, key=lambda s: (s.start, s.end)):
+        if shift in intervals:
+            continue
+
+        if counts.get(shift.id, 0) >= shift.max_needed:
+            raise ShiftSignupException(f"The {describe_shift(shift)} is already full.")
+
+        if shift.role.requires_training and shift.role not in trained_roles:
+            raise ShiftSignupException(
+                f"You must complete training before you can sign up for the {describe_shift(shift)}."
+            )
+
+        clashing_shift = intervals.find_clash(shift)
+        if clashing_shift:
+            raise ShiftSignupException(
+                f"The {describe_shift(shift)} clashes with your {describe_shift(clashing_shift)}."
+            )
+
+        intervals.add(shift)
+        new_shifts.append(shift)
+
+    for shift in new_shifts:
+        db.session.add(ShiftEntry(user=user, shift=shift))
+    return new_shifts
@@ -0,0 +1,155 @@
+"""
+    Declarative rota generation.
+
+    Shift templates (see shift_list.py) are expanded into shifts in memory
+    and compared with the shifts already in the database, keyed on role,
+    venue, start and end. Only the differences are written, using bulk
+    statements, so regenerating a rota is quick and shifts which haven't
+    moved keep their ID and their sign-ups.
+
+    Bulk statements bypass the ORM, so these changes aren't recorded in the
+    shift version history.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Union
+
+from flask import current_app as app
+from pendulum import parse
+
+from main import db
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift
+from models.volunteer.venue import VolunteerVenue
+
+from ..common.generation import mark_changed
+from .stats import refresh_volunteer_stats
+
+# role_id, venue_id, start, end
+ShiftKey = tuple[int, int, datetime, datetime]
+
+
+def _naive(value: Union[str, datetime]) -> datetime:
+    """Template times may be strings or (pendulum) datetimes. Compare them
+    as plain naive datetimes, as they're stored."""
+    if isinstance(value, str):
+        value = parse(value)
+    return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+
+def expand_shift_times(
+    first: datetime, final: datetime, base_duration: int = 120, changeover: int = 15
+) -> list[tuple[datetime, datetime]]:
+    """Start and end times of back-to-back shifts from `first` until the one
+    ending at `final`. Each shift starts `changeover` minutes early, so
+    there are two shifts during changeover."""
+    times = []
+    t = first
+    while t + timedelta(minutes=base_duration) <= final:
+        times.append((t - timedelta(minutes=changeover), t + timedelta(minutes=base_duration)))
+        t += timedelta(minutes=base_duration)
+    return times
+
+
+def expand_shift_list(shift_list: dict) -> dict[ShiftKey, dict]:
+    """All the shifts described by `shift_list`, with the numbers needed.
+    Templates for unknown roles or venues are skipped."""
+    roles = {r.name: r.id for r in Role.query}
+    venues = {v.name: v.id for v in VolunteerVenue.query}
+
+    shifts = {}
+    for role_name, venue_templates in shift_list.items():
+        if role_name not in roles:
+            app.logger.error(f"Unknown role: {role_name}")
+            continue
+
+        for venue_name, templates in venue_templates.items():
+            if venue_name not in venues:
+                app.logger.error(f"Unknown venue: {venue_name}")
+                continue
+
+            for template in templates:
+                times = expand_shift_times(
+                    _naive(template["first"]),
+                    _naive(template["final"]),
+                    base_duration=template.get("base_duration", 120),
+                    changeover=template.get("changeover", 15),
+                )
+                for start, end in times:
+                    shifts[(roles[role_name], venues[venue_name], start, end)] = {
+                        "min_needed": template["min"],
+                        "max_needed": template["max"],
+                    }
+    return shifts
+
+
+@dataclass
+class RotaDiff:
+    inserts: list[dict] = field(default_factory=list)
+    updates: list[dict] = field(default_factory=list)
+    deletes: list[int] = field(default_factory=list)
+    # Shifts no longer in the templates, kept as volunteers are signed up
+    kept: list[int] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.inserts or self.updates or self.deletes)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.inserts)} to add, {len(self.updates)} to update, "
+            f"{len(self.deletes)} to delete, {len(self.kept)} kept with sign-ups"
+        )
+
+
+def diff_rota(shift_list: dict) -> RotaDiff:
+    """Compare the shifts in `shift_list` with the shifts for the same roles
+    in the database. Shifts created for proposals aren't touched."""
+    desired = expand_shift_list(shift_list)
+    role_ids = [id for id, in db.session.query(Role.id).filter(Role.name.in_(shift_list))]
+
+    existing = db.session.query(
+        Shift.id,
+        Shift.role_id,
+        Shift.venue_id,
+        Shift.start,
+        Shift.end,
+        Shift.min_needed,
+        Shift.max_needed,
+        Shift.current_count,
+    ).filter(Shift.role_id.in_(role_ids), Shift.proposal_id.is_(None))
+
+    diff = RotaDiff()
+    matched = set()
+    for id, *key, min_needed, max_needed, current_count in existing.order_by(Shift.id):
+        key = tuple(key)
+        if key in desired and key not in matched:
+            matched.add(key)
+            needed = desired[key]
+            if (min_needed, max_needed) != (needed["min_needed"], needed["max_needed"]):
+                diff.updates.append({"id": id, **needed})
+        elif current_count:
+            diff.kept.append(id)
+        else:
+            diff.deletes.append(id)
+
+    for key, needed in desired.items():
+        if key not in matched:
+            role_id, venue_id, start, end = key
+            diff.inserts.append(
+                {"role_id": role_id, "venue_id": venue_id, "start": start, "end": end, **needed}
+            )
+    return diff
+
+
+def apply_rota_diff(diff: RotaDiff):
+    """Write the changes in `diff`. The caller commits."""
+    if diff.deletes:
+        Shift.query.filter(Shift.id.in_(diff.deletes)).delete(synchronize_session=False)
+    if diff.updates:
+        db.session.bulk_update_mappings(Shift, diff.updates)
+    if diff.inserts:
+        db.session.bulk_insert_mappings(Shift, diff.inserts)
+
+    # Bulk changes don't fire the flush events the stats listen for
+    if diff:
+        mark_changed(db.session, refresh_volunteer_stats)
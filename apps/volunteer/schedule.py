@@ -1,8 +1,7 @@
 # coding=utf-8
 import pendulum
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, session
-from collections import defaultdict
+from flask import abort, render_template, request, redirect, url_for, flash, session
 from flask_login import current_user
 
 from main import db
@@ -15,7 +14,8 @@ from models.volunteer.volunteer import Volunteer
 from models import config_date
 
 from ..users import get_next_url
-from ..common import feature_flag
+from .rota import ShiftSignupException, get_rota_for_day, sign_up
+from ..common import feature_flag, json_response
 from . import volunteer, v_user_required, v_admin_required
 
 
@@ -59,17 +59,10 @@ def schedule():
         default_day = pendulum.now().strftime("%a").lower()
     active_day = request.args.get("day", default=default_day)
 
-    shifts = Shift.get_all_for_day(active_day)
-
-    by_time = defaultdict(lambda: [])
-
-    for s in shifts:
-        hour_key = s.start.strftime("%H:%M")
-
-        to_add = s.to_localtime_dict()
-        to_add["sign_up_url"] = url_for(".shift", shift_id=to_add["id"])
-        to_add["is_user_shift"] = current_user in s.volunteers
-        by_time[hour_key].append(to_add)
+    by_time = get_rota_for_day(active_day, current_user)
+    for shifts in by_time.values():
+        for to_add in shifts:
+            to_add["sign_up_url"] = url_for(".shift", shift_id=to_add["id"])
 
     roles = _get_roles_with_user_data(current_user)
     venues = VolunteerVenue.get_all()
@@ -108,32 +101,35 @@ def shift_sign_up(shift_id):
     else:
         user = current_user
 
-    shift_entry = ShiftEntry.query.filter_by(user_id=user.id, shift_id=shift.id).first()
-    if shift_entry:
-        # User is already signed up for this shift, so just redirect back saying
-        # they've been signed up.
-        return redirect_next_or_schedule(f"Signed up for {shift.role.name} shift")
-
-    if shift.current_count >= shift.max_needed:
-        return redirect_next_or_schedule("This shift is already full. You have not been signed up.")
-
-    if shift.role.requires_training and shift.role not in Volunteer.get_for_user(current_user).trained_roles:
-        return redirect_next_or_schedule("You must complete training before you can sign up for this shift.")
+    try:
+        sign_up(user, [shift.id], Volunteer.get_for_user(current_user).trained_roles)
+    except ShiftSignupException as e:
+        db.session.rollback()
+        return redirect_next_or_schedule(f"{e} You have not been signed up.")
+    db.session.commit()
 
-    for shift_entry in user.shift_entries:
-        if shift.is_clash(shift_entry.shift):
-            clashing_shift = shift_entry.shift
-            clash_role = clashing_shift.role.name
-            clash_time = clashing_shift.start.strftime("%H:%M")
+    return redirect_next_or_schedule(f"Signed up for {shift.role.name} shift")
 
-            return redirect_next_or_schedule(
-                f"This shift clashes with your {clash_role} shift at {clash_time}, you have not been signed up."
-            )
 
-    shift.entries.append(ShiftEntry(user=user, shift=shift))
+@volunteer.route("/shifts/sign-up.json", methods=["POST"])
+@feature_flag("VOLUNTEERS_SCHEDULE")
+@json_response
+@v_user_required
+def shifts_sign_up():
+    """Sign up to several shifts at once. Either all of them succeed or none do."""
+    data = request.get_json(silent=True) or {}
+    shift_ids = data.get("shift_ids")
+    if not isinstance(shift_ids, list) or not all(isinstance(i, int) for i in shift_ids):
+        abort(400, "shift_ids should be a list of shift IDs")
+
+    try:
+        new_shifts = sign_up(current_user, shift_ids, Volunteer.get_for_user(current_user).trained_roles)
+    except ShiftSignupException as e:
+        db.session.rollback()
+        abort(409, str(e))
     db.session.commit()
 
-    return redirect_next_or_schedule(f"Signed up {shift.role.name} shift")
+    return {"signed_up": [s.id for s in new_shifts]}
 
 
 @volunteer.route("/shift/<shift_id>/cancel", methods=["POST"])
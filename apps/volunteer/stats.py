@@ -1,15 +1,182 @@
-from flask import jsonify
+"""
+    Volunteer staffing statistics.
+
+    Coverage is worked out in the database: each shift is expanded into the
+    15-minute buckets it covers, and the buckets are summed per role and
+    venue in one query. Results are cached until a shift or shift entry
+    changes, so the dashboard and metrics can poll them cheaply.
+"""
 from collections import defaultdict
+from datetime import timedelta
+from itertools import chain
 
-from models.volunteer.shift import Shift
+from flask import jsonify
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from main import cache, db
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, ShiftEntry
+from models.volunteer.venue import VolunteerVenue
 from models.volunteer.volunteer import Volunteer
 
-from . import volunteer
+from ..common import json_response
+from ..common.generation import bump_generation, get_generation, track_changes
+from . import volunteer, v_manager_required
+
+VOLUNTEER_STATS_GENERATION_KEY = "volunteer_stats_generation"
+VOLUNTEER_STATS_TIMEOUT = 60 * 60
+
+COVERAGE_BUCKET = timedelta(minutes=15)
+
+# Entries which count towards a shift being staffed
+SIGNED_UP_STATES = ["signed_up", "arrived", "completed"]
+ARRIVED_STATES = ["arrived", "completed"]
+
+
+def get_stats_cache_key(name: str) -> str:
+    return f"volunteer_stats/{get_generation(VOLUNTEER_STATS_GENERATION_KEY)}/{name}"
+
+
+def entry_counts_subquery():
+    """Signed-up and arrived volunteers for each shift with any entries."""
+    return (
+        select(
+            ShiftEntry.shift_id,
+            func.count().filter(ShiftEntry.state.in_(SIGNED_UP_STATES)).label("signed_up"),
+            func.count().filter(ShiftEntry.state.in_(ARRIVED_STATES)).label("arrived"),
+        )
+        .group_by(ShiftEntry.shift_id)
+        .subquery()
+    )
+
+
+def get_coverage() -> list[dict]:
+    """Volunteers needed, signed up and arrived for each role and venue, in
+    15-minute buckets. A shift counts towards every bucket it overlaps."""
+    key = get_stats_cache_key("coverage")
+    coverage = cache.get(key)
+    if coverage is not None:
+        return coverage
+
+    entry_counts = entry_counts_subquery()
+    first_bucket = func.date_trunc("hour", Shift.start) + func.floor(
+        func.date_part("minute", Shift.start) / 15
+    ) * COVERAGE_BUCKET
+    shift_buckets = (
+        select(
+            Shift.role_id,
+            Shift.venue_id,
+            func.generate_series(first_bucket, Shift.end - timedelta(microseconds=1), COVERAGE_BUCKET).label(
+                "bucket"
+            ),
+            Shift.min_needed,
+            Shift.max_needed,
+            func.coalesce(entry_counts.c.signed_up, 0).label("signed_up"),
+            func.coalesce(entry_counts.c.arrived, 0).label("arrived"),
+        )
+        .outerjoin(entry_counts, entry_counts.c.shift_id == Shift.id)
+        .filter(Shift.end > Shift.start)
+        .subquery()
+    )
+
+    query = (
+        select(
+            Role.name,
+            VolunteerVenue.name,
+            shift_buckets.c.bucket,
+            func.sum(shift_buckets.c.min_needed),
+            func.sum(shift_buckets.c.max_needed),
+            func.sum(shift_buckets.c.signed_up),
+            func.sum(shift_buckets.c.arrived),
+        )
+        .join(Role, Role.id == shift_buckets.c.role_id)
+        .join(VolunteerVenue, VolunteerVenue.id == shift_buckets.c.venue_id)
+        .group_by(Role.name, VolunteerVenue.name, shift_buckets.c.bucket)
+        .order_by(Role.name, VolunteerVenue.name, shift_buckets.c.bucket)
+    )
+
+    coverage = [
+        {
+            "role": role,
+            "venue": venue,
+            "start": bucket.isoformat(),
+            "min_needed": int(min_needed),
+            "max_needed": int(max_needed),
+            "signed_up": int(signed_up),
+            "arrived": int(arrived),
+            "shortfall": max(int(min_needed) - int(signed_up), 0),
+        }
+        for role, venue, bucket, min_needed, max_needed, signed_up, arrived in db.session.execute(query)
+    ]
+    cache.set(key, coverage, timeout=VOLUNTEER_STATS_TIMEOUT)
+    return coverage
+
+
+def get_role_totals() -> dict[str, dict]:
+    """Shift entries and volunteer-seconds for each role, by entry state,
+    plus the numbers required, for the metrics endpoint."""
+    key = get_stats_cache_key("role_totals")
+    totals = cache.get(key)
+    if totals is not None:
+        return totals
+
+    totals = defaultdict(lambda: {"shifts": {}, "seconds": {}})
+
+    entries = (
+        db.session.query(Role.name, ShiftEntry.state, func.count(), func.sum(Shift.duration))
+        .select_from(ShiftEntry)
+        .join(ShiftEntry.shift)
+        .join(Shift.role)
+        .group_by(Role.name, ShiftEntry.state)
+    )
+    for role, state, count, duration in entries:
+        totals[role]["shifts"][state] = count
+        totals[role]["seconds"][state] = duration.total_seconds()
+
+    required = (
+        db.session.query(
+            Role.name,
+            func.sum(Shift.min_needed),
+            func.sum(Shift.max_needed),
+            func.sum(Shift.duration * Shift.min_needed),
+            func.sum(Shift.duration * Shift.max_needed),
+        )
+        .select_from(Shift)
+        .join(Shift.role)
+        .group_by(Role.name)
+    )
+    for role, min, max, min_duration, max_duration in required:
+        totals[role]["shifts"].update({"min_required": min, "max_required": max})
+        totals[role]["seconds"].update(
+            {
+                "min_required": min_duration.total_seconds(),
+                "max_required": max_duration.total_seconds(),
+            }
+        )
+
+    totals = dict(sorted(totals.items()))
+    cache.set(key, totals, timeout=VOLUNTEER_STATS_TIMEOUT)
+    return totals
+
+
+def refresh_volunteer_stats():
+    bump_generation(VOLUNTEER_STATS_GENERATION_KEY)
+
+
+def _shifts_changed(session) -> bool:
+    return any(
+        isinstance(obj, (Shift, ShiftEntry, Role, VolunteerVenue))
+        for obj in chain(session.new, session.dirty, session.deleted)
+    )
+
+
+track_changes(_shifts_changed, refresh_volunteer_stats)
 
 
 @volunteer.route("/shifts.json")
 def shifts():
-    shifts = Shift.get_all()
+    shifts = Shift.query.options(joinedload(Shift.role), joinedload(Shift.venue)).order_by(Shift.start)
     return jsonify(
         [
             {
@@ -26,9 +193,23 @@ def shifts():
     )
 
 
+@volunteer.route("/coverage.json")
+@json_response
+@v_manager_required
+def coverage():
+    return {"bucket_minutes": COVERAGE_BUCKET.seconds // 60, "coverage": get_coverage()}
+
+
 @volunteer.route("/volunteer_histogram.json")
 def vol_histogram():
-    hist = defaultdict(lambda: 0)
-    for v in Volunteer.get_all():
-        hist[len(v.user.shift_entries)] += 1
-    return jsonify(hist)
+    entry_counts = (
+        select(func.count(ShiftEntry.shift_id).label("entries"))
+        .select_from(Volunteer)
+        .outerjoin(ShiftEntry, ShiftEntry.user_id == Volunteer.user_id)
+        .group_by(Volunteer.id)
+        .subquery()
+    )
+    hist = db.session.execute(
+        select(entry_counts.c.entries, func.count()).group_by(entry_counts.c.entries)
+    )
+    return jsonify(dict(hist.all()))
@@ -16,8 +16,10 @@ echo "Creating databases (errors about database existing are normal)..."
 
 $PSQL -c 'CREATE DATABASE emf_site' || true
 $PSQL emf_site -c 'CREATE EXTENSION postgis' || true
+$PSQL emf_site -c 'CREATE EXTENSION pg_trgm' || true
 $PSQL -c 'CREATE DATABASE emf_site_test' || true
 $PSQL emf_site_test -c 'CREATE EXTENSION postgis' || true
+$PSQL emf_site_test -c 'CREATE EXTENSION pg_trgm' || true
 
 # Create dev config from example file if it doesn't exist
 if [ ! -e /app/config/development.cfg ];
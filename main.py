@@ -138,6 +138,11 @@ def create_app(dev_server=False, config_override=None):
     for extension in (cache, db, mail, static_digest, toolbar):
         extension.init_app(app)
 
+    if app.config.get("SERVER_SIDE_SESSIONS"):
+        from apps.common.server_session import CacheSessionInterface
+
+        app.session_interface = CacheSessionInterface()
+
     cors_origins = ["https://map.emfcamp.org", "https://wiki.emfcamp.org"]
     if app.config.get("DEBUG"):
         cors_origins = ["http://localhost:8080", "https://maputnik.github.io"]
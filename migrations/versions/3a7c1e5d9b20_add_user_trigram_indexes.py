@@ -0,0 +1,27 @@
+"""Add user trigram indexes for arrivals search
+
+Revision ID: 3a7c1e5d9b20
+Revises: 09f776ea71f0
+Create Date: 2026-10-19 18:30:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a7c1e5d9b20'
+down_revision = '09f776ea71f0'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_name_lower_trgm', [sa.text("lower(name) gin_trgm_ops")], unique=False, postgresql_using='gin')
+        batch_op.create_index('ix_user_email_lower_trgm', [sa.text("lower(email) gin_trgm_ops")], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_email_lower_trgm')
+        batch_op.drop_index('ix_user_name_lower_trgm')
@@ -0,0 +1,43 @@
+"""Add webhook_event table
+
+Revision ID: 5e2b8c4f1a67
+Revises: 3a7c1e5d9b20
+Create Date: 2026-10-19 19:10:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5e2b8c4f1a67'
+down_revision = '3a7c1e5d9b20'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('webhook_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(), nullable=False),
+    sa.Column('event_id', sa.String(), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('ordering_key', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('received', sa.DateTime(), nullable=False),
+    sa.Column('processed', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_webhook_event')),
+    sa.UniqueConstraint('provider', 'event_id', name=op.f('uq_webhook_event_provider'))
+    )
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_webhook_event_ordering_key'), ['ordering_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_webhook_event_processed'), ['processed'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_webhook_event_processed'))
+        batch_op.drop_index(batch_op.f('ix_webhook_event_ordering_key'))
+
+    op.drop_table('webhook_event')
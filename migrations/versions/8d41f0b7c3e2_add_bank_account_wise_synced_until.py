@@ -0,0 +1,24 @@
+"""Add bank_account.wise_synced_until
+
+Revision ID: 8d41f0b7c3e2
+Revises: 5e2b8c4f1a67
+Create Date: 2026-10-19 19:40:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0b7c3e2'
+down_revision = '5e2b8c4f1a67'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    with op.batch_alter_table('bank_account', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('wise_synced_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('bank_account', schema=None) as batch_op:
+        batch_op.drop_column('wise_synced_until')
@@ -0,0 +1,25 @@
+"""Add proposal title trigram index for admin search
+
+Revision ID: b4e9a2c6d813
+Revises: 8d41f0b7c3e2
+Create Date: 2026-10-19 21:10:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b4e9a2c6d813'
+down_revision = '8d41f0b7c3e2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.batch_alter_table('proposal', schema=None) as batch_op:
+        batch_op.create_index('ix_proposal_title_lower_trgm', [sa.text("lower(title) gin_trgm_ops")], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('proposal', schema=None) as batch_op:
+        batch_op.drop_index('ix_proposal_title_lower_trgm')
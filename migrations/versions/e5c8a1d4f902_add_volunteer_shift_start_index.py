@@ -0,0 +1,23 @@
+"""Add volunteer shift start index
+
+Revision ID: e5c8a1d4f902
+Revises: b4e9a2c6d813
+Create Date: 2026-10-19 23:05:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5c8a1d4f902'
+down_revision = 'b4e9a2c6d813'
+
+from alembic import op
+
+
+def upgrade():
+    with op.batch_alter_table('volunteer_shift', schema=None) as batch_op:
+        batch_op.create_index('ix_volunteer_shift_start', ['start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('volunteer_shift', schema=None) as batch_op:
+        batch_op.drop_index('ix_volunteer_shift_start')
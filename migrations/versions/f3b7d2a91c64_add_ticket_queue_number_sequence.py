@@ -0,0 +1,22 @@
+"""Add ticket queue number sequence
+
+Revision ID: f3b7d2a91c64
+Revises: e5c8a1d4f902
+Create Date: 2026-10-20 10:15:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d2a91c64'
+down_revision = 'e5c8a1d4f902'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.execute(sa.schema.CreateSequence(sa.Sequence('ticket_queue_number')))
+
+
+def downgrade():
+    op.execute(sa.schema.DropSequence(sa.Sequence('ticket_queue_number')))
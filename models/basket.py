@@ -1,18 +1,78 @@
-from collections.abc import MutableMapping
+from collections import defaultdict
+from collections.abc import Iterable, MutableMapping
+from datetime import datetime, timedelta
 from decimal import Decimal
 from itertools import groupby
 from typing import Optional
 
 from flask import current_app as app, session
+from sqlalchemy import func, inspect, select, union_all
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from main import db
 from . import Currency
 from .exc import CapacityException
-from .product import PriceTier, Voucher, PRODUCT_GROUP_TYPES_DICT
+from .product import Price, PriceTier, Voucher, PRODUCT_GROUP_TYPES_DICT
 from .purchase import Purchase
 
 
+BASKET_SESSION_KEY = "basket"
+
+# Reserved purchases are cancelled an hour after they were last modified (see
+# expire_reserved in apps/tickets/tasks.py). Until then we trust the counts in
+# the session record without reloading the purchases.
+BASKET_RECORD_LIFETIME = timedelta(hours=1)
+
+
+def preload_prices(tiers: Iterable[PriceTier]):
+    """Load the prices for several tiers in one query, so get_price doesn't
+    need to query for each tier."""
+    tiers = [t for t in tiers if "prices" in inspect(t).unloaded]
+    if not tiers:
+        return
+
+    prices = defaultdict(list)
+    for price in Price.query.filter(
+        Price.price_tier_id.in_([t.id for t in tiers])
+    ).order_by(Price.id):
+        prices[price.price_tier_id].append(price)
+
+    for tier in tiers:
+        set_committed_value(tier, "prices", prices[tier.id])
+
+
+def get_min_remaining_capacity(tiers: Iterable[PriceTier]) -> float:
+    """Return the lowest remaining capacity of the given tiers and all their ancestors,
+    read from the DB in a single query. Returns inf if none of them have a maximum.
+    """
+    ids: dict[type, set[int]] = defaultdict(set)
+    for tier in tiers:
+        obj = tier
+        while obj is not None:
+            ids[type(obj)].add(obj.id)
+            obj = obj.parent
+
+    if not ids:
+        return float("inf")
+
+    remaining = union_all(
+        *[
+            select((cls.capacity_max - cls.capacity_used).label("remaining")).where(
+                cls.id.in_(cls_ids), cls.capacity_max != None  # noqa: E711
+            )
+            for cls, cls_ids in ids.items()
+        ]
+    ).subquery()
+    min_remaining = db.session.execute(
+        select(func.min(remaining.c.remaining))
+    ).scalar()
+
+    if min_remaining is None:
+        return float("inf")
+    return min_remaining
+
+
 class Line:
     def __init__(
         self, tier: PriceTier, count: int, purchases: Optional[list[Purchase]] = None
@@ -46,27 +106,84 @@ class Basket(MutableMapping):
         # but this shouldn't be relied on until they're attached to a Payment.
         # Totals should be calculated based on the basket's currency.
         self.currency = currency
-        self._lines: list[Line] = []
+        self._loaded_lines: list[Line] = []
         self.voucher = voucher
 
+        # The compact record from the session, as [tier_id, chosen ids, surplus ids]
+        # lines. The purchases are only loaded once something needs them.
+        self._session_lines: Optional[list] = None
+        self._session_counts_valid = False
+
+    @property
+    def _lines(self) -> list[Line]:
+        self.ensure_loaded()
+        return self._loaded_lines
+
+    @_lines.setter
+    def _lines(self, lines: list[Line]):
+        self._session_lines = None
+        self._loaded_lines = lines
+
+    def ensure_loaded(self):
+        """Load the purchases referred to by the session record, if we haven't yet.
+        Call this before making decisions which depend on what's actually reserved."""
+        if self._session_lines is None:
+            return
+
+        session_lines, self._session_lines = self._session_lines, None
+        chosen_ids = [id for _, chosen, _ in session_lines for id in chosen]
+        surplus_ids = [id for _, _, surplus in session_lines for id in surplus]
+        self.load_purchases_from_ids(chosen_ids, surplus_ids)
+
     @classmethod
     def from_session(self, user, currency: Currency):
-        purchases = session.get("basket_purchase_ids", [])
-        surplus_purchases = session.get("basket_surplus_purchase_ids", [])
         voucher = session.get("ticket_voucher", None)
-
         basket = Basket(user, currency, voucher)
-        basket.load_purchases_from_ids(purchases, surplus_purchases)
+
+        record = session.get(BASKET_SESSION_KEY)
+        if record:
+            basket._session_lines = record["lines"]
+            basket._session_counts_valid = (
+                datetime.utcnow().timestamp() < record["expires"]
+            )
+
+        elif "basket_purchase_ids" in session:
+            # Saved before the compact record was introduced
+            basket.load_purchases_from_ids(
+                session["basket_purchase_ids"],
+                session.get("basket_surplus_purchase_ids", []),
+            )
+
         return basket
 
     @classmethod
     def clear_from_session(self):
+        session.pop(BASKET_SESSION_KEY, None)
         session.pop("basket_purchase_ids", None)
         session.pop("basket_surplus_purchase_ids", None)
 
     def save_to_session(self):
-        session["basket_purchase_ids"] = [p.id for p in self.purchases]
-        session["basket_surplus_purchase_ids"] = [p.id for p in self.surplus_purchases]
+        self.clear_from_session()
+
+        lines = []
+        for line in self._lines:
+            ids = [p.id for p in line.purchases]
+            if ids:
+                lines.append([line.tier.id, ids[: line.count], ids[line.count :]])
+
+        if not lines:
+            return
+
+        oldest = min(
+            p.modified or datetime.utcnow()
+            for line in self._lines
+            for p in line.purchases
+        )
+        session[BASKET_SESSION_KEY] = {
+            "count": len(self.purchases),
+            "lines": lines,
+            "expires": (oldest + BASKET_RECORD_LIFETIME).timestamp(),
+        }
 
     def _get_line(self, tier: PriceTier):
         for line in self._lines:
@@ -76,6 +193,12 @@ class Basket(MutableMapping):
         raise KeyError("Tier {} not found in basket".format(tier))
 
     def __getitem__(self, key: PriceTier) -> int:
+        if self._session_lines is not None and self._session_counts_valid:
+            for tier_id, chosen, _ in self._session_lines:
+                if tier_id == key.id:
+                    return len(chosen)
+            raise KeyError("Tier {} not found in basket".format(key))
+
         return self._get_line(key).count
 
     def __setitem__(self, key: PriceTier, value: int):
@@ -189,6 +312,8 @@ class Basket(MutableMapping):
         if user.is_anonymous:
             user = None
 
+        preload_prices([line.tier for line in self._lines])
+
         purchases_to_flush = []
         with db.session.no_autoflush:
             for line in self._lines:
@@ -223,7 +348,9 @@ class Basket(MutableMapping):
                 # The user will complete their purchase soon.
 
         # Insert the purchases right away, as column_property and
-        # polymorphic columns are reloaded from the DB after insert
+        # polymorphic columns are reloaded from the DB after insert.
+        # Purchases of the same class are sent as a single multi-row
+        # INSERT ... RETURNING by psycopg2's executemany batching.
         db.session.flush(purchases_to_flush)
 
     def ensure_purchase_capacity(self):
@@ -233,11 +360,10 @@ class Basket(MutableMapping):
         This could be moved to an after_flush handler for CapacityMixin.
         """
         db.session.flush()
-        for line in self._lines:
-            if line.tier.get_total_remaining_capacity() < 0:
-                # explicit rollback - we don't want this exception ignored
-                db.session.rollback()
-                raise CapacityException("Insufficient capacity.")
+        if get_min_remaining_capacity([line.tier for line in self._lines]) < 0:
+            # explicit rollback - we don't want this exception ignored
+            db.session.rollback()
+            raise CapacityException("Insufficient capacity.")
 
     def cancel_purchases(self):
         with db.session.no_autoflush:
@@ -5,7 +5,6 @@ from dateutil.parser import parse as parse_date
 import re
 from itertools import groupby
 from geoalchemy2 import Geometry
-from geoalchemy2.shape import to_shape
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.mutable import MutableList
 
@@ -789,9 +788,8 @@ class Proposal(BaseModel):
 
     @property
     def latlon(self):
-        if self.scheduled_venue and self.scheduled_venue.location:
-            loc = to_shape(self.scheduled_venue.location)
-            return (loc.y, loc.x)
+        if self.scheduled_venue:
+            return self.scheduled_venue.latlon
         return None
 
     @property
@@ -1110,6 +1108,9 @@ class Venue(BaseModel):
     priority = db.Column(db.Integer, nullable=True, default=0)
     capacity = db.Column(db.Integer, nullable=True)
     location = db.Column(Geometry("POINT", srid=4326))
+    # Loaded with the venue so reading coordinates doesn't parse the geometry
+    latitude = column_property(func.ST_Y(location))
+    longitude = column_property(func.ST_X(location))
     scheduled_content_only = db.Column(db.Boolean)
     village = db.relationship(
         "Village",
@@ -1122,22 +1123,26 @@ class Venue(BaseModel):
     def __repr__(self):
         return "<Venue id={}, name={}>".format(self.id, self.name)
 
+    @property
+    def latlon(self) -> Optional[tuple[float, float]]:
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
+
     @property
     def __geo_interface__(self):
         """GeoJSON-like representation of the object for the map."""
-        if not self.location:
+        if not self.latlon:
             return None
 
-        location = to_shape(self.location)
-
         return {
             "type": "Feature",
             "properties": {
                 "id": self.id,
                 "name": self.name,
-                "type": self.type,
+                "default_for_types": self.default_for_types,
             },
-            "geometry": location.__geo_interface__,
+            "geometry": {"type": "Point", "coordinates": (self.longitude, self.latitude)},
         }
 
     @property
@@ -1172,6 +1177,12 @@ class Venue(BaseModel):
 db.Index(
     "ix_cfp_vote_user_id_proposal_id", CFPVote.user_id, CFPVote.proposal_id, unique=True
 )
+# Trigram index for substring search in admin (requires pg_trgm)
+db.Index(
+    "ix_proposal_title_lower_trgm",
+    text("lower(title) gin_trgm_ops"),
+    postgresql_using="gin",
+)
 
 __all__ = [
     "HUMAN_CFP_TYPES",
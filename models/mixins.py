@@ -1,3 +1,5 @@
+from typing import Optional
+
 from main import db
 from sqlalchemy import event
 from sqlalchemy.orm import column_property
@@ -139,12 +141,22 @@ class InheritedAttributesMixin(object):
     """Create a JSON column to store arbitrary attributes. When fetching attributes, cascade up to the parent (which
     must also inherit this mixin).
 
-    Objects which inherit this mixin must have a "parent" relationship.
+    Objects which inherit this mixin must have a "parent" relationship. They can also
+    override resolved_attributes to supply pre-merged attributes, which saves walking
+    (and loading) every parent on each lookup.
     """
 
     attributes = db.Column(db.JSON, default={})
 
+    def resolved_attributes(self) -> Optional[dict]:
+        "This object's attributes merged with those it inherits, if known."
+        return None
+
     def get_attribute(self, name, default=None):
+        resolved = self.resolved_attributes()
+        if resolved is not None:
+            return resolved.get(name, default)
+
         if name in self.attributes:
             return self.attributes[name]
         if self.parent:
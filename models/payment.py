@@ -352,6 +352,8 @@ class BankAccount(BaseModel):
     swift = db.Column(db.String)
     iban = db.Column(db.String)
     borderless_account_id = db.Column(db.Integer)
+    # Time up to which we've fetched Wise statements for this account
+    wise_synced_until = db.Column(db.DateTime)
 
     def __init__(
         self,
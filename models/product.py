@@ -3,17 +3,20 @@ from dataclasses import dataclass
 from decimal import Decimal
 from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import chain
 import logging
 import re
 import random
 import string
+import time
 from typing import Optional, TYPE_CHECKING
 
-from sqlalchemy import func, UniqueConstraint, inspect
-from sqlalchemy.orm import validates, column_property
+from sqlalchemy import event, func, literal, select, union_all, UniqueConstraint, inspect
+from sqlalchemy.orm import validates, column_property, joinedload, Session
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from main import db
+from main import cache, db
 from .mixins import CapacityMixin, InheritedAttributesMixin
 from . import BaseModel
 from .purchase import Purchase, AdmissionTicket, Ticket
@@ -127,6 +130,9 @@ class ProductGroup(BaseModel, CapacityMixin, InheritedAttributesMixin):
     def get_by_name(cls, group_name) -> Optional[ProductGroup]:
         return ProductGroup.query.filter_by(name=group_name).one_or_none()
 
+    def resolved_attributes(self) -> Optional[dict]:
+        return get_resolved_attributes(self)
+
     @validates("capacity_max")
     def validate_capacity_max(self, _, capacity_max):
         """Validate the following rules for ProductGroup capacity on allocation-level
@@ -290,6 +296,9 @@ class Product(BaseModel, CapacityMixin, InheritedAttributesMixin):
         )
         return product.one_or_none()
 
+    def resolved_attributes(self) -> Optional[dict]:
+        return get_resolved_attributes(self)
+
     @property
     def purchase_count_by_state(self):
         states = (
@@ -733,3 +742,202 @@ class ProductViewProduct(BaseModel):
         return "<ProductViewProduct: view {}, product {}, order {}>".format(
             self.view_id, self.product_id, self.order
         )
+
+
+CATALOGUE_GENERATION_KEY = "product_catalogue_generation"
+CATALOGUE_TIMEOUT = 600
+
+
+def _generation():
+    # apps.common imports the models, so it can't be imported at the top of this module
+    from apps.common import generation
+
+    return generation
+
+
+def build_view_catalogue(name) -> Optional[dict]:
+    """List which tier of each product in a ProductView is on sale, in
+    display order, with its prices. This only changes when an admin edits
+    products or tiers, so it can be cached until the catalogue is refreshed.
+
+    The ticket pages still load the tiers themselves to check capacity.
+    """
+    view = ProductView.get_by_name(name)
+    if view is None:
+        return None
+
+    products = (
+        Product.query.join(ProductViewProduct)
+        .filter(ProductViewProduct.view_id == view.id)
+        .order_by(ProductViewProduct.order)
+        .options(joinedload(Product.price_tiers).joinedload(PriceTier.prices))
+    ).all()
+
+    tiers = []
+    for product in products:
+        active = [tier for tier in product.price_tiers if tier.active]
+        if len(active) > 1:
+            log.error(
+                "Multiple active PriceTiers found for %s. Excluding product.", product
+            )
+            continue
+        if not active:
+            continue
+
+        tier = active[0]
+        tiers.append(
+            {
+                "id": tier.id,
+                "product_id": product.id,
+                "prices": {price.currency: price.price_int for price in tier.prices},
+            }
+        )
+
+    return {
+        "id": view.id,
+        "name": view.name,
+        "tiers": tiers,
+    }
+
+
+def get_view_catalogue(name) -> Optional[dict]:
+    generation = _generation().get_generation(CATALOGUE_GENERATION_KEY)
+    key = f"product_catalogue/{generation}/{name}"
+
+    catalogue = cache.get(key)
+    if catalogue is None:
+        catalogue = build_view_catalogue(name)
+        if catalogue is not None:
+            cache.set(key, catalogue, timeout=CATALOGUE_TIMEOUT)
+    return catalogue
+
+
+def refresh_catalogue():
+    """Invalidate every cached ProductView catalogue. Call this after changing
+    products, tiers, prices or views."""
+    _generation().bump_generation(CATALOGUE_GENERATION_KEY)
+
+
+ATTRIBUTES_GENERATION_KEY = "product_attributes_generation"
+# How often (in seconds) to check whether another process has changed attributes
+ATTRIBUTES_CHECK_INTERVAL = 5
+
+# (generation, {(table name, id): merged attributes})
+_resolved_attributes: Optional[tuple[int, dict[tuple[str, int], dict]]] = None
+_resolved_attributes_checked = 0.0
+
+
+def build_resolved_attributes() -> dict[tuple[str, int], dict]:
+    """Load the attributes of every ProductGroup and Product in one query, and
+    merge each one's inherited attributes into it."""
+    groups = select(
+        literal(ProductGroup.__table__.name),
+        ProductGroup.id,
+        ProductGroup.parent_id,
+        ProductGroup.attributes,
+    )
+    products = select(
+        literal(Product.__table__.name), Product.id, Product.group_id, Product.attributes
+    )
+
+    # Use a separate connection so we only ever see committed attributes
+    with db.engine.connect() as conn:
+        rows = conn.execute(union_all(groups, products)).all()
+
+    own = {}
+    parents = {}
+    for table, id, parent_id, attributes in rows:
+        own[(table, id)] = attributes or {}
+        if parent_id is not None:
+            parents[(table, id)] = (ProductGroup.__table__.name, parent_id)
+
+    resolved: dict[tuple[str, int], dict] = {}
+
+    def resolve(key):
+        if key not in resolved:
+            parent = parents.get(key)
+            merged = dict(resolve(parent)) if parent in own else {}
+            merged.update(own[key])
+            resolved[key] = merged
+        return resolved[key]
+
+    for key in own:
+        resolve(key)
+    return resolved
+
+
+def has_uncommitted_changes(session, obj) -> bool:
+    """Whether obj or any of its parents has been added or changed in this
+    session. Parents which haven't been loaded are looked up in the session
+    rather than loaded, as they can't have been changed."""
+    changed = set(session.new) | set(session.dirty)
+    while obj is not None:
+        if obj in changed:
+            return True
+        state = inspect(obj)
+        parent = state.dict.get("parent")
+        if parent is None:
+            parent_id = state.dict.get("group_id" if isinstance(obj, Product) else "parent_id")
+            if parent_id is None:
+                return False
+            parent = session.identity_map.get(identity_key(ProductGroup, parent_id))
+        obj = parent
+    return False
+
+
+def get_resolved_attributes(obj) -> Optional[dict]:
+    """Merged attributes for a ProductGroup or Product, or None if it or its
+    parents have changes which haven't been committed yet."""
+    global _resolved_attributes, _resolved_attributes_checked
+
+    state = inspect(obj)
+    if not state.persistent:
+        return None
+    # Flushed changes are no longer pending on the objects themselves
+    if _generation().has_pending_changes(
+        state.session, refresh_attributes
+    ) or has_uncommitted_changes(state.session, obj):
+        return None
+
+    now = time.monotonic()
+    if (
+        _resolved_attributes is None
+        or now - _resolved_attributes_checked > ATTRIBUTES_CHECK_INTERVAL
+    ):
+        generation = _generation().get_generation(ATTRIBUTES_GENERATION_KEY)
+        if _resolved_attributes is None or _resolved_attributes[0] != generation:
+            _resolved_attributes = (generation, build_resolved_attributes())
+        _resolved_attributes_checked = now
+
+    return _resolved_attributes[1].get((obj.__table__.name, obj.id))
+
+
+def refresh_attributes():
+    global _resolved_attributes
+
+    _generation().bump_generation(ATTRIBUTES_GENERATION_KEY)
+    _resolved_attributes = None
+
+
+@event.listens_for(Session, "after_flush")
+def _track_attribute_changes(session, flush_context):
+    changed = [
+        obj
+        for obj in chain(session.new, session.deleted)
+        if isinstance(obj, (ProductGroup, Product))
+    ]
+    for obj in session.dirty:
+        if not isinstance(obj, (ProductGroup, Product)):
+            continue
+        # Capacity counters change with every purchase, so only look for
+        # changes to the attributes themselves or to where they're inherited from.
+        state = inspect(obj)
+        if (
+            state.attrs.attributes.history.has_changes()
+            or state.attrs.parent.history.has_changes()
+        ):
+            changed.append(obj)
+
+    if changed:
+        _generation().mark_changed(session, refresh_attributes)
+
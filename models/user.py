@@ -11,7 +11,7 @@ import re
 from collections import defaultdict
 from typing import Optional
 
-from sqlalchemy import func, Index, text, Table
+from sqlalchemy import event, func, Index, text, Table
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm.exc import NoResultFound
 from flask import current_app as app, session
@@ -292,6 +292,9 @@ class User(BaseModel, UserMixin):
     )
     village = association_proxy("village_membership", "village")
 
+    # Cache for permission_names - not a column
+    _permission_names: Optional[frozenset[str]] = None
+
     def __init__(self, email: str, name: str):
         self.email = email
         self.name = name
@@ -351,20 +354,25 @@ class User(BaseModel, UserMixin):
     def bar_training_token(self):
         return generate_bar_training_token(app.config["SECRET_KEY"], self.id)
 
+    @property
+    def permission_names(self) -> frozenset[str]:
+        """The names of this user's permissions, resolved once per loaded instance.
+
+        This is cleared when the instance is expired or refreshed (e.g. on commit),
+        and by grant_permission/revoke_permission.
+        """
+        if self._permission_names is None:
+            self._permission_names = frozenset(p.name for p in self.permissions)
+        return self._permission_names
+
     def has_permission(self, name, cascade=True) -> bool:
+        names = self.permission_names
         if cascade:
-            if name != "admin" and self.has_permission("admin"):
+            if "admin" in names:
                 return True
-            if (
-                name.startswith("cfp_")
-                and name != "cfp_admin"
-                and self.has_permission("cfp_admin")
-            ):
-                return True
-        for permission in self.permissions:
-            if permission.name == name:
+            if name.startswith("cfp_") and "cfp_admin" in names:
                 return True
-        return False
+        return name in names
 
     def grant_permission(self, name: str):
         try:
@@ -373,11 +381,13 @@ class User(BaseModel, UserMixin):
             perm = Permission(name)
             db.session.add(perm)
         self.permissions.append(perm)
+        self._permission_names = None
 
     def revoke_permission(self, name: str):
         for user_perm in self.permissions:
             if user_perm.name == name:
                 self.permissions.remove(user_perm)
+        self._permission_names = None
 
     def has_ticket_for_event(self, proposal_id: int) -> bool:
         return any(
@@ -460,6 +470,27 @@ Index(
 Index(
     "ix_user_name_tsearch", text("to_tsvector('simple', name)"), postgresql_using="gin"
 )
+# Trigram indexes for substring search at arrivals (requires pg_trgm)
+Index(
+    "ix_user_name_lower_trgm",
+    text("lower(name) gin_trgm_ops"),
+    postgresql_using="gin",
+)
+Index(
+    "ix_user_email_lower_trgm",
+    text("lower(email) gin_trgm_ops"),
+    postgresql_using="gin",
+)
+
+
+@event.listens_for(User, "expire")
+def user_expire(target, attrs):
+    target._permission_names = None
+
+
+@event.listens_for(User, "refresh")
+def user_refresh(target, context, attrs):
+    target._permission_names = None
 
 
 class UserDiversity(BaseModel):
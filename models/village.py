@@ -3,8 +3,8 @@ from typing import Optional
 from sqlalchemy.ext.associationproxy import association_proxy
 
 from geoalchemy2 import Geometry
-from geoalchemy2.shape import to_shape
-from sqlalchemy import Index
+from sqlalchemy import Index, func
+from sqlalchemy.orm import column_property
 from main import db
 from models.user import User
 from . import BaseModel
@@ -12,7 +12,7 @@ from . import BaseModel
 
 class Village(BaseModel):
     __tablename__ = "village"
-    __versioned__: dict = {}
+    __versioned__ = {"exclude": ["latitude", "longitude"]}
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -20,6 +20,9 @@ class Village(BaseModel):
     description = db.Column(db.String)
     url = db.Column(db.String)
     location = db.Column(Geometry("POINT", srid=4326, spatial_index=False))
+    # Loaded with the village so reading coordinates doesn't parse the geometry
+    latitude = column_property(func.ST_Y(location))
+    longitude = column_property(func.ST_X(location))
 
     village_memberships = db.relationship("VillageMember", back_populates="village")
     members = association_proxy("village_memberships", "user")
@@ -38,14 +41,18 @@ class Village(BaseModel):
     def __repr__(self):
         return f"<Village '{self.name}' (id: {self.id})>"
 
+    @property
+    def latlon(self) -> Optional[tuple[float, float]]:
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
+
     @property
     def __geo_interface__(self):
         """GeoJSON-like representation of the object for the map."""
-        if not self.location:
+        if not self.latlon:
             return None
 
-        location = to_shape(self.location)
-
         return {
             "type": "Feature",
             "properties": {
@@ -54,7 +61,7 @@ class Village(BaseModel):
                 "description": self.description,
                 "url": self.url,
             },
-            "geometry": location.__geo_interface__,
+            "geometry": {"type": "Point", "coordinates": (self.longitude, self.latitude)},
         }
 
 
@@ -1,12 +1,12 @@
-from typing import Literal, TypeAlias, Union
+from datetime import datetime, time, timedelta
+from typing import Literal, Optional, TypeAlias, Union
 import pytz
 
-from pendulum import period
-from sqlalchemy import select, func, text
+from sqlalchemy import Index, false, select, func
 from sqlalchemy.ext.associationproxy import association_proxy
 
 from main import db
-from .. import BaseModel
+from .. import BaseModel, event_end
 
 event_tz = pytz.timezone("Europe/London")
 
@@ -110,7 +110,9 @@ class Shift(BaseModel):
     def duration_in_minutes(self):
         return (self.start - self.end).total_seconds() // 60
 
-    def to_localtime_dict(self):
+    def to_localtime_dict(self, current_count=None):
+        if current_count is None:
+            current_count = self.current_count
         start = event_tz.localize(self.start)
         end = event_tz.localize(self.end)
         return {
@@ -126,7 +128,7 @@ class Shift(BaseModel):
             "max_needed": self.max_needed,
             "role": self.role.to_dict(),
             "venue": self.venue.to_dict(),
-            "current_count": self.current_count,
+            "current_count": current_count,
         }
 
     @classmethod
@@ -134,46 +136,41 @@ class Shift(BaseModel):
         return cls.query.order_by(Shift.start, Shift.venue_id).all()
 
     @classmethod
-    def get_all_for_day(cls, day: str):
+    def query_for_day(cls, day: str):
         """
-        Return all shifts for the requested day.
+        Query for shifts starting on the requested day of the event, e.g. "wed".
+        The day is turned into a range of start times so the index on start is used.
         """
-        return (
-            cls.query.where(text("lower(to_char(start, 'Dy'))=:day").bindparams(day=day.lower()))
-            .order_by(Shift.start, Shift.venue_id)
-            .all()
+        day_start = event_day_start(day)
+        if day_start is None:
+            return cls.query.filter(false())
+
+        return cls.query.filter(cls.start >= day_start, cls.start < day_start + timedelta(days=1)).order_by(
+            Shift.start, Shift.venue_id
         )
 
     @classmethod
-    def generate_for(cls, role, venue, first, final, min, max, base_duration=120, changeover=15):
+    def get_all_for_day(cls, day: str):
         """
-        Will generate shifts between start and end times. The last shift will
-        end at end.
-        changeover is the changeover time in minutes.
-        This will mean that during changeover there will be two shifts created.
+        Return all shifts for the requested day.
         """
+        return cls.query_for_day(day).all()
 
-        def start(t):
-            return t.subtract(minutes=changeover)
-
-        def end(t):
-            return t.add(minutes=base_duration)
 
-        final_start = final.subtract(minutes=base_duration)
+Index("ix_volunteer_shift_start", Shift.start)
 
-        initial_start_times = list(period(first.naive(), final_start.naive()).range("minutes", base_duration))
 
-        return [
-            Shift(
-                role=role,
-                venue=venue,
-                min_needed=min,
-                max_needed=max,
-                start=start(t),
-                end=end(t),
-            )
-            for t in initial_start_times
-        ]
+def event_day_start(day: str) -> Optional[datetime]:
+    """
+    Midnight at the start of the named day ("wed", "thu", ...) in the week
+    leading up to the day after the event ends, or None if it's not a day name.
+    """
+    last_day = event_end().date() + timedelta(days=1)
+    for offset in range(7):
+        date = last_day - timedelta(days=offset)
+        if date.strftime("%a").lower() == day.lower():
+            return datetime.combine(date, time())
+    return None
 
 
 """
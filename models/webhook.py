@@ -0,0 +1,127 @@
+""" Durable inbox for payment provider webhooks.
+
+    Incoming webhooks are verified and stored here, and the HTTP request returns
+    straight away. Events are then processed by `apps.payments.webhook_inbox`,
+    in the order they were received for each `ordering_key` (usually a payment).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from main import db
+from . import BaseModel
+
+# Give up on an event after this many attempts
+WEBHOOK_MAX_ATTEMPTS = 8
+
+
+class WebhookEvent(BaseModel):
+    __tablename__ = "webhook_event"
+    __export_data__ = False
+
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String, nullable=False)
+    event_id = db.Column(db.String, nullable=False)
+    event_type = db.Column(db.String, nullable=False)
+    # Events with the same ordering key are processed strictly in order
+    ordering_key = db.Column(db.String, nullable=False, index=True)
+    payload = db.Column(db.JSON, nullable=False)
+
+    received = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed = db.Column(db.DateTime, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String)
+
+    __table_args__ = (db.UniqueConstraint(provider, event_id),)
+
+    def __repr__(self):
+        return f"<WebhookEvent {self.id}: {self.provider} {self.event_type} {self.event_id}>"
+
+    @classmethod
+    def pending(cls, entity=None):
+        if entity is None:
+            entity = cls
+        return (entity.processed == None) & (  # noqa: E711
+            entity.attempts < WEBHOOK_MAX_ATTEMPTS
+        )
+
+    @property
+    def is_pending(self):
+        return self.processed is None and self.attempts < WEBHOOK_MAX_ATTEMPTS
+
+    @classmethod
+    def store(cls, provider, event_id, event_type, ordering_key, payload) -> bool:
+        """Store an event, ignoring it if it's already been received.
+
+        Returns whether the event was new.
+        """
+        stmt = (
+            insert(cls.__table__)
+            .values(
+                provider=provider,
+                event_id=event_id,
+                event_type=event_type,
+                ordering_key=ordering_key,
+                payload=payload,
+                received=datetime.utcnow(),
+                next_attempt=datetime.utcnow(),
+                attempts=0,
+            )
+            .on_conflict_do_nothing(index_elements=["provider", "event_id"])
+        )
+        result = db.session.execute(stmt)
+        return result.rowcount > 0
+
+    @classmethod
+    def claim_next(cls, lease: timedelta):
+        """Claim the next event which is due, skipping any event which has an earlier
+        pending event with the same ordering key.
+
+        The event is leased by moving its next_attempt forward, so the caller must
+        commit straight away to release the row lock. If processing crashes, the
+        event will be retried when the lease runs out.
+        """
+        now = datetime.utcnow()
+        earlier = aliased(cls)
+        event = (
+            cls.query.filter(
+                cls.pending(),
+                cls.next_attempt <= now,
+                ~exists().where(
+                    earlier.ordering_key == cls.ordering_key,
+                    earlier.id < cls.id,
+                    cls.pending(earlier),
+                ),
+            )
+            .order_by(cls.id)
+            .with_for_update(skip_locked=True, of=cls)
+            .limit(1)
+            .one_or_none()
+        )
+        if event is None:
+            return None
+
+        event.attempts += 1
+        event.next_attempt = now + lease
+        return event
+
+    def mark_processed(self):
+        self.processed = datetime.utcnow()
+        self.last_error = None
+
+    def mark_failed(self, error):
+        self.last_error = error
+        # Back off exponentially: 1, 2, 4, 8... minutes
+        self.next_attempt = datetime.utcnow() + timedelta(
+            minutes=2 ** (self.attempts - 1)
+        )
+
+    def replay(self):
+        """Reset an event so it's processed again."""
+        self.processed = None
+        self.attempts = 0
+        self.next_attempt = datetime.utcnow()
+        self.last_error = None
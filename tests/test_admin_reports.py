@@ -0,0 +1,181 @@
+import csv
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+
+from apps.admin.reports import (
+    RECONCILE_SNAPSHOT_KEY,
+    reconcile_grand_totals,
+    reconcile_totals,
+    snapshot_reconcile_report,
+)
+from main import cache, db
+from models.basket import Basket
+from models.payment import BankPayment
+from models.product import Price, PriceTier, Product, ProductGroup
+from models.purchase import Purchase
+from models.user import User
+
+
+@pytest.fixture(scope="module")
+def admin_user(app_with_cache):
+    user = User("test_reports_admin@example.com", "Reports Admin")
+    user.grant_permission("admin")
+    db.session.add(user)
+    db.session.commit()
+    yield user
+
+
+@pytest.fixture(scope="module")
+def group(app_with_cache):
+    group = ProductGroup(type="merchandise", name="reconcile_test")
+    product = Product(name="reconcile_product", parent=group)
+    tier = PriceTier(name="reconcile_tier", parent=product)
+    Price(price_tier=tier, currency="GBP", price_int=1250)
+    Price(price_tier=tier, currency="EUR", price_int=1500)
+    db.session.add(group)
+    db.session.commit()
+    yield group
+
+
+def buy(user, tier, currency, count, paid=False):
+    basket = Basket(user, currency)
+    basket[tier] = count
+    basket.create_purchases()
+    basket.ensure_purchase_capacity()
+    payment = basket.create_payment(BankPayment)
+    db.session.add(payment)
+    if paid:
+        for purchase in payment.purchases:
+            purchase.set_state("paid")
+    db.session.commit()
+
+
+def expected_totals(group):
+    """Totals for the group, added up in Python from its purchases."""
+    totals = {
+        typ: {"GBP": Decimal(), "EUR": Decimal()} for typ in ("paid", "pending")
+    }
+    purchases = Purchase.query.join(Purchase.product).filter(Product.group_id == group.id)
+    for purchase in purchases:
+        typ = {"paid": "paid", "payment-pending": "pending"}.get(purchase.state)
+        if typ is not None:
+            totals[typ][purchase.price.currency] += purchase.price.value
+    return totals
+
+
+def admin_client(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = user.id
+        session["_fresh"] = True
+    return client
+
+
+def read_csv(rv):
+    """The report rows, keyed on product group, with the totals as Decimals."""
+    assert rv.status_code == 200
+    assert rv.mimetype == "text/csv"
+    header, *rows = csv.reader(StringIO(rv.get_data(as_text=True)))
+    assert header == [
+        "Product Group",
+        "Paid (GBP)",
+        "Pending (GBP)",
+        "Paid (EUR)",
+        "Pending (EUR)",
+    ]
+    return {name: [Decimal(total) for total in totals] for name, *totals in rows}
+
+
+def as_row(totals):
+    return [
+        totals["paid"]["GBP"],
+        totals["pending"]["GBP"],
+        totals["paid"]["EUR"],
+        totals["pending"]["EUR"],
+    ]
+
+
+def test_reconcile_totals(app_with_cache, admin_user, group):
+    data = reconcile_totals()
+    assert data[group.name] == expected_totals(group), "Groups without purchases have zero totals"
+
+    tier = group.products[0].price_tiers[0]
+    buy(admin_user, tier, "GBP", 2)
+    buy(admin_user, tier, "GBP", 3, paid=True)
+    buy(admin_user, tier, "EUR", 1, paid=True)
+    # Reserved purchases aren't counted
+    basket = Basket(admin_user, "GBP")
+    basket[tier] = 1
+    basket.create_purchases()
+    db.session.commit()
+
+    data = reconcile_totals()
+    expected = expected_totals(group)
+    assert data[group.name] == expected
+    assert expected == {
+        "paid": {"GBP": Decimal("37.50"), "EUR": Decimal("15.00")},
+        "pending": {"GBP": Decimal("25.00"), "EUR": Decimal()},
+    }
+
+    gt = reconcile_grand_totals(data)
+    for typ in ("paid", "pending"):
+        for currency in ("GBP", "EUR"):
+            assert gt[typ][currency] == sum(
+                (totals[typ][currency] for totals in data.values()), Decimal()
+            )
+
+
+def test_reconcile_grand_totals():
+    data = {
+        "a": {
+            "paid": {"GBP": Decimal("1.50"), "EUR": Decimal("2")},
+            "pending": {"GBP": Decimal(), "EUR": Decimal("3")},
+        },
+        "b": {
+            "paid": {"GBP": Decimal("10"), "EUR": Decimal()},
+            "pending": {"GBP": Decimal("4.25"), "EUR": Decimal("1")},
+        },
+    }
+    assert reconcile_grand_totals(data) == {
+        "paid": {"GBP": Decimal("11.50"), "EUR": Decimal("2")},
+        "pending": {"GBP": Decimal("4.25"), "EUR": Decimal("4")},
+    }
+    assert reconcile_grand_totals({}) == {
+        "paid": {"GBP": Decimal(), "EUR": Decimal()},
+        "pending": {"GBP": Decimal(), "EUR": Decimal()},
+    }
+
+
+def test_reconcile_report(app_with_cache, admin_user, group):
+    client = admin_client(app_with_cache, admin_user)
+
+    snapshot_reconcile_report()
+    snapshot = cache.get(RECONCILE_SNAPSHOT_KEY)
+    assert snapshot["data"] == reconcile_totals()
+
+    rv = client.get("/admin/reports/reconcile")
+    assert rv.status_code == 200
+    assert group.name in rv.get_data(as_text=True)
+
+    rows = read_csv(client.get("/admin/reports/reconcile.csv"))
+    assert rows[group.name] == as_row(expected_totals(group))
+    assert set(rows) == set(snapshot["data"]) | {"Total"}
+    assert rows["Total"] == as_row(reconcile_grand_totals(snapshot["data"]))
+
+    # New purchases only show up in the snapshot once it's refreshed
+    old_row = rows[group.name]
+    tier = group.products[0].price_tiers[0]
+    buy(admin_user, tier, "GBP", 1, paid=True)
+    assert read_csv(client.get("/admin/reports/reconcile.csv"))[group.name] == old_row
+
+    live_row = as_row(expected_totals(group))
+    assert live_row != old_row
+    rows = read_csv(client.get("/admin/reports/reconcile.csv?live=1"))
+    assert rows[group.name] == live_row
+
+    # Fetching live data also refreshes the snapshot
+    assert read_csv(client.get("/admin/reports/reconcile.csv"))[group.name] == live_row
+
+    assert client.get("/admin/reports/reconcile.json").status_code == 404
@@ -0,0 +1,39 @@
+from apps.admin.search import search_admin, RANK_CONTAINS, RANK_EXACT, RANK_FULL, RANK_PREFIX
+from models.payment import BankPayment
+from models.user import User
+
+
+def test_search_admin(db, user):
+    results, has_next = search_admin(user.email)
+    assert not has_next
+    assert (results[0].type, results[0].id) == ("user", user.id)
+    assert results[0].rank == RANK_EXACT
+
+    results, _ = search_admin("test us")
+    assert ("user", user.id) in [(row.type, row.id) for row in results]
+
+    payment = BankPayment(currency="GBP", amount=10)
+    payment.user = user
+    db.session.add(payment)
+    db.session.commit()
+
+    results, _ = search_admin(payment.bankref.lower())
+    assert [(row.type, row.id, row.rank) for row in results] == [
+        ("payment", payment.id, RANK_EXACT)
+    ]
+
+    assert search_admin("   ") == ([], False)
+
+
+def test_search_admin_ranking(db, user):
+    other = User("contest_admin_search@example.com", "A Contest")
+    db.session.add(other)
+    db.session.commit()
+
+    # A single word ranks prefix matches above substring matches
+    ranks = {(row.type, row.id): row.rank for row in search_admin("test")[0]}
+    assert ranks[("user", user.id)] == RANK_PREFIX
+    assert ranks[("user", other.id)] == RANK_CONTAINS
+
+    ranks = {(row.type, row.id): row.rank for row in search_admin("test user")[0]}
+    assert ranks[("user", user.id)] == RANK_FULL
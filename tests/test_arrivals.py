@@ -0,0 +1,64 @@
+import hashlib
+import hmac
+
+from apps.arrivals import apply_redemptions, search_users, sign_snapshot
+from models.basket import Basket
+from models.product import PriceTier
+from models.user import User
+
+
+def test_apply_redemptions(db, user):
+    basket = Basket(user, "GBP")
+    tier = PriceTier.query.filter_by(name="full-std").one()
+    basket[tier] = 2
+    basket.create_purchases()
+    db.session.commit()
+
+    paid, unpaid = basket.purchases
+    paid.set_state("paid")
+    db.session.commit()
+
+    product_ids = {tier.product.id}
+    result = apply_redemptions([paid.id, unpaid.id, -1], product_ids)
+    db.session.commit()
+
+    assert result["redeemed"] == [paid.id]
+    assert result["already_redeemed"] == []
+    assert {c["id"]: c["reason"] for c in result["conflicts"]} == {
+        unpaid.id: "not_paid",
+        -1: "not_found",
+    }
+    assert paid.redeemed
+
+    # Resending the same batch shouldn't fail
+    result = apply_redemptions([paid.id], product_ids)
+    assert result["redeemed"] == []
+    assert result["already_redeemed"] == [paid.id]
+
+    result = apply_redemptions([paid.id], set())
+    assert result["conflicts"] == [{"id": paid.id, "reason": "wrong_view"}]
+
+
+def test_search_users_ranking(db):
+    for email, name in [
+        ("search_c@example.com", "Ada Zebrafield"),
+        ("search_b@example.com", "Bob Zebra"),
+        ("search_a@example.com", "Zebra Ada"),
+    ]:
+        db.session.add(User(email, name))
+    db.session.commit()
+
+    # Prefix matches come before substring matches
+    assert [r.name for r in search_users("zebra", [])] == ["Zebra Ada", "Ada Zebrafield", "Bob Zebra"]
+    # All the words in order come first
+    assert [r.name for r in search_users("ada zebra", [])] == ["Ada Zebrafield", "Zebra Ada", "Bob Zebra"]
+
+
+def test_sign_snapshot(app):
+    body = b'{"users":[]}'
+    expected = hmac.new(b"test-snapshot", b"arrivals-snapshot-" + body, digestmod=hashlib.sha256).hexdigest()
+    assert sign_snapshot(body) == expected
+
+    # Stations verifying snapshots shouldn't need the site secret
+    with_secret = hmac.new(b"test", b"arrivals-snapshot-" + body, digestmod=hashlib.sha256).hexdigest()
+    assert sign_snapshot(body) != with_secret
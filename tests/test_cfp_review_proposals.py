@@ -0,0 +1,34 @@
+from models.cfp import TalkProposal, WorkshopProposal
+from apps.cfp_review.base import get_proposal_filter_query, get_proposal_page
+
+
+def test_proposal_pages(app, db, user):
+    for title in ["d", "B", "a", "C"]:
+        proposal = TalkProposal()
+        proposal.title = title
+        proposal.description = "Description"
+        proposal.user = user
+        db.session.add(proposal)
+
+    workshop = WorkshopProposal()
+    workshop.title = "Workshop"
+    workshop.description = "Description"
+    workshop.user = user
+    db.session.add(workshop)
+    db.session.commit()
+
+    with app.test_request_context("/?type=talk&sort_by=title"):
+        query, _ = get_proposal_filter_query()
+        page, remaining = get_proposal_page(query, per_page=3)
+        assert [p.title for p in page] == ["a", "B", "C"]
+        assert remaining == 4
+
+        page, remaining = get_proposal_page(query, after=page[-1].id, per_page=3)
+        assert [p.title for p in page] == ["d"]
+        assert remaining == 1
+
+    with app.test_request_context("/?type=talk&sort_by=title&reverse=1"):
+        query, _ = get_proposal_filter_query()
+        page, remaining = get_proposal_page(query, per_page=2)
+        assert [p.title for p in page] == ["d", "C"]
+        assert remaining == 4
@@ -0,0 +1,87 @@
+from main import cache, db as db_obj
+from models.cfp import CFPVote, TalkProposal
+from models.user import User
+from apps.cfp_review.review import (
+    build_review_queue,
+    get_review_queue,
+    remove_from_review_queue,
+    review_queue_key,
+)
+
+
+def make_proposal(db, title, owner):
+    proposal = TalkProposal()
+    proposal.title = title
+    proposal.description = "Description"
+    proposal.user = owner
+    proposal.state = "anonymised"
+    db.session.add(proposal)
+    return proposal
+
+
+def vote_on(db, user, proposal):
+    vote = CFPVote(user, proposal)
+    vote.state = "voted"
+    vote.vote = 1
+    db.session.add(vote)
+    db.session.commit()
+    remove_from_review_queue(user, proposal.id)
+
+
+def test_review_queue(db, user):
+    others = [User(f"test_proposer{i}@example.com", f"Proposer {i}") for i in range(3)]
+    db.session.add_all(others)
+
+    popular = make_proposal(db, "Popular", others[0])
+    unvoted = make_proposal(db, "Unvoted", others[0])
+    recused = make_proposal(db, "Recused", others[0])
+    own = make_proposal(db, "Own", user)
+
+    for voter in others[1:]:
+        vote = CFPVote(voter, popular)
+        vote.state = "voted"
+        vote.vote = 2
+        db.session.add(vote)
+
+    vote = CFPVote(user, recused)
+    vote.state = "recused"
+    db.session.add(vote)
+    db.session.commit()
+
+    assert build_review_queue(user) == [unvoted.id, popular.id]
+    assert set(build_review_queue(others[1])) == {unvoted.id, recused.id, own.id}
+
+
+def test_cached_review_queue(app_with_cache):
+    db = db_obj
+    reviewer = User("test_queue_reviewer@example.com", "Reviewer")
+    proposer = User("test_queue_proposer@example.com", "Proposer")
+    db.session.add_all([reviewer, proposer])
+    proposals = [make_proposal(db, f"Queued {i}", proposer) for i in range(3)]
+    db.session.commit()
+
+    queue = get_review_queue(reviewer)
+    assert set(queue) == {p.id for p in proposals}
+    assert cache.get(review_queue_key(reviewer)) == queue
+
+    # The queue is only rebuilt once it's used up
+    later = make_proposal(db, "Later", proposer)
+    db.session.commit()
+    assert get_review_queue(reviewer) == queue
+
+    vote_on(db, reviewer, proposals[0])
+    assert get_review_queue(reviewer) == [id for id in queue if id != proposals[0].id]
+
+    for proposal in proposals[1:]:
+        vote_on(db, reviewer, proposal)
+    assert cache.get(review_queue_key(reviewer)) is None
+    assert get_review_queue(reviewer) == [later.id]
+
+    # An empty queue is cached rather than rebuilt on every request
+    vote_on(db, reviewer, later)
+    assert get_review_queue(reviewer) == []
+    assert cache.get(review_queue_key(reviewer)) == []
+
+    make_proposal(db, "Too late", proposer)
+    db.session.commit()
+    assert get_review_queue(reviewer) == []
@@ -203,3 +203,24 @@ def test_cfp_sense_check(override_event_time, inp, other_proposals, expected):
     print(not_sensible_reasons(inp, proposals_by_speaker))
     not_sensible = set(not_sensible_reasons(inp, proposals_by_speaker).keys())
     assert not_sensible == expected
+
+
+def test_schedule_model_reports(db, user):
+    from apps.cfp_review.estimation import get_cfp_estimates
+    from apps.cfp_review.sense_check import get_sense_check_results
+
+    venue = Venue(name='Estimate Venue', allowed_types=['talk'], default_for_types=['talk'])
+    proposal = TalkProposal(title='Accepted talk', description='Description', length='25-45 mins')
+    proposal.user = user
+    proposal.state = 'accepted'
+    db.session.add_all([venue, proposal])
+    db.session.commit()
+
+    results = get_sense_check_results()
+    assert [proposal_id for proposal_id, _ in results['talk']] == [proposal.id]
+    assert 'no_duration' in dict(results['talk'])[proposal.id]
+
+    estimates = get_cfp_estimates()
+    assert estimates['talk'].accepted_count == 1
+    assert estimates['talk'].venues == ['Estimate Venue']
+    assert estimates['workshop'].accepted_count == 0
@@ -0,0 +1,56 @@
+from models.cfp import CFPVote, TalkProposal
+from models.user import User
+from apps.cfp_review.vote_stats import get_vote_summary
+
+
+def test_vote_summary(db, user):
+    reviewer = User("test_reviewer@example.com", "Test Reviewer")
+    db.session.add(reviewer)
+
+    proposals = []
+    for title in ["Beta", "alpha", "Gamma"]:
+        proposal = TalkProposal()
+        proposal.title = title
+        proposal.description = "Description"
+        proposal.user = user
+        proposal.state = "anonymised"
+        db.session.add(proposal)
+        proposals.append(proposal)
+
+    for voter in [user, reviewer]:
+        vote = CFPVote(voter, proposals[0])
+        vote.state = "voted"
+        vote.note = "A note"
+        db.session.add(vote)
+
+    vote = CFPVote(reviewer, proposals[1])
+    vote.state = "blocked"
+    vote.has_been_read = True
+    db.session.add(vote)
+
+    # Unread, but without a note
+    vote = CFPVote(reviewer, proposals[2])
+    vote.state = "recused"
+    db.session.add(vote)
+    db.session.commit()
+
+    summary, rows, has_next = get_vote_summary(sort_by="title")
+    assert not has_next
+    assert [p.title for p, _ in rows] == ["alpha", "Beta", "Gamma"]
+
+    counts = {p.id: c for p, c in rows}
+    assert counts[proposals[0].id] == {"voted": 2, "blocked": 0, "recused": 0, "notes": 2, "unread": 2}
+    assert counts[proposals[1].id] == {"voted": 0, "blocked": 1, "recused": 0, "notes": 0, "unread": 0}
+    assert counts[proposals[2].id]["voted"] == 0
+
+    assert summary["proposals"] == 3
+    assert summary["min_votes"] == 0
+    assert summary["max_votes"] == 2
+    assert summary["votes_total"] == 2
+    assert summary["block_total"] == 1
+    assert summary["notes_total"] == 2
+    assert summary["notes_unread"] == 2
+
+    _, rows, has_next = get_vote_summary(sort_by="votes", reverse=True, per_page=1)
+    assert has_next
+    assert [p for p, _ in rows] == [proposals[0]]
@@ -0,0 +1,41 @@
+from apps.common.generation import (
+    bump_generation,
+    get_generation,
+    has_pending_changes,
+    mark_changed,
+)
+from main import cache, db
+
+
+def test_generation(app_with_cache):
+    key = "test_generation"
+    generation = get_generation(key)
+    assert generation > 1
+    assert get_generation(key) == generation
+
+    bump_generation(key)
+    assert get_generation(key) == generation + 1
+
+    # An evicted counter doesn't start again from an old value
+    cache.delete(key)
+    bump_generation(key)
+    assert get_generation(key) > generation + 1
+
+
+def test_refresh_on_commit(app_with_cache):
+    refreshed = []
+
+    def refresh():
+        refreshed.append(True)
+
+    mark_changed(db.session, refresh)
+    assert has_pending_changes(db.session, refresh)
+    db.session.rollback()
+    assert not has_pending_changes(db.session, refresh)
+    assert refreshed == []
+
+    mark_changed(db.session, refresh)
+    mark_changed(db.session, refresh)
+    db.session.commit()
+    assert refreshed == [True]
+    assert not has_pending_changes(db.session, refresh)
@@ -0,0 +1,18 @@
+from apps.schedule.historic import historic_archive, historic_talk_data
+from models.cfp import proposal_slug
+
+
+def test_historic_archive_cached(app):
+    assert historic_archive(2018) is historic_archive(2018)
+
+
+def test_historic_archive_by_id(app):
+    item = historic_archive(2018).by_id[329]
+    assert proposal_slug(item["title"]) == "powerpoint-karaoke"
+    assert item["start_date"].year == 2018
+
+
+def test_historic_talk_data_deduplicated(app):
+    for venue in historic_talk_data(2018)["venues"]:
+        titles = [e["title"] for e in venue["events"]]
+        assert len(titles) == len(set(titles))
@@ -0,0 +1,43 @@
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+
+from models.cfp import Venue
+from models.village import Village
+
+
+def test_villages_geojson(db, client):
+    village = Village(name="Map Village", location=from_shape(Point(-2.38, 52.04), srid=4326))
+    db.session.add(village)
+    db.session.commit()
+
+    rv = client.get("/api/villages.geojson")
+    assert rv.status_code == 200
+    features = [f for f in rv.json["features"] if f["properties"]["id"] == village.id]
+    assert features[0]["geometry"] == {"type": "Point", "coordinates": [-2.38, 52.04]}
+
+    etag = rv.headers["ETag"]
+    rv = client.get("/api/villages.geojson", headers={"If-None-Match": etag})
+    assert rv.status_code == 304
+
+    # The ETag comes from the content, so any change gives a new one
+    village.name = "Renamed Map Village"
+    db.session.commit()
+    rv = client.get("/api/villages.geojson", headers={"If-None-Match": etag})
+    assert rv.status_code == 200
+    assert rv.headers["ETag"] != etag
+
+    rv = client.get("/api/villages.geojson?bbox=0,0,1,1")
+    assert rv.json["features"] == []
+
+    rv = client.get("/api/villages.geojson?bbox=-3,52,-2,53")
+    assert village.id in [f["properties"]["id"] for f in rv.json["features"]]
+
+
+def test_venue_latlon(db):
+    venue = Venue(name="Map Venue", location=from_shape(Point(-2.38, 52.04), srid=4326))
+    db.session.add(venue)
+    db.session.commit()
+
+    assert venue.latlon == (52.04, -2.38)
+    assert venue.__geo_interface__["geometry"]["coordinates"] == (-2.38, 52.04)
+    assert Venue(name="Unplaced Venue").latlon is None
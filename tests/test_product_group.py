@@ -4,7 +4,8 @@ import pytest
 import random
 import string
 
-from models.basket import Basket
+from apps.admin.stats import get_purchase_stats
+from models.basket import Basket, get_min_remaining_capacity, preload_prices
 from models.exc import CapacityException
 from models.payment import BankPayment
 from models.product import Product, ProductGroup, PriceTier, Price
@@ -163,6 +164,66 @@ def test_capacity_propagation(db, parent_group, user):
     assert price1 == product1.get_cheapest_price("GBP")
 
 
+def test_min_remaining_capacity(db, parent_group):
+    product = Product(name="product", capacity_max=3, parent=parent_group)
+    tier1 = PriceTier(name="tier1", parent=product, capacity_max=5)
+    tier2 = PriceTier(name="tier2", parent=product)
+    Price(price_tier=tier1, currency="GBP", price_int=100)
+    Price(price_tier=tier2, currency="GBP", price_int=200)
+    db.session.commit()
+
+    # The product's capacity is the tightest in the chain
+    assert get_min_remaining_capacity([tier1, tier2]) == 3
+
+    db.session.expire_all()
+    preload_prices([tier1, tier2])
+    assert tier1.get_price_loaded("GBP").price_int == 100
+    assert tier2.get_price_loaded("GBP").price_int == 200
+
+
+def test_inherited_attributes(db, parent_group):
+    product = Product(name="product", parent=parent_group)
+    db.session.add(product)
+    db.session.commit()
+    assert product.get_attribute("is_transferable") is None
+
+    parent_group.set_attribute("is_transferable", True)
+    db.session.commit()
+    assert product.resolved_attributes() == {"is_transferable": True}
+    assert product.get_attribute("is_transferable") is True
+
+    product.set_attribute("is_transferable", False)
+    assert (
+        product.resolved_attributes() is None
+    ), "Uncommitted changes should bypass the resolved attributes"
+    assert product.get_attribute("is_transferable") is False
+
+    db.session.commit()
+    assert product.get_attribute("is_transferable") is False
+
+
+def test_inherited_attributes_after_flush(db, parent_group):
+    product = Product(name="product", parent=parent_group)
+    db.session.add(product)
+    db.session.commit()
+    assert product.get_attribute("is_redeemable") is None
+
+    parent_group.set_attribute("is_redeemable", True)
+    assert (
+        product.resolved_attributes() is None
+    ), "Uncommitted changes to a parent should bypass the resolved attributes"
+
+    db.session.flush()
+    assert parent_group.get_attribute("is_redeemable") is True
+    assert (
+        product.get_attribute("is_redeemable") is True
+    ), "Flushed changes should bypass the resolved attributes until commit"
+
+    db.session.rollback()
+    assert parent_group.get_attribute("is_redeemable") is None
+    assert product.get_attribute("is_redeemable") is None
+
+
 def test_create_purchases(db, parent_group, user):
     product = Product(name="product", capacity_max=3, parent=parent_group)
     tier = PriceTier(name="tier", parent=product)
@@ -191,6 +252,28 @@ def test_create_purchases(db, parent_group, user):
         create_purchases(tier, 1, user)
 
 
+def test_basket_session_record(db, parent_group, user, request_context):
+    product = Product(name="product", parent=parent_group)
+    tier = PriceTier(name="tier", parent=product)
+    price = Price(price_tier=tier, currency="GBP", price_int=666)
+    db.session.add(price)
+    db.session.commit()
+
+    basket = Basket(user, "GBP")
+    basket[tier] = 2
+    basket.create_purchases()
+    db.session.commit()
+    basket.save_to_session()
+    purchase_ids = [p.id for p in basket.purchases]
+
+    restored = Basket.from_session(user, "GBP")
+    assert restored.get(tier) == 2
+    assert restored._session_lines is not None, "Counts shouldn't load the purchases"
+
+    assert [p.id for p in restored.purchases] == purchase_ids
+    assert restored._session_lines is None
+
+
 def test_purchase_state_machine():
     states_dict = PURCHASE_STATES
 
@@ -273,6 +356,13 @@ def test_product_group_get_counts_by_state(db, parent_group, user):
     assert product.purchase_count_by_state == expected
     assert parent_group.purchase_count_by_state == expected
 
+    # The admin stats should agree, from a single query
+    stats = get_purchase_stats.uncached()
+    assert stats.for_tier(tier2) == {"reserved": 1}
+    assert stats.count_for_tier(tier2) == 1
+    assert stats.for_product(product) == expected
+    assert stats.for_group(parent_group) == expected
+
 
 def test_redemption(db, parent_group, user):
     product = Product(name="product", capacity_max=3, parent=parent_group)
@@ -1,6 +1,11 @@
 from datetime import datetime, timedelta
 
-from models.product import VOUCHER_GRACE_PERIOD, ProductView, Voucher
+from models.product import (
+    VOUCHER_GRACE_PERIOD,
+    ProductView,
+    Voucher,
+    get_view_catalogue,
+)
 from models.cfp import TalkProposal
 
 
@@ -74,3 +79,26 @@ def test_product_view_accessible_voucher_expiry(db, user, monkeypatch):
     assert product_view.is_accessible(
         user, voucher=EXPIRES_TOMORROW
     ), "View should be accessible with in-date voucher"
+
+
+def test_view_catalogue(db):
+    view = ProductView.get_by_name("main")
+    catalogue = get_view_catalogue("main")
+
+    assert catalogue["id"] == view.id
+    active_tiers = [
+        tier.id
+        for product in view.products
+        for tier in product.price_tiers
+        if tier.active
+    ]
+    assert [
+        tier["id"] for tier in catalogue["tiers"]
+    ] == active_tiers, "Catalogue should list the active tier of each product in view order"
+
+    tiers = {tier.id: tier for product in view.products for tier in product.price_tiers}
+    for tier in catalogue["tiers"]:
+        assert set(tier["prices"]) == {"GBP", "EUR"}
+        assert tier["product_id"] == tiers[tier["id"]].product_id
+
+    assert get_view_catalogue("no-such-view") is None
@@ -1,7 +1,12 @@
 from PIL import Image
 from pyzbar.pyzbar import decode
 
-from apps.common.receipt import format_inline_qr, make_qr_png
+from apps.common.receipt import (
+    format_inline_qr,
+    make_qr_png,
+    load_receipt_data,
+    set_tickets_emailed,
+)
 
 from tests._utils import render_svg
 
@@ -28,3 +33,28 @@ def test_make_qr_png():
     assert len(decoded) == 1
     content = decoded[0].data.decode("utf-8")
     assert content == data
+
+
+def test_load_receipt_data(db):
+    from models.basket import Basket
+    from models.product import PriceTier
+    from models.user import User
+
+    user = User("test_receipt@example.com", "Test Receipt")
+    db.session.add(user)
+    basket = Basket(user, "GBP")
+    basket[PriceTier.query.filter_by(name="full-std").one()] = 1
+    basket[PriceTier.query.filter_by(name="parking").one()] = 1
+    basket.create_purchases()
+    for purchase in basket.purchases:
+        purchase.set_state("paid")
+    db.session.commit()
+
+    receipt = load_receipt_data([user])[user.id]
+    assert [p.product.parent.type for p in receipt.purchases("admissions")] == ["admissions"]
+    assert len(receipt.purchases("parking")) == 1
+    assert receipt.purchases("merchandise") == []
+
+    assert not set_tickets_emailed(user, receipt)
+    assert all(p.ticket_issued for p in receipt.issuable_purchases)
+    assert len(receipt.issuable_purchases) == 2
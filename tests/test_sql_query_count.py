@@ -37,3 +37,61 @@ def test_query_count(app_with_cache, url, queries):
         rv = client.get(url)
         assert rv.status_code == 200, f"Fetching {url} results in HTTP 200"
         assert log.count <= queries, f"{url} query count"
+
+
+@pytest.fixture(scope="module")
+def admin_user(db):
+    from models.user import User
+
+    email = "test_admin@example.com"
+    user = User.query.filter(User.email == email).one_or_none()
+    if not user:
+        user = User(email, "Test Admin")
+        user.grant_permission("admin")
+        db.session.add(user)
+        db.session.commit()
+    yield user
+
+
+@pytest.mark.parametrize("url", ["/admin/", "/arrivals/"])
+def test_permission_query_count(app_with_cache, admin_user, url):
+    """Permissions should be resolved at most once per request, however many checks are made."""
+    client = app_with_cache.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = admin_user.id
+        session["_fresh"] = True
+
+    client.get(url)
+    with QueryLog() as log:
+        rv = client.get(url)
+    assert rv.status_code == 200, f"Fetching {url} results in HTTP 200"
+
+    permission_queries = [
+        q for q in log.queries if "FROM permission" in q or "JOIN permission" in q
+    ]
+    assert len(permission_queries) <= 1, f"{url} permission query count"
+
+
+def test_permission_names_cache(db, admin_user):
+    from models.permission import Permission, UserPermission
+
+    assert admin_user.has_permission("admin")
+    with QueryLog() as log:
+        for _ in range(3):
+            assert admin_user.has_permission("arrivals")
+            assert not admin_user.has_permission("arrivals", cascade=False)
+    assert log.count == 0, "permission checks are answered from the cache"
+
+    admin_user.grant_permission("arrivals")
+    assert admin_user.has_permission("arrivals", cascade=False)
+    admin_user.revoke_permission("arrivals")
+    assert not admin_user.has_permission("arrivals", cascade=False)
+    db.session.commit()
+
+    # Permissions changed outside the instance are picked up once it's expired
+    permission = Permission.query.filter_by(name="arrivals").one()
+    db.session.execute(UserPermission.insert().values(user_id=admin_user.id, permission_id=permission.id))
+    assert not admin_user.has_permission("arrivals", cascade=False)
+    db.session.expire(admin_user)
+    assert admin_user.has_permission("arrivals", cascade=False)
+    db.session.rollback()
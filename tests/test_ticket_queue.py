@@ -0,0 +1,58 @@
+import time
+
+from flask import session
+from sqlalchemy import text
+
+from main import cache, db
+from apps.tickets.admission_queue import (
+    QUEUE_JOINED_KEY,
+    QUEUE_START_KEY,
+    check_queue,
+    queue_position,
+)
+
+
+def test_queue_disabled(app_with_cache):
+    with app_with_cache.test_request_context("/tickets"):
+        assert check_queue("main") is None
+
+
+def test_queue_admits_when_empty(app_with_cache, monkeypatch):
+    monkeypatch.setitem(app_with_cache.config, "TICKET_QUEUE_RATE", 10)
+    with app_with_cache.test_request_context("/tickets"):
+        cache.delete(QUEUE_JOINED_KEY)
+        cache.delete(QUEUE_START_KEY)
+        assert check_queue("main") is None
+        assert "ticket_queue_token" in session
+
+
+def test_queue_holds_back_rush(app_with_cache, monkeypatch):
+    monkeypatch.setitem(app_with_cache.config, "TICKET_QUEUE_RATE", 1)
+    with app_with_cache.test_request_context("/tickets"):
+        # 100 people arrived in the last second
+        db.session.execute(text("SELECT setval('ticket_queue_number', 100)"))
+        cache.set(QUEUE_JOINED_KEY, 100)
+        cache.set(QUEUE_START_KEY, time.time() - 1, timeout=0)
+
+        response = check_queue("main")
+        assert response is not None
+        assert response.location.endswith("/tickets/queue")
+        assert "ticket_queue_token" not in session
+
+        first_position = queue_position()
+        assert first_position > 90
+        # Polling doesn't lose your place
+        assert queue_position() <= first_position
+
+
+def test_queue_numbers_are_unique(app_with_cache, monkeypatch):
+    monkeypatch.setitem(app_with_cache.config, "TICKET_QUEUE_RATE", 1)
+    numbers = set()
+    for _ in range(5):
+        with app_with_cache.test_request_context("/tickets"):
+            # Nobody has been admitted yet, so each visitor keeps their number
+            cache.set(QUEUE_JOINED_KEY, 0)
+            queue_position()
+            numbers.add(session.get("ticket_queue_number"))
+    assert None not in numbers
+    assert len(numbers) == 5
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from models import event_end
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, event_day_start
+from models.volunteer.venue import VolunteerVenue
+from apps.volunteer.rota import ShiftIntervals
+
+
+def make_shift(id, role, venue, start_hour, hours=2):
+    start = datetime(2024, 5, 31, start_hour)
+    return Shift(id=id, role=role, venue=venue, start=start, end=start + timedelta(hours=hours))
+
+
+def test_shift_intervals():
+    bar, gate = Role(name="Bar"), Role(name="Gate")
+    venue = VolunteerVenue(name="Bar")
+
+    intervals = ShiftIntervals([make_shift(1, bar, venue, 10, hours=6), make_shift(2, gate, venue, 18)])
+
+    assert intervals.find_clash(make_shift(3, gate, venue, 12)).id == 1
+    assert intervals.find_clash(make_shift(3, gate, venue, 16)).id == 1
+    assert intervals.find_clash(make_shift(3, gate, venue, 21)) is None
+    assert intervals.find_clash(make_shift(3, gate, venue, 6, hours=1)) is None
+    # Same role at the same venue can overlap at changeover
+    assert intervals.find_clash(make_shift(3, bar, venue, 15)) is None
+
+    intervals.add(make_shift(3, gate, venue, 6, hours=1))
+    assert intervals.find_clash(make_shift(4, bar, venue, 5)).id == 3
+
+
+def test_event_day_start(app):
+    last_day = event_end().date() + timedelta(days=1)
+    monday = event_day_start(last_day.strftime("%a"))
+    assert monday == datetime.combine(last_day, datetime.min.time())
+    assert event_day_start("notaday") is None
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, ShiftEntry
+from models.volunteer.venue import VolunteerVenue
+from apps.volunteer.rota_generator import apply_rota_diff, diff_rota, expand_shift_times
+
+
+def test_expand_shift_times():
+    times = expand_shift_times(datetime(2024, 5, 31, 10), datetime(2024, 5, 31, 15), base_duration=120)
+    assert times == [
+        (datetime(2024, 5, 31, 9, 45), datetime(2024, 5, 31, 12)),
+        (datetime(2024, 5, 31, 11, 45), datetime(2024, 5, 31, 14)),
+    ]
+
+
+def test_diff_rota(db, user):
+    role = Role(name="Generator test role")
+    db.session.add_all([role, VolunteerVenue(name="Generator test venue")])
+    db.session.commit()
+
+    template = {"first": "2024-05-31 10:00:00", "final": "2024-05-31 16:00:00", "min": 1, "max": 2}
+    shift_list = {role.name: {"Generator test venue": [template]}}
+
+    diff = diff_rota(shift_list)
+    assert len(diff.inserts) == 3
+    apply_rota_diff(diff)
+    db.session.commit()
+    assert not diff_rota(shift_list)
+
+    first = Shift.query.filter_by(role=role).order_by(Shift.start).first()
+    db.session.add(ShiftEntry(user=user, shift=first))
+    db.session.commit()
+
+    template.update({"first": "2024-05-31 12:00:00", "max": 3})
+    diff = diff_rota(shift_list)
+    assert diff.kept == [first.id]
+    assert diff.deletes == []
+    assert len(diff.updates) == 2
+    assert diff.inserts == []
+
+    apply_rota_diff(diff)
+    db.session.commit()
+    db.session.expire_all()
+    assert [s.max_needed for s in Shift.query.filter_by(role=role).order_by(Shift.start)] == [2, 3, 3]
+    assert first.entries[0].user == user
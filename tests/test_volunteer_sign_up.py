@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Barrier
+
+import pytest
+
+from models.user import User
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, ShiftEntry
+from models.volunteer.venue import VolunteerVenue
+from apps.volunteer.rota import ShiftSignupException, sign_up
+
+
+@pytest.fixture(scope="module")
+def shifts(db):
+    role = Role(name="Sign-up test role")
+    venue = VolunteerVenue(name="Sign-up test venue")
+    other_role = Role(name="Clashing role")
+    start = datetime(2024, 5, 31, 10)
+    end = start + timedelta(hours=2)
+    shifts = [
+        Shift(role=role, venue=venue, start=start, end=end, max_needed=1),
+        Shift(role=role, venue=venue, start=start, end=end, max_needed=3),
+        Shift(role=other_role, venue=venue, start=start, end=end, max_needed=3),
+    ]
+    db.session.add_all(shifts)
+    db.session.commit()
+    yield shifts
+
+
+def test_sign_up_all_or_nothing(db, user, shifts):
+    _, roomy, clashing = shifts
+
+    with pytest.raises(ShiftSignupException, match="clashes"):
+        sign_up(user, [roomy.id, clashing.id], [])
+    db.session.rollback()
+    assert ShiftEntry.query.filter_by(user_id=user.id).count() == 0
+
+    assert sign_up(user, [roomy.id], []) == [roomy]
+    db.session.commit()
+    # Already signed up, so nothing to do
+    assert sign_up(user, [roomy.id], []) == []
+
+
+def test_concurrent_sign_up(app, db, shifts):
+    full = shifts[0]
+    users = [User(f"sign_up_{i}@example.com", f"Sign-up User {i}") for i in range(4)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    shift_id = full.id
+    user_ids = [u.id for u in users]
+    barrier = Barrier(len(user_ids))
+
+    def attempt(user_id):
+        # Each app context has its own session, and so its own connection
+        with app.app_context():
+            barrier.wait()
+            try:
+                sign_up(User.query.get(user_id), [shift_id], [])
+                db.session.commit()
+                return True
+            except ShiftSignupException:
+                db.session.rollback()
+                return False
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as executor:
+        results = list(executor.map(attempt, user_ids))
+
+    assert results.count(True) == 1
+    assert ShiftEntry.query.filter_by(shift_id=shift_id).count() == full.max_needed
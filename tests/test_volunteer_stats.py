@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from models.volunteer.role import Role
+from models.volunteer.shift import Shift, ShiftEntry
+from models.volunteer.venue import VolunteerVenue
+from apps.volunteer.stats import get_coverage, get_role_totals
+
+
+def test_coverage(db, user):
+    role = Role(name="Coverage test role")
+    venue = VolunteerVenue(name="Coverage test venue")
+    start = datetime(2024, 5, 31, 10, 10)
+    end = start + timedelta(minutes=30)
+    first = Shift(role=role, venue=venue, start=start, end=end, min_needed=2, max_needed=3)
+    second = Shift(role=role, venue=venue, start=end - timedelta(minutes=10), end=end + timedelta(minutes=30))
+    second.max_needed = 1
+    db.session.add_all([first, second])
+    db.session.add(ShiftEntry(user=user, shift=first, state="arrived"))
+    db.session.commit()
+
+    coverage = [c for c in get_coverage() if c["role"] == role.name]
+    assert [c["start"] for c in coverage] == [
+        "2024-05-31T10:00:00",
+        "2024-05-31T10:15:00",
+        "2024-05-31T10:30:00",
+        "2024-05-31T10:45:00",
+        "2024-05-31T11:00:00",
+    ]
+    assert [c["min_needed"] for c in coverage] == [2, 2, 2, 0, 0]
+    assert [c["max_needed"] for c in coverage] == [3, 3, 4, 1, 1]
+    assert [c["arrived"] for c in coverage] == [1, 1, 1, 0, 0]
+    assert [c["shortfall"] for c in coverage] == [1, 1, 1, 0, 0]
+
+    totals = get_role_totals()[role.name]
+    assert totals["shifts"] == {"arrived": 1, "min_required": 2, "max_required": 4}
+    assert totals["seconds"]["arrived"] == 30 * 60
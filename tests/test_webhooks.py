@@ -31,3 +31,33 @@ def test_wise_webhook(client):
         follow_redirects=True,
     )
     assert response.status_code == 204
+
+
+def test_wise_webhook_inbox(client, db):
+    from models.webhook import WebhookEvent
+    from apps.payments.webhook_inbox import process_pending_webhooks
+
+    payload = load_webhook_fixture("balances#credit")
+    signature = load_webhook_signature("balances#credit")
+    for _ in range(2):
+        response = client.post(
+            path="/wise-webhook",
+            headers={
+                "Content-Type": "application/json",
+                "X-Signature-SHA256": signature,
+            },
+            data=payload,
+        )
+        assert response.status_code == 204
+
+    # Redelivered events are only stored once
+    events = WebhookEvent.query.filter_by(provider="wise").all()
+    assert len(events) == 1
+    assert events[0].processed is None
+
+    with client.application.test_request_context():
+        assert process_pending_webhooks() == 1
+
+    db.session.refresh(events[0])
+    assert events[0].processed is not None
+    assert events[0].attempts == 1
@@ -0,0 +1,122 @@
+""" Tests for Wise statement syncing, against a local fake of the Wise statement API. """
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from cachelib import SimpleCache
+
+from apps.payments import wise as wise_module
+from apps.payments.wise import (
+    request_wise_sync,
+    sync_wise_statement,
+    WISE_SYNC_INITIAL_WINDOW,
+    WISE_SYNC_OVERLAP,
+)
+from models.payment import BankAccount, BankTransaction
+
+BORDERLESS_ACCOUNT_ID = 4242
+
+
+class FakeWise:
+    """Just enough of pywisetransfer's client to serve account statements."""
+
+    def __init__(self):
+        self.transactions = []
+        self.requests = []
+        self.borderless_accounts = self
+
+    def add_credit(self, date, reference, amount, type="DEPOSIT"):
+        self.transactions.append(
+            SimpleNamespace(
+                type="CREDIT",
+                date=date.isoformat() + "Z",
+                amount=SimpleNamespace(value=Decimal(amount)),
+                details=SimpleNamespace(type=type, paymentReference=reference),
+                referenceNumber=f"TRANSFER-{len(self.transactions)}",
+            )
+        )
+
+    def statement(self, profile_id, borderless_account_id, currency, start, end):
+        self.requests.append((borderless_account_id, currency, start, end))
+        return SimpleNamespace(transactions=list(self.transactions))
+
+
+@pytest.fixture
+def fake_wise(monkeypatch):
+    fake = FakeWise()
+    monkeypatch.setattr(wise_module, "wise", fake)
+    yield fake
+
+
+@pytest.fixture
+def wise_account(db):
+    account = BankAccount.query.filter_by(
+        borderless_account_id=BORDERLESS_ACCOUNT_ID
+    ).one_or_none()
+    if account is None:
+        account = BankAccount(
+            sort_code="231470",
+            acct_id="12345678",
+            currency="GBP",
+            active=True,
+            payee_name="EMF Festivals Ltd",
+            institution="Wise",
+            address="56 Shoreditch High Street, London",
+            swift=None,
+            iban=None,
+            borderless_account_id=BORDERLESS_ACCOUNT_ID,
+        )
+        db.session.add(account)
+    account.wise_synced_until = None
+    db.session.commit()
+    yield account
+
+
+def test_sync_is_incremental(app, fake_wise, wise_account):
+    now = datetime.utcnow()
+    fake_wise.add_credit(now - timedelta(hours=2), "UNMATCHED REF 1", "10.00")
+    fake_wise.add_credit(now - timedelta(hours=1), "UNMATCHED REF 2", "20.00")
+    fake_wise.add_credit(now - timedelta(hours=1), "CONVERSION", "5.00", type="CONVERSION")
+
+    sync_wise_statement(0, BORDERLESS_ACCOUNT_ID, "GBP")
+    assert BankTransaction.query.filter_by(account_id=wise_account.id).count() == 2
+    assert wise_account.wise_synced_until is not None
+
+    # A second sync only fetches from the high-water mark, and doesn't duplicate anything
+    synced_until = wise_account.wise_synced_until
+    sync_wise_statement(0, BORDERLESS_ACCOUNT_ID, "GBP")
+    assert BankTransaction.query.filter_by(account_id=wise_account.id).count() == 2
+
+    _, _, start, _ = fake_wise.requests[-1]
+    assert start == (synced_until - WISE_SYNC_OVERLAP).isoformat() + "Z"
+
+
+def test_full_sync(app, fake_wise, wise_account):
+    sync_wise_statement(0, BORDERLESS_ACCOUNT_ID, "GBP")
+
+    # A full sync ignores the high-water mark, to catch anything missed
+    sync_wise_statement(0, BORDERLESS_ACCOUNT_ID, "GBP", full=True)
+    _, _, start, end = fake_wise.requests[-1]
+    start = datetime.fromisoformat(start.rstrip("Z"))
+    end = datetime.fromisoformat(end.rstrip("Z"))
+    assert end - start == WISE_SYNC_INITIAL_WINDOW
+
+
+def test_sync_requests_coalesced(app, fake_wise, wise_account, monkeypatch):
+    cache = SimpleCache()
+    monkeypatch.setattr(wise_module, "cache", cache)
+
+    request_wise_sync(0, BORDERLESS_ACCOUNT_ID, "GBP")
+    assert len(fake_wise.requests) == 1
+
+    # A request made while a sync is running is left for that sync to pick up
+    cache.set(f"wise_sync_running/{BORDERLESS_ACCOUNT_ID}/GBP", True)
+    request_wise_sync(0, BORDERLESS_ACCOUNT_ID, "GBP")
+    assert len(fake_wise.requests) == 1
+    assert cache.get(f"wise_sync_pending/{BORDERLESS_ACCOUNT_ID}/GBP")
+
+    # Later requests always sync again, however recently the last sync ran
+    cache.delete(f"wise_sync_running/{BORDERLESS_ACCOUNT_ID}/GBP")
+    request_wise_sync(0, BORDERLESS_ACCOUNT_ID, "GBP")
+    assert len(fake_wise.requests) == 2